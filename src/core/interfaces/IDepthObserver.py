@@ -0,0 +1,8 @@
+from zope.interface import Interface
+
+from core.protocols.DepthSubscriber import DepthSubscriber
+
+
+class IDepthObserver(Interface):
+    async def subscribe_depth(self, sub: DepthSubscriber): ...
+    async def unsubscribe_depth(self, sub: DepthSubscriber): ...
@@ -0,0 +1,8 @@
+from zope.interface import Interface
+
+from core.models.types import COIN_NAME, FEE
+
+
+class IFeeProvider(Interface):
+    # taker-комиссия для пары COIN/USDT с учетом уровня аккаунта, в долях (0.001 = 0.1%)
+    async def get_taker_fees(self) -> dict[COIN_NAME, FEE]: ...
@@ -0,0 +1,13 @@
+from typing import TypeAlias
+
+from zope.interface import Interface
+
+from core.models.types import CHAIN, COIN_NAME, FEE
+
+# (комиссия вывода, депозит открыт, вывод открыт)
+NetworkStatus: TypeAlias = tuple[FEE, bool, bool]
+
+
+class INetworkProvider(Interface):
+    # состояние сетей всех монет биржи одним запросом; имена сетей - как в get_current_coins биржи
+    async def get_network_status(self) -> dict[COIN_NAME, dict[CHAIN, NetworkStatus]]: ...
@@ -17,6 +17,8 @@ class Deal:
             The unit (absolute quote-currency amount or percentage) should be documented where the value
             is computed. This value should typically account for fees, estimated slippage, and transfer
             costs if available.
+        roi (float | None): Return on the round trip without regard to duration, when benefit is a rate
+            (the Analyst reports benefit as ROI per hour of transfer time).
     Notes:
         - This class is a lightweight data container and does not execute trades or validate market
           conditions. Use a separate service/function to compute and verify benefit before acting.
@@ -30,6 +32,7 @@ class Deal:
     departure: ExchangeBase
     destination: ExchangeBase
     benefit: float
+    roi: float | None = None
     
     def __str__(self) -> str:
         return f"coin_id: {self.coin_id}, departure: {self.departure.name}, destination: {self.destination.name}, benefit: {self.benefit}"
\ No newline at end of file
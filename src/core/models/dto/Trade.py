@@ -3,12 +3,14 @@ from dataclasses import dataclass, field
 # from core.interfaces.Dto import Destination
 # from core.models import Coin
 
-from core.models.types import COIN_ID
+from core.models.types import AMOUNT, COIN_ID
 
 @dataclass
 class Trade:
     buy_coin: COIN_ID
     sell_coin: COIN_ID
+    # сколько продать sell_coin; None - весь остаток
+    amount: AMOUNT | None = None
     
     def __str__(self) -> str:
         return f"Trade {self.sell_coin} to {self.buy_coin}"
@@ -3,7 +3,7 @@ from dataclasses import dataclass, field
 # from core.interfaces.Dto import Departure, Destination
 # from core.models import Coin
 from core.interfaces import IExchange
-from core.models.types import COIN_ID
+from core.models.types import AMOUNT, COIN_ID
 
 
 @dataclass
@@ -11,6 +11,8 @@ class Transfer:
     coin: COIN_ID
     departure: IExchange
     destination: IExchange
+    # None - весь остаток
+    amount: AMOUNT | None = None
     
     def __post_init__(self):
         if self.departure is self.destination:
@@ -0,0 +1,12 @@
+from typing import Protocol, Sequence, TypeAlias, runtime_checkable
+
+from core.models.types import COIN_NAME
+
+# [[price, amount], ...] в порядке ccxt: asks по возрастанию, bids по убыванию цены
+Levels: TypeAlias = Sequence[Sequence[float]]
+
+
+@runtime_checkable
+class DepthSubscriber(Protocol):
+    def __hash__(self) -> int: ...
+    async def on_depth_update(self, coin_name: COIN_NAME, asks: Levels, bids: Levels) -> None: ...
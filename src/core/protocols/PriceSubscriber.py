@@ -1,9 +1,18 @@
-from typing import Protocol, runtime_checkable
+from typing import Protocol, TypeAlias, runtime_checkable
 from core.models import Coin
-from core.models.types import COIN_ID, COIN_NAME
+from core.models.types import COIN_ID, COIN_NAME, PRICE
+
+# изменения одного кадра watch_tickers: (coin_name, ask, bid)
+PriceBatch: TypeAlias = list[tuple[COIN_NAME, PRICE, PRICE]]
 
 
 @runtime_checkable
 class PriceSubscriber(Protocol):
     def __hash__(self) -> int: ...
-    async def on_price_update(self, coin_name: COIN_NAME, value: float) -> None: ...
\ No newline at end of file
+    # bid = None - биржа прислала одну цену, она же используется как bid
+    async def on_price_update(self, coin_name: COIN_NAME, ask: PRICE, bid: PRICE | None = None) -> None: ...
+
+
+@runtime_checkable
+class BatchPriceSubscriber(PriceSubscriber, Protocol):
+    async def on_prices_update(self, batch: PriceBatch) -> None: ...
@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Mapping, Sequence
+
+from core.models.Deal import Deal
+from core.models.ExchangeBase import ExchangeBase
+from core.models.types import AMOUNT
+
+if TYPE_CHECKING:
+    from core.services.Analytics.Slippage import SlippageModel
+
+# комиссия перевода USDT и время в пути в секундах; None - перевод невозможен
+TransferCost = Callable[[ExchangeBase, ExchangeBase], tuple[AMOUNT, float] | None]
+# постоянные расходы сделки в USDT (перевод монеты); None - сделка недоступна
+DealCost = Callable[[Deal], AMOUNT | None]
+
+
+@dataclass(frozen=True)
+class Allocation:
+    exchange: ExchangeBase
+    deal: Deal
+    notional: AMOUNT
+    profit: AMOUNT
+
+
+class CapitalAllocator:
+    """
+    Распределение USDT со всех бирж между несколькими сделками.
+
+    Жадный алгоритм с емкостью: капитал выдается порциями step, каждая порция уходит туда,
+    где приносит больше прибыли в час. Прибыль порции считается по стаканам SlippageModel,
+    поэтому тонкий стакан сам ограничивает объем сделки - следующая порция в него уже невыгодна.
+    Без стакана прибыль линейна по ROI сделки. Постоянные расходы (перевод монеты, перевод USDT
+    на биржу покупки) списываются с первой порции пары (биржа, сделка).
+    """
+
+    def __init__(self, slippage: 'SlippageModel | None' = None, step: AMOUNT = 50.0, min_notional: AMOUNT = 10.0) -> None:
+        self.slippage = slippage
+        self.step = step
+        self.min_notional = min_notional
+
+    @staticmethod
+    def _roi(deal: Deal) -> float:
+        return deal.benefit if deal.roi is None else deal.roi
+
+    def _hours(self, deal: Deal) -> float:
+        # benefit - ROI в час, отсюда длительность сделки
+        roi = self._roi(deal)
+        return roi / deal.benefit if deal.roi is not None and deal.benefit > 0 and roi > 0 else 1.0
+
+    def _profit(self, deal: Deal, notional: AMOUNT) -> AMOUNT | None:
+        """Прибыль сделки на notional USDT; None - глубины стакана не хватает"""
+        if notional <= 0:
+            return 0.0
+        slippage = self.slippage
+        if (
+            slippage is not None
+            and slippage.get_book(deal.coin_id, deal.departure) is not None
+            and slippage.get_book(deal.coin_id, deal.destination) is not None
+        ):
+            return slippage.realizable_profit(deal.coin_id, deal.departure, deal.destination, notional)
+        return notional * self._roi(deal)
+
+    def allocate(
+        self,
+        balances: Mapping[ExchangeBase, AMOUNT],
+        deals: Sequence[Deal],
+        deal_cost: DealCost | None = None,
+        transfer: TransferCost | None = None,
+    ) -> list[Allocation]:
+        """
+        Args:
+            balances: свободные USDT на биржах
+            deals: сделки-кандидаты, одна на монету
+            deal_cost: постоянные расходы сделки
+            transfer: стоимость перевода USDT между биржами; без нее сделка финансируется
+                только с биржи покупки
+        Returns:
+            доли капитала, самые прибыльные первыми
+        """
+        left: dict[ExchangeBase, AMOUNT] = {exchange: amount for exchange, amount in balances.items() if amount > 0}
+        fixed: dict[int, AMOUNT] = {}
+        for index, deal in enumerate(deals):
+            cost = 0.0 if deal_cost is None else deal_cost(deal)
+            if cost is not None:
+                fixed[index] = cost
+        # доход уже выданного объема и длительность сделок - не пересчитываются на каждом шаге
+        allocated: dict[int, AMOUNT] = dict.fromkeys(fixed, 0.0)
+        earned: dict[int, AMOUNT] = dict.fromkeys(fixed, 0.0)
+        hours: dict[int, float] = {index: self._hours(deals[index]) for index in fixed}
+        routes: dict[tuple[ExchangeBase, int], tuple[AMOUNT, float] | None] = {}
+        plan: dict[tuple[ExchangeBase, int], list[AMOUNT]] = {}
+
+        while True:
+            best: tuple[float, ExchangeBase, int, AMOUNT, AMOUNT] | None = None
+            for exchange, amount in left.items():
+                if amount < self.min_notional:
+                    continue
+                chunk = amount if amount < self.step + self.min_notional else self.step
+                for index in fixed:
+                    deal = deals[index]
+                    route: tuple[AMOUNT, float] | None = (0.0, 0.0)
+                    if exchange is not deal.departure:
+                        if transfer is None:
+                            continue
+                        if (exchange, index) not in routes:
+                            routes[exchange, index] = transfer(exchange, deal.departure)
+                        route = routes[exchange, index]
+                    if route is None:
+                        continue
+
+                    if (total := self._profit(deal, allocated[index] + chunk)) is None:
+                        continue
+                    gain = total - earned[index]
+                    if (exchange, index) not in plan:
+                        gain -= fixed[index] + route[0]
+                    rate = gain / (hours[index] + route[1] / 3600)
+                    if gain > 0 and (best is None or rate > best[0]):
+                        best = (rate, exchange, index, chunk, total)
+
+            if best is None:
+                break
+            _, exchange, index, chunk, total = best
+            share = plan.setdefault((exchange, index), [0.0, 0.0])
+            share[0] += chunk
+            share[1] += total - earned[index]
+            left[exchange] -= chunk
+            allocated[index] += chunk
+            earned[index] = total
+
+        allocations = [
+            Allocation(exchange, deals[index], notional, profit - fixed[index] - (routes.get((exchange, index)) or (0.0, 0.0))[0])
+            for (exchange, index), (notional, profit) in plan.items()
+        ]
+        allocations.sort(key=lambda allocation: allocation.profit, reverse=True)
+        return allocations
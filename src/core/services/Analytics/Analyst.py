@@ -1,28 +1,103 @@
 from abc import ABC, abstractmethod
+from heapq import nlargest
+from typing import TYPE_CHECKING, AsyncIterator, Collection, Iterable, Mapping
 from sortedcollections import ValueSortedDict
 from dataclasses import dataclass, field
+from functools import partial
 
 from frozendict import frozendict
 # from asyncio import Queue
 from asyncio import Condition
-from core.models.types import COIN_ID, COIN_NAME, PRICE, AMOUNT, PROFIT
+from core.models.types import COIN_ID, COIN_NAME, EXCHANGE_NAME, PRICE, AMOUNT, PROFIT
 
 import asyncio
 import logging
+import time
 
 
 from core.models.dto import Recommendation, Trade, Transfer, Wait
 from core.models import Coin, Deal, CoinPair
 from core.interfaces import Exchange, ExchangeDict, All_prices, DEPARTURE, DESTINATION, SellCommission, BuyCommission
 from core.protocols import AnalistSubscriber, PriceSubscriber
+from core.protocols.PriceSubscriber import PriceBatch
 from core.services.Mapper import Mapper
+from core.services.Analytics.CoinQuotes import CoinQuotes
+from core.services.Analytics.FeeTable import FeeKey, FeeTable
+from core.services.Analytics.PriceSnapshot import PriceBook, PriceKey, PriceSnapshot
+from core.services.Analytics.RouteGraph import RouteSearch
+from core.services.Analytics.TimingWheel import TimingWheel
+from core.services.Analytics.TransferTimes import TransferTimes
+
+if TYPE_CHECKING:
+    from core.interfaces.IFeeProvider import IFeeProvider
+    from core.services.Analytics.PriceMatrix import PriceMatrix
+
+
+@dataclass(eq=False)
+class _OpportunityStream:
+    """Буфер одного потребителя opportunities"""
+    min_benefit: float
+    queue: asyncio.Queue[COIN_ID]
+    # монеты выше порога: повторно сообщаем только после выхода ниже порога
+    above: set[COIN_ID] = field(default_factory=set)
+    
+    def push(self, coin_id: COIN_ID) -> None:
+        if self.queue.full():
+            # при переполнении теряем самое старое событие
+            self.queue.get_nowait()
+        self.queue.put_nowait(coin_id)
+
 
 class Analyst:
-    def __init__(self, mapper: Mapper, threshold: float = 0.002) -> None:
+    def __init__(
+        self,
+        mapper: Mapper,
+        threshold: float = 0.002,
+        use_matrix: bool = False,
+        single_writer: bool = False,
+        queue_size: int = 10_000,
+        fees: FeeTable | None = None,
+        transfer_times: TransferTimes | None = None,
+        quote_ttl: float | None = 120.0,
+        exchange_ttl: Mapping[EXCHANGE_NAME, float] | None = None,
+        conflation: float = 0.0,
+        coin_conflation: Mapping[COIN_ID, float] | None = None,
+        bypass_top: int = 0,
+        routes: RouteSearch | None = None,
+    ) -> None:
         self.mapper:Mapper = mapper
+        # порог выгоды (ROI в час перевода) для потока opportunities
         self.threshold = threshold
         self._coin_locks: dict[COIN_ID, asyncio.Lock] = {}
-        self._coin_list: dict[COIN_ID, dict[Exchange, PRICE]] = {}
+        self._coin_list: dict[COIN_ID, CoinQuotes] = {}
+        self.fees: FeeTable = fees or FeeTable(mapper)
+        # выгода сделки - ROI за час перевода монеты между биржами
+        self.transfer_times: TransferTimes = transfer_times or TransferTimes()
+        self._rates: dict[tuple[COIN_ID, Exchange, Exchange], float] = {}
+        self._rate_bounds: tuple[float, float] = (1.0, 1.0)
+        self._rates_version: int = -1
+        # котировка без обновлений дольше ttl биржи считается устаревшей и удаляется
+        self.quote_ttl = quote_ttl
+        self.exchange_ttl: dict[EXCHANGE_NAME, float] = dict(exchange_ttl or {})
+        self._expiry: TimingWheel[tuple[COIN_ID, Exchange]] = TimingWheel(resolution=1.0)
+        self._expiry_task: asyncio.Task | None = None
+        self._fees_task: asyncio.Task | None = None
+        # окно склейки обновлений: цена записывается сразу, оценка монеты пересчитывается раз в окно
+        self.conflation = conflation
+        self.coin_conflation: dict[COIN_ID, float] = dict(coin_conflation or {})
+        # сколько лучших монет пересчитывается без окна
+        self.bypass_top = bypass_top
+        self._pending_rescore: dict[COIN_ID, asyncio.TimerHandle] = {}
+        # граф многошаговых маршрутов, обновляется на каждой котировке
+        self.routes: RouteSearch | None = routes
+        # версии цен для читателей: срез берется за O(1) и не мешает записи
+        self.prices: PriceBook = PriceBook()
+        self._streams: set[_OpportunityStream] = set()
+        self._matrix: 'PriceMatrix | None' = None
+        self._use_matrix = use_matrix
+        # режим одного писателя: все биржи пишут в одну очередь, обновления применяет одна задача
+        self._queue: asyncio.Queue[tuple[Exchange, PriceBatch]] | None = asyncio.Queue(queue_size) if single_writer else None
+        self._ingest_task: asyncio.Task | None = None
         self.logger = logging.getLogger('analyst')
         # self.usdt_subscribers: set[AnalistSubscriber] = set()
         # self.other_subscribers: set[AnalistSubscriber] = set()
@@ -39,80 +114,164 @@ class Analyst:
         return self._coin_locks
     
     @property
-    def coin_list(self) -> dict[COIN_ID, dict[Exchange, PRICE]]:
+    def coin_list(self) -> dict[COIN_ID, CoinQuotes]:
         return self._coin_list
     
+    
     def __post_init__(self):
-        self.sorted_coin: ValueSortedDict[COIN_ID, tuple[DEPARTURE, DESTINATION, PROFIT]] =  ValueSortedDict(lambda value: value[2]) #type: ignore
- 
+        # coin_id -> (покупка, продажа, выгода в час, ROI), сортировка по выгоде
+        self.sorted_coin: ValueSortedDict[COIN_ID, tuple[DEPARTURE, DESTINATION, PROFIT, PROFIT]] =  ValueSortedDict(lambda value: value[2]) #type: ignore
+        # вторичные индексы: лучшая сделка монеты для каждой биржи покупки
+        self._by_departure: dict[Exchange, ValueSortedDict] = {}
+        # версии сделок: растут, когда у монеты меняется набор маршрутов (покупка -> продажа) или лучший маршрут
+        self._deal_shapes: dict[COIN_ID, tuple[frozenset[tuple[DEPARTURE, DESTINATION]], tuple[DEPARTURE, DESTINATION] | None]] = {}
+        self._deal_versions: dict[COIN_ID, int] = {}
+        self.deals_version: int = 0
         
         coins_set = self.mapper.analyzed_coins
         
+        if self._use_matrix:
+            # numpy - необязательная зависимость, нужна только для матричного движка
+            from core.services.Analytics.PriceMatrix import PriceMatrix
+            self._matrix = PriceMatrix(sorted(coins_set), commission=self.fees.default_fee)
+        
         for coin_id in coins_set:
             lock = self.coin_locks.get(coin_id)
-            if lock is None or not isinstance(lock, asyncio.Lock):
+            if self._queue is None and (lock is None or not isinstance(lock, asyncio.Lock)):
                 self._coin_locks[coin_id] = asyncio.Lock()
                 
-            price = self.coin_list.get(coin_id)
-            if price is None or not isinstance(price, dict):
-                self._coin_list[coin_id] = {}
+            quotes = self.coin_list.get(coin_id)
+            if quotes is None or not isinstance(quotes, CoinQuotes):
+                self._coin_list[coin_id] = CoinQuotes()
+        
+        self.fees.subscribe(self._on_fees_update)
+        self.mapper.subscribe_routes(self._on_routes_update)
         
  
 
+    @staticmethod
+    def _deal(coin_id: COIN_ID, value: tuple[DEPARTURE, DESTINATION, PROFIT, PROFIT]) -> Deal:
+        return Deal(coin_id=coin_id, departure=value[0], destination=value[1], benefit=value[2], roi=value[3])
+    
     async def get_all_benefits(self, buy_exchange: Exchange, coin_id: COIN_ID) -> Deal | None:
-        deal: Deal = Deal(
-            coin_id=coin_id,
-            departure=buy_exchange,
-            destination=buy_exchange,
-            benefit=-float('inf')
-        )
-        
-        for exchange in self.coin_list[coin_id]:
-            if exchange == buy_exchange: continue
-            benefit = self.__benefit(buy_exchange, exchange, coin_id)
-            if benefit is not None and benefit >= deal.benefit:
-                deal.destination = exchange
-                deal.benefit = benefit
-                
-        if deal.benefit == -float('inf'):
+        index = self._by_departure.get(buy_exchange)
+        if index is None or (value := index.get(coin_id)) is None:
             self.logger.error(f"Could not find any valid benefit for coin ID = {coin_id} from exchange {buy_exchange}")
             return None
-        return deal
+        return self._deal(coin_id, value)
 
     async def get_best_deal(self) -> Deal | None:
         best_coin: COIN_ID
         if len(self.sorted_coin) == 0:
             return None
         best_coin, exchanges_data = self.sorted_coin.peekitem(-1) # type: ignore
-        if exchanges_data is None or len(exchanges_data) != 3:
+        if exchanges_data is None or len(exchanges_data) != 4:
             return None
+        return self._deal(best_coin, exchanges_data)
+    
+    async def get_top_deals(self, k: int, departure: Exchange | None = None, exclude: Collection[COIN_ID] = ()) -> list[Deal]:
+        """
+        k лучших сделок по убыванию выгоды, O(k log N).
         
-        buy_exchange: DEPARTURE = exchanges_data[0]
-        sell_exchange: DESTINATION = exchanges_data[1] 
-        best_benefit: float = exchanges_data[2]
-        
-        deal = Deal(
-            coin_id=best_coin,
-            departure=buy_exchange,
-            destination=sell_exchange,
-            benefit=best_benefit
-        )
-        return deal 
+        Args:
+            departure: только сделки с покупкой на этой бирже
+            exclude: монеты, которые уже в работе
+        """
+        index = self.sorted_coin if departure is None else self._by_departure.get(departure)
+        if index is None:
+            return []
+        
+        deals: list[Deal] = []
+        for coin_id in reversed(index):
+            if coin_id in exclude:
+                continue
+            deals.append(self._deal(coin_id, index[coin_id]))
+            if len(deals) >= k:
+                break
+        return deals
+    
+    async def get_best_held(self, exchange: Exchange, coin_ids: Iterable[COIN_ID], k: int = 1) -> list[Deal]:
+        """k лучших сделок по монетам, которые уже лежат на бирже"""
+        index = self._by_departure.get(exchange)
+        if index is None:
+            return []
+        
+        held = ((coin_id, value) for coin_id in coin_ids if (value := index.get(coin_id)) is not None)
+        return [self._deal(coin_id, value) for coin_id, value in nlargest(k, held, key=lambda item: item[1][2])]
+
+    def deal_version(self, coin_id: COIN_ID | None = None) -> int:
+        """Версия маршрутов монеты, без coin_id - всех монет; выгода внутри маршрута версию не меняет"""
+        if coin_id is None:
+            return self.deals_version
+        return self._deal_versions.get(coin_id, 0)
+
+    def top_candidates(self, k: int) -> list[tuple[COIN_ID, DEPARTURE, DESTINATION]]:
+        """k монет с наибольшей выгодой, по убыванию"""
+        return [(coin_id, value[0], value[1]) for coin_id, value in reversed(self.sorted_coin.items()[-k:])]
+    
+    def candidate_names(self, exchange_name: str, k: int) -> list[COIN_NAME]:
+        """Названия монет-кандидатов, в сделках по которым участвует биржа"""
+        names = self.mapper.get_coin_name_id_for_ex(exchange_name).inverse
+        return [
+            names[coin_id]
+            for coin_id, departure, destination in self.top_candidates(k)
+            if coin_id in names and exchange_name in (departure.name, destination.name)
+        ]
 
+    async def opportunities(self, min_benefit: float | None = None, buffer: int = 64) -> AsyncIterator[Deal]:
+        """
+        Поток сделок, выгода которых поднялась до min_benefit (по умолчанию threshold).
+        Срабатывает по фронту: монета повторяется только после того, как опустилась ниже порога.
+        У каждого потребителя свой ограниченный буфер, медленный потребитель теряет старые события.
+        """
+        stream = _OpportunityStream(self.threshold if min_benefit is None else min_benefit, asyncio.Queue(buffer))
+        for coin_id in reversed(self.sorted_coin):
+            if self.sorted_coin[coin_id][2] < stream.min_benefit:
+                break
+            stream.above.add(coin_id)
+            stream.push(coin_id)
+        
+        self._streams.add(stream)
+        try:
+            while True:
+                coin_id = await stream.queue.get()
+                # к моменту чтения выгода могла упасть
+                if (value := self.sorted_coin.get(coin_id)) is not None and value[2] >= stream.min_benefit:
+                    yield self._deal(coin_id, value)
+        finally:
+            self._streams.discard(stream)
+    
+    def _notify_streams(self, coin_id: COIN_ID, benefit: PROFIT | None) -> None:
+        for stream in self._streams:
+            if benefit is not None and benefit >= stream.min_benefit:
+                if coin_id not in stream.above:
+                    stream.above.add(coin_id)
+                    stream.push(coin_id)
+            else:
+                stream.above.discard(coin_id)
+    
     async def get_all_prices(self) -> All_prices:
-        all_prices: All_prices = {}
-        for coin_id, exchange_prices in self.coin_list.items():
-            for exchange, price in exchange_prices.items():
-                if exchange not in all_prices:
-                    all_prices[exchange] = {}
-                all_prices[exchange][coin_id] = price
-        return all_prices
-    
-    async def start(self, exchanges: set[Exchange]):
+        return self.prices.snapshot.asks()
+    
+    def snapshot(self) -> PriceSnapshot:
+        """Согласованный срез цен (ask, bid) последней опубликованной версии"""
+        return self.prices.snapshot
+    
+    def price_changes_since(self, version: int) -> set[PriceKey] | None:
+        """Что изменилось после версии version; None - нужен полный срез"""
+        return self.prices.changes_since(version)
+    
+    async def start(self, exchanges: set[Exchange], fee_providers: Mapping[Exchange, 'IFeeProvider'] | None = None, fee_interval: float = 3600.0):
+        """fee_providers - источники taker-комиссий бирж, без них считается комиссия по умолчанию"""
         self.logger.info("Starting data collection")
         
         for exchange in exchanges:
             # self.logger.info(exchange)
+            if self._matrix is not None:
+                self._matrix.add_exchange(exchange)
+                for coin_id, fee_exchange in self.fees.known():
+                    if fee_exchange == exchange:
+                        self._matrix.set_fees(coin_id, exchange, *self.fees.multipliers(coin_id, exchange))
             
             @dataclass
             class Subscriber(PriceSubscriber):
@@ -123,115 +282,357 @@ class Analyst:
                     string: str = "analyst" + str(self.exchange.__hash__())
                     return hash(string)
                 
-                async def on_price_update(self, coin_id: COIN_ID, price: float) -> None:
-                    if coin_id in self.analyst.coin_list and isinstance(price, float):
-                        async with self.analyst.coin_locks[coin_id]:
-                            
-                            if price > 0:
-                                self.analyst._coin_list[coin_id][self.exchange] = price
-                                
-                                try:
-                                    benefit = await self.analyst._coin_culc(coin_id)
-                                    
-                                    if benefit is not None:
-                                        self.analyst.sorted_coin[coin_id] = benefit
-                                except Exception as e:
-                                    self.analyst.logger.error(f"Error recalculating Coid ID = {coin_id}: {e}")
-                            else:
-                                if self.exchange in self.analyst.coin_list.get(coin_id, {}):
-                                    self.analyst._coin_list[coin_id].pop(self.exchange)
-                                
-                                    try:   
-                                        benefit = await self.analyst._coin_culc(coin_id)
-                                        
-                                        if benefit is not None:
-                                            self.analyst.sorted_coin[coin_id] = benefit
-                                    except Exception as e:
-                                        self.analyst.logger.error(f"Error recalculating Coid ID = {coin_id}: {e}")
-                    else:
-                        pass
-                        # self.analyst.logger.error(f"Invalid price update for Coin ID = {coin_id} on {self.exchange}: {price}")
+                async def on_price_update(self, coin_id: COIN_ID, ask: PRICE, bid: PRICE | None = None) -> None:
+                    await self.analyst._on_price(self.exchange, coin_id, ask, bid)
+                
+                async def on_prices_update(self, batch: PriceBatch) -> None:
+                    await self.analyst._submit(self.exchange, batch)
             
             await exchange.subscribe_price(Subscriber(self, exchange))
         
-        self.logger.info("Monitoring started")
+        self._sync_rates(force=True)
+        if self.routes is not None:
+            self.routes.add_usdt_transfers([exchange.name for exchange in exchanges])
         
-    async def _coin_culc(self, coin_id: COIN_ID) -> tuple[DEPARTURE, DESTINATION, PROFIT] | None:
-        # self.logger.info(f"Coin culc for {coin_id}")
-        if len(self.coin_list[coin_id]) < 2:
-            return None
+        if self._queue is not None and self._ingest_task is None:
+            self._ingest_task = asyncio.create_task(self._ingest())
+        
+        if self.quote_ttl is not None and self._expiry_task is None:
+            self._expiry_task = asyncio.create_task(self._expire_loop())
         
-        buy_ex: Exchange | None = self.__find_min_element_for_coin(coin_id)
-        if buy_ex is None:
-            self.logger.error(f"Could not determine buy exchange for coin ID = {coin_id}")
+        if fee_providers and self._fees_task is None:
+            self._fees_task = asyncio.create_task(self.fees.launch(fee_providers, fee_interval))
+        
+        self.logger.info("Monitoring started")
+    
+    async def stop(self) -> None:
+        for task in (self._ingest_task, self._expiry_task, self._fees_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._ingest_task = None
+        self._expiry_task = None
+        self._fees_task = None
+        for handle in self._pending_rescore.values():
+            handle.cancel()
+        self._pending_rescore.clear()
+    
+    def quote_age(self, coin_id: COIN_ID, exchange: Exchange) -> float | None:
+        """Сколько секунд назад пришла котировка, None - котировки нет"""
+        if (received := self._expiry.received((coin_id, exchange))) is None:
             return None
+        return time.monotonic() - received
+    
+    async def _expire_loop(self) -> None:
+        """Двигает колесо, даже когда цены не приходят совсем"""
+        while True:
+            await asyncio.sleep(self._expiry.resolution)
+            self.expire(time.monotonic())
+    
+    def expire(self, now: float) -> int:
+        """
+        Удаляет котировки старше ttl и переоценивает затронутые монеты.
+        Выполняется без await, поэтому не пересекается с записью цен.
+        """
+        affected: set[COIN_ID] = set()
+        for coin_id, exchange in self._expiry.advance(now):
+            if self.routes is not None:
+                self.routes.on_remove(exchange.name, coin_id)
+            if self._matrix is not None:
+                self._matrix.remove(coin_id, exchange)
+            else:
+                self._coin_list[coin_id].remove(exchange)
+            self.prices.remove(exchange, coin_id)
+            affected.add(coin_id)
+        self.prices.publish()
         
-        buy_exchange: DEPARTURE = buy_ex
-        peak_point: float = -float('inf')
-        sell_exchange: DESTINATION | None = None
+        if affected:
+            self.logger.warning(f"Dropped stale quotes for {len(affected)} coins")
+        for coin_id in affected:
+            self._rescore(coin_id)
+        return len(affected)
+    
+    async def _ingest(self) -> None:
+        """Единственный писатель: забирает кадры из очереди и пересчитывает оценки"""
+        queue = self._queue
+        if queue is None:
+            return
         
-        for exchange in self._coin_list[coin_id]:
-            benefit = self.__benefit(buy_exchange, exchange, coin_id)
-            if benefit is not None and benefit >= peak_point:
-                sell_exchange = exchange
-                peak_point = benefit
+        while True:
+            exchange, batch = await queue.get()
+            self._on_prices(exchange, batch)
+            # дочитываем накопившееся без возврата в цикл событий
+            while not queue.empty():
+                exchange, batch = queue.get_nowait()
+                self._on_prices(exchange, batch)
+    
+    async def _submit(self, exchange: Exchange, batch: PriceBatch) -> None:
+        if self._queue is not None:
+            await self._queue.put((exchange, batch))
+        else:
+            self._on_prices(exchange, batch)
+    
+    async def _on_price(self, exchange: Exchange, coin_id: COIN_ID, ask: PRICE, bid: PRICE | None = None) -> None:
+        if self._queue is not None:
+            await self._queue.put((exchange, [(coin_id, ask, ask if bid is None else bid)])) # type: ignore
+            return
         
-        if sell_exchange is None:
-            self.logger.error(f"Could not determine sell exchange for coin ID = {coin_id}")
-            return None
+        if coin_id not in self.coin_locks:
+            return
         
-        return buy_exchange, sell_exchange, peak_point
+        async with self.coin_locks[coin_id]:
+            self._apply_price(exchange, coin_id, ask, bid)
+            self.prices.publish()
     
-    def __find_min_element_for_coin(self, coin_id: COIN_ID) -> Exchange | None:
-        if coin_id not in self.coin_list:
-            self.logger.error(f"Coin ID = {coin_id} not found in coin list")
-            return None
-        elif len(self.coin_list[coin_id]) == 0:
-            self.logger.error(f"No exchanges available for coin ID = {coin_id}")
-            return None
+    def _on_prices(self, exchange: Exchange, batch: PriceBatch) -> None:
+        # весь кадр применяется без await, поэтому блокировки по монетам не нужны
+        for coin_id, ask, bid in batch:
+            if coin_id in self._coin_list:
+                self._apply_price(exchange, coin_id, ask, bid) # type: ignore
+        self.prices.publish()
+    
+    def _apply_price(self, exchange: Exchange, coin_id: COIN_ID, ask: PRICE, bid: PRICE | None = None) -> None:
+        if not isinstance(ask, float):
+            # self.logger.error(f"Invalid price update for Coin ID = {coin_id} on {exchange}: {ask}")
+            return
+        
+        if bid is None:
+            bid = ask
+        
+        if self.quote_ttl is not None:
+            if ask > 0 and bid > 0:
+                ttl = self.exchange_ttl.get(exchange.name, self.quote_ttl)
+                self._expiry.touch((coin_id, exchange), time.monotonic(), ttl)
+            else:
+                self._expiry.discard((coin_id, exchange))
+        
+        if ask > 0 and bid > 0:
+            self.prices.put(exchange, coin_id, ask, bid)
         else:
-            exchanges_prices: dict[Exchange, float] = self.coin_list[coin_id]
-            min_exchange: Exchange = min(exchanges_prices, key=exchanges_prices.__getitem__)
-            return min_exchange
-                
-    def __benefit(self, buy_exchange: DEPARTURE, sell_exchange: DESTINATION, coin_id: COIN_ID) -> float | None:
-        try:
-            procedure_time = 1.0
-            
-            if procedure_time is None or procedure_time <= 0:
-                return None
-                
-            roi = self.__roi(buy_exchange, sell_exchange, coin_id)
-            if roi is None:
-                return None
-            return roi / procedure_time
-            
-        except ZeroDivisionError:
-            self.logger.error(f"Procedure time is zero for coin ID = {coin_id} between {buy_exchange} and {sell_exchange}")
-            return None
-        except Exception:
-            self.logger.error(f"Unexpected error calculating benefit for coin ID = {coin_id} between {buy_exchange} and {sell_exchange}")
-            return None
-
-    def __roi(self, buy_exchange: DEPARTURE, sell_exchange: DESTINATION, coin_id: COIN_ID) -> float | None:
-        try:
-            # buy_commission: float = self.buy_commissions[coin_id][buy_exchange] 
-            # sale_commission: float = self.sell_commissions[coin_id][sell_exchange]
-            sale_commission = 0.01
-            buy_commission = 0.01
-            buy_price: float = self.coin_list[coin_id][buy_exchange]
-            sale_price: float = self.coin_list[coin_id][sell_exchange]
-            
-            roi = ((sale_price * (1.0 - sale_commission) * (1.0 - buy_commission)) / buy_price) - 1
-                
-            return roi
+            self.prices.remove(exchange, coin_id)
         
-        except KeyError as e:
-            self.logger.error(f"Missing data for ROI calculation: {e}")
-            return None
-        except ZeroDivisionError:
-            self.logger.error(f"Zero buy price for Coin ID = {coin_id} on {buy_exchange}")
-            return None
-        except Exception as e:
-            self.logger.error(f"Unexpected error in ROI calculation: {e}")
-            return None
\ No newline at end of file
+        if self.routes is not None:
+            if ask > 0 and bid > 0:
+                buy_mult, sell_mult = self.fees.multipliers(coin_id, exchange)
+                self.routes.on_quote(exchange.name, coin_id, ask * buy_mult, bid * sell_mult)
+            else:
+                self.routes.on_remove(exchange.name, coin_id)
+        
+        if self._matrix is not None:
+            self._matrix.set(coin_id, exchange, ask, bid)
+            self._request_rescore(coin_id)
+            return
+        
+        # покупаем по ask на одной бирже, продаем по bid на другой
+        quotes = self._coin_list[coin_id]
+        previous = quotes.net(exchange)
+        if ask > 0 and bid > 0:
+            if quotes.get(exchange) == (ask, bid):
+                return
+            changed = quotes.update(exchange, ask, bid, *self.fees.multipliers(coin_id, exchange))
+        else:
+            changed = quotes.remove(exchange)
+        
+        if changed:
+            self._request_rescore(coin_id)
+        elif previous is not None or exchange in quotes:
+            self._rescore_departure(coin_id, exchange, previous)
+    
+    def _request_rescore(self, coin_id: COIN_ID) -> None:
+        """Пересчет сразу или один раз по закрытию окна склейки монеты"""
+        if coin_id in self._pending_rescore:
+            return
+        
+        window = self.coin_conflation.get(coin_id, self.conflation)
+        if window <= 0 or self._is_top(coin_id):
+            self._rescore(coin_id)
+            return
+        
+        self._pending_rescore[coin_id] = asyncio.get_running_loop().call_later(window, self._flush_rescore, coin_id)
+    
+    def _rescore_departure(self, coin_id: COIN_ID, exchange: Exchange, previous: tuple[PRICE, PRICE] | None) -> None:
+        """
+        Края цен не изменились, но выгода взвешена временем перевода, и лучшая пара может быть не на краях.
+        Пересчитываются строка самой биржи и строки, которые продавали на ней, если ее bid упал или котировка ушла.
+        Выросший bid может стать лучшей продажей для любой строки - тогда монета пересчитывается целиком.
+        previous - (ask, bid) биржи с комиссией до обновления.
+        """
+        if coin_id in self._pending_rescore:
+            # полный пересчет монеты уже запланирован
+            return
+        quotes = self._coin_list[coin_id]
+        current = quotes.net(exchange)
+        if previous is None or (current is not None and current[1] > previous[1]):
+            self._rescore(coin_id)
+            return
+        
+        self._sync_rates()
+        rate = partial(self._pair_rate, coin_id)
+        bid_fell = current is None or current[1] < previous[1]
+        pairs: list[tuple[DEPARTURE, DESTINATION, PROFIT, PROFIT]] = []
+        for departure, index in self._by_departure.items():
+            if departure is exchange or (pair := index.get(coin_id)) is None:
+                continue
+            if bid_fell and pair[1] is exchange and (pair := quotes.best_sell(departure, rate, self._rate_bounds)) is None:
+                continue
+            pairs.append(pair)
+        if current is not None and (pair := quotes.best_sell(exchange, rate, self._rate_bounds)) is not None:
+            pairs.append(pair)
+        self._store(coin_id, pairs)
+    
+    def _flush_rescore(self, coin_id: COIN_ID) -> None:
+        if self._pending_rescore.pop(coin_id, None) is not None:
+            self._rescore(coin_id)
+    
+    def _is_top(self, coin_id: COIN_ID) -> bool:
+        if self.bypass_top <= 0 or (value := self.sorted_coin.get(coin_id)) is None:
+            return False
+        _, last = self.sorted_coin.peekitem(-min(self.bypass_top, len(self.sorted_coin)))
+        return value[2] >= last[2]
+    
+    def _rescore(self, coin_id: COIN_ID) -> None:
+        if (handle := self._pending_rescore.pop(coin_id, None)) is not None:
+            handle.cancel()
+        self._sync_rates()
+        if self._matrix is not None:
+            pairs = self._matrix.best_by_departure(coin_id)
+        else:
+            pairs = self._coin_list[coin_id].best_by_departure(partial(self._pair_rate, coin_id), self._rate_bounds)
+        self._store(coin_id, pairs)
+    
+    def _store(self, coin_id: COIN_ID, pairs: list[tuple[DEPARTURE, DESTINATION, PROFIT, PROFIT]]) -> None:
+        """Записывает оценки монеты в sorted_coin и индексы по биржам покупки"""
+        departures: dict[Exchange, tuple[DEPARTURE, DESTINATION, PROFIT, PROFIT]] = {pair[0]: pair for pair in pairs}
+        for exchange, index in self._by_departure.items():
+            if exchange not in departures:
+                index.pop(coin_id, None)
+        for exchange, pair in departures.items():
+            if (index := self._by_departure.get(exchange)) is None:
+                index = self._by_departure[exchange] = ValueSortedDict(lambda value: value[2])
+            index[coin_id] = pair
+        
+        if pairs:
+            best = self.sorted_coin[coin_id] = max(pairs, key=lambda pair: pair[2])
+        else:
+            best = None
+            if coin_id in self.sorted_coin:
+                # меньше двух живых котировок - сделки больше нет
+                del self.sorted_coin[coin_id]
+        
+        shape = (frozenset((pair[0], pair[1]) for pair in pairs), None if best is None else (best[0], best[1]))
+        if self._deal_shapes.get(coin_id) != shape:
+            self._deal_shapes[coin_id] = shape
+            self._deal_versions[coin_id] = self._deal_versions.get(coin_id, 0) + 1
+            self.deals_version += 1
+        
+        if self._streams:
+            self._notify_streams(coin_id, None if best is None else best[2])
+    
+    def _on_fees_update(self, changed: set[FeeKey]) -> None:
+        """Комиссии обновились - пересчитываем цены с комиссией только у затронутых монет"""
+        affected: set[COIN_ID] = set()
+        for coin_id, exchange in changed:
+            if coin_id not in self._coin_list:
+                continue
+            multipliers = self.fees.multipliers(coin_id, exchange)
+            if self._matrix is not None:
+                if self._matrix.set_fees(coin_id, exchange, *multipliers):
+                    affected.add(coin_id)
+                continue
+            quotes = self._coin_list[coin_id]
+            previous = quotes.net(exchange)
+            if quotes.reprice(exchange, *multipliers):
+                affected.add(coin_id)
+            elif previous is not None:
+                self._rescore_departure(coin_id, exchange, previous)
+        
+        for coin_id in affected:
+            self._rescore(coin_id)
+    
+    def _add_coins(self, coin_ids: Iterable[COIN_ID]) -> list[COIN_ID]:
+        """
+        Начинает отслеживать монеты, которые стали торговаться хотя бы на двух биржах уже после старта
+        (refresh или warm start Mapper). Монеты, выпавшие из Mapper, не удаляются: их котировки уходят по ttl.
+        """
+        analyzed = self.mapper.analyzed_coins
+        added = [coin_id for coin_id in coin_ids if coin_id not in self._coin_list and coin_id in analyzed]
+        for coin_id in added:
+            self._coin_list[coin_id] = CoinQuotes()
+            if self._queue is None:
+                self._coin_locks[coin_id] = asyncio.Lock()
+        
+        if added and self._matrix is not None:
+            self._matrix.add_coins(added)
+            for coin_id, exchange in self.fees.known():
+                if coin_id in added:
+                    self._matrix.set_fees(coin_id, exchange, *self.fees.multipliers(coin_id, exchange))
+        if added:
+            self.logger.info(f"Tracking {len(added)} new coins")
+        return added
+    
+    def _on_routes_update(self, coin_ids: set[COIN_ID]) -> None:
+        """Маршруты перевода изменились - сбрасываем множители и пересчитываем только эти монеты"""
+        self._add_coins(coin_ids)
+        affected = [coin_id for coin_id in coin_ids if coin_id in self._coin_list]
+        if not affected:
+            return
+        for key in [key for key in self._rates if key[0] in coin_ids]:
+            del self._rates[key]
+        
+        if self._matrix is not None:
+            exchanges = self._matrix.exchanges
+            for coin_id in affected:
+                for buy in exchanges:
+                    for sell in exchanges:
+                        if buy is not sell:
+                            self._matrix.set_rate(coin_id, buy, sell, self._pair_rate(coin_id, buy, sell))
+        
+        for coin_id in affected:
+            self._rescore(coin_id)
+    
+    def _pair_rate(self, coin_id: COIN_ID, buy_exchange: Exchange, sell_exchange: Exchange) -> float:
+        """Множитель, переводящий ROI сделки в ROI за час перевода монеты buy_exchange -> sell_exchange"""
+        key = (coin_id, buy_exchange, sell_exchange)
+        if (rate := self._rates.get(key)) is None:
+            coin = self.mapper.get_best_coin_transfer(buy_exchange.name, sell_exchange.name, coin_id)
+            seconds = self.transfer_times.duration(buy_exchange.name, sell_exchange.name, coin.chain if coin else None)
+            rate = self._rates[key] = 3600.0 / seconds
+        return rate
+    
+    def _sync_rates(self, force: bool = False) -> None:
+        """Сбрасывает кэш множителей после новых наблюдений времени перевода"""
+        times = self.transfer_times
+        if not force and self._rates_version == times.version:
+            return
+        
+        first = self._rates_version < 0
+        self._rates.clear()
+        self._rates_version = times.version
+        self._rate_bounds = (3600.0 / times.max_seconds, 3600.0 / times.min_seconds)
+        
+        if self._matrix is not None:
+            exchanges = self._matrix.exchanges
+            for coin_id in self._coin_list:
+                for buy in exchanges:
+                    for sell in exchanges:
+                        if buy is not sell:
+                            self._matrix.set_rate(coin_id, buy, sell, self._pair_rate(coin_id, buy, sell))
+        
+        if not first:
+            # время перевода изменилось - оценки всех монет устарели
+            self.recalculate_all()
+    
+    def recalculate_all(self) -> None:
+        """Полный пересчет оценок; матричный движок считает все монеты одной векторной операцией"""
+        self._sync_rates()
+        if self._matrix is None:
+            for coin_id in self._coin_list:
+                self._rescore(coin_id)
+            return
+        
+        scored: set[COIN_ID] = set()
+        for coin_id, pairs in self._matrix.iter_best_by_departure():
+            self._store(coin_id, pairs)
+            scored.add(coin_id)
+        for coin_id in [coin_id for coin_id in self.sorted_coin if coin_id not in scored]:
+            self._store(coin_id, [])
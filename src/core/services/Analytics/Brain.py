@@ -1,14 +1,40 @@
 import logging
+import math
+import time
+from typing import Iterable, Mapping
 from core.models.dto import CoinDict, Coins, Recommendation, Trade, Transfer, Wait
 from dataclasses import dataclass, field
 from core.interfaces import Exchange
 from core.interfaces.Dto.Asset import Asset
 from core.models import Coin, CoinPair, Deal, Commission
-from core.models.types import FEE
+from core.models.types import AMOUNT, COIN_ID, DEPARTURE_NAME, DESTINATION_NAME, FEE
+from core.services.Analytics.Allocator import CapitalAllocator
 from core.services.Analytics.Analyst import Analyst
+from core.services.Analytics.Slippage import SlippageModel
 from core.services.Mapper import Mapper
 
 
+class _Lookups:
+    """Запросы к Mapper в рамках одного анализа: каждая комиссия и маршрут ищутся один раз"""
+    
+    def __init__(self, mapper: Mapper) -> None:
+        self.mapper = mapper
+        self._fees: dict[tuple[Exchange, Exchange, COIN_ID], FEE | None] = {}
+        self._transfers: dict[tuple[DEPARTURE_NAME, DESTINATION_NAME, COIN_ID], Coin | None] = {}
+    
+    def fee(self, deal: Deal) -> FEE | None:
+        key = (deal.departure, deal.destination, deal.coin_id)
+        if key not in self._fees:
+            self._fees[key] = self.mapper.get_fee(deal)
+        return self._fees[key]
+    
+    def transfer(self, departure_name: DEPARTURE_NAME, destination_name: DESTINATION_NAME, coin_id: COIN_ID) -> Coin | None:
+        key = (departure_name, destination_name, coin_id)
+        if key not in self._transfers:
+            self._transfers[key] = self.mapper.get_best_coin_transfer(departure_name, destination_name, coin_id)
+        return self._transfers[key]
+
+
 @dataclass
 class Brain:
     analyst: 'Analyst'
@@ -16,26 +42,172 @@ class Brain:
     # _coin_list: CoinPair
     mapper: Mapper
     _additive: float = 2.0
+    slippage: SlippageModel | None = None
+    # делит USDT между несколькими сделками; без него весь остаток идет в одну сделку
+    allocator: CapitalAllocator | None = None
+    # сколько следующих по выгоде сделок смотреть, если лучшая уже в работе у другого Manager
+    alternatives: int = 5
+    _in_work: set[COIN_ID] = field(default_factory=set)
+    # рекомендация по монете повторяется без пересчета, пока сумма в той же корзине (шаг amount_step),
+    # маршруты монеты в Analyst не менялись, выгода сделки не перешла порог комиссии и не прошло cache_ttl секунд;
+    # USDT не кешируется: его рекомендация зависит от всех лучших сделок и устаревает на каждом тике
+    cache_ttl: float = 5.0
+    amount_step: float = 0.05
+    _cache: dict[tuple[Exchange, COIN_ID], tuple[int | None, int, float, Recommendation, tuple[Deal, FEE] | None]] = field(default_factory=dict)
     _logger: logging.Logger = field(default_factory=lambda: logging.getLogger('Brain'))
     
+    def __post_init__(self) -> None:
+        self.mapper.subscribe_routes(self.invalidate)
     
     async def analyse(self, exchange: Exchange, asset: Asset) -> Recommendation:
         if asset.coin_id == self.mapper.usdt:
-            return await self.__usdt_analyse(exchange, asset)
-        elif asset.coin_id in self.mapper.analyzed_coins:
-            return await self.__other_analyse(exchange, asset)
+            return await self.__analyse(exchange, asset)
+        
+        # купленная монета дошла до Manager - резерв под сделку снимается и при попадании в кеш
+        self.release(asset.coin_id)
+        key = (exchange, asset.coin_id)
+        bucket = self.__bucket(asset.amount)
+        version = self.analyst.deal_version(asset.coin_id)
+        now = time.monotonic()
+        if (cached := self._cache.get(key)) is not None and cached[0] == bucket and cached[1] == version and cached[2] > now:
+            if await self.__same_decision(exchange, asset, cached[4]):
+                return cached[3]
+        
+        if self.mapper.is_analyzed(asset.coin_id):
+            rec, guard = await self.__other_analyse(exchange, asset, _Lookups(self.mapper))
         else:
-            self._logger.warning(f"Coin ID = {asset.coin_id} not found in coin list")
-            sell: Trade = Trade(
-                buy_coin=self.mapper.usdt,
-                sell_coin=asset.coin_id,
-            )
-            return sell
+            rec, guard = self.__unknown(asset), None
+        self._cache[key] = (bucket, version, now + self.cache_ttl, rec, guard)
+        return rec
+    
+    async def __same_decision(self, exchange: Exchange, asset: Asset, guard: tuple[Deal, FEE] | None) -> bool:
+        """
+        Версия сделок меняется только со сменой маршрутов, выгода внутри маршрута - нет:
+        закешированное решение верно, пока сделка ведет туда же и остается по ту же сторону порога комиссии
+        """
+        if guard is None:
+            return True
+        deal, fee = guard
+        current: Deal | None = await self.analyst.get_all_benefits(exchange, asset.coin_id)
+        if current is None or current.destination is not deal.destination:
+            return False
+        return self.__pays(current, asset.amount, fee) == self.__pays(deal, asset.amount, fee)
+    
+    def invalidate(self, coin_ids: Iterable[COIN_ID] | None = None) -> None:
+        """Сбрасывает закешированные рекомендации монет, без coin_ids - все"""
+        if coin_ids is None:
+            self._cache.clear()
+            return
+        coins = set(coin_ids)
+        for key in [key for key in self._cache if key[1] in coins]:
+            del self._cache[key]
+    
+    def __bucket(self, amount: AMOUNT) -> int | None:
+        if amount <= 0:
+            return None
+        return math.floor(math.log(amount) / math.log1p(self.amount_step))
+    
+    async def __analyse(self, exchange: Exchange, asset: Asset) -> Recommendation:
+        lookups = _Lookups(self.mapper)
+        if asset.coin_id == self.mapper.usdt:
+            return await self.__usdt_analyse(exchange, asset, lookups)
+        elif self.mapper.is_analyzed(asset.coin_id):
+            rec, _ = await self.__other_analyse(exchange, asset, lookups)
+            return rec
+        else:
+            return self.__unknown(asset)
+    
+    def __unknown(self, asset: Asset) -> Trade:
+        self._logger.warning(f"Coin ID = {asset.coin_id} not found in coin list")
+        sell: Trade = Trade(
+            buy_coin=self.mapper.usdt,
+            sell_coin=asset.coin_id,
+        )
+        return sell
+    
+    async def analyse_portfolio(self, balances_by_exchange: Mapping[Exchange, Iterable[Asset]]) -> dict[Exchange, dict[COIN_ID, Recommendation]]:
+        """
+        Рекомендации для всех активов на всех биржах за один проход.
+        Сделки, комиссии и маршруты запрашиваются один раз на весь портфель.
+        USDT распределяется одним решением: крупные остатки первыми выбирают лучшие сделки,
+        и одна монета не покупается на несколько остатков сразу.
+        """
+        lookups = _Lookups(self.mapper)
+        result: dict[Exchange, dict[COIN_ID, Recommendation]] = {}
+        usdt_assets: list[tuple[Exchange, Asset]] = []
         
-    async def __usdt_analyse(self, exchange: Exchange, asset: Asset) -> Recommendation:
-        deal: Deal | None = await self.analyst.get_best_deal();
+        for exchange, assets in balances_by_exchange.items():
+            recommendations = result.setdefault(exchange, {})
+            for asset in assets:
+                if asset.coin_id == self.mapper.usdt:
+                    usdt_assets.append((exchange, asset))
+                elif self.mapper.is_analyzed(asset.coin_id):
+                    recommendations[asset.coin_id], _ = await self.__other_analyse(exchange, asset, lookups)
+                else:
+                    recommendations[asset.coin_id] = self.__unknown(asset)
         
-        if deal is None: 
+        if not usdt_assets:
+            return result
+        
+        deals: list[Deal] = await self.analyst.get_top_deals(self.alternatives * len(usdt_assets), exclude=self._in_work)
+        taken: set[COIN_ID] = set()
+        for exchange, asset in sorted(usdt_assets, key=lambda item: item[1].amount, reverse=True):
+            rec: Recommendation = Wait(seconds=10)
+            for deal in deals:
+                if deal.coin_id in taken:
+                    continue
+                if (found := self.__usdt_deal(exchange, asset, asset.coin_id, deal, lookups)) is not None:
+                    rec = found
+                    taken.add(deal.coin_id)
+                    if isinstance(found, Trade):
+                        self._in_work.add(deal.coin_id)
+                    break
+            result[exchange][asset.coin_id] = rec
+        return result
+        
+    async def allocate_usdt(self, balances_by_exchange: Mapping[Exchange, AMOUNT]) -> dict[Exchange, list[Recommendation]]:
+        """
+        Делит USDT бирж между несколькими сделками с учетом глубины стаканов и времени переводов.
+        Покупки на бирже с USDT идут сделками Trade с объемом, остальное - переводами USDT на биржу покупки.
+        """
+        allocator = self.allocator or CapitalAllocator(self.slippage)
+        lookups = _Lookups(self.mapper)
+        usdt = self.mapper.usdt
+        deals: list[Deal] = await self.analyst.get_top_deals(self.alternatives * max(len(balances_by_exchange), 1), exclude=self._in_work)
+        
+        def deal_cost(deal: Deal) -> AMOUNT | None:
+            if (fee := lookups.fee(deal)) is None:
+                return None
+            return fee + self._additive
+        
+        def transfer(source: Exchange, departure: Exchange) -> tuple[AMOUNT, float] | None:
+            coin = lookups.transfer(source.name, departure.name, usdt)
+            if coin is None or not coin.has_known_fee:
+                return None
+            return coin.fee, self.analyst.transfer_times.duration(source.name, departure.name, coin.chain)
+        
+        result: dict[Exchange, list[Recommendation]] = {exchange: [] for exchange in balances_by_exchange}
+        for allocation in allocator.allocate(balances_by_exchange, deals, deal_cost, transfer):
+            deal = allocation.deal
+            if allocation.exchange is deal.departure:
+                result[allocation.exchange].append(Trade(buy_coin=deal.coin_id, sell_coin=usdt, amount=allocation.notional))
+                self._in_work.add(deal.coin_id)
+            else:
+                result[allocation.exchange].append(Transfer(coin=usdt, departure=allocation.exchange, destination=deal.departure, amount=allocation.notional))
+        
+        for recommendations in result.values():
+            if not recommendations:
+                recommendations.append(Wait(seconds=10))
+        return result
+    
+    def release(self, coin_id: COIN_ID) -> None:
+        """Монета больше не в работе и снова доступна для рекомендаций"""
+        self._in_work.discard(coin_id)
+        
+    async def __usdt_analyse(self, exchange: Exchange, asset: Asset, lookups: _Lookups) -> Recommendation:
+        deals: list[Deal] = await self.analyst.get_top_deals(self.alternatives, exclude=self._in_work)
+        
+        if not deals: 
             self._logger.info("No deals available")
             return Wait(seconds=10)
         
@@ -45,21 +217,31 @@ class Brain:
             self._logger.info(f"Coin ID = {asset.coin_id} not found in coin list")
             return Wait(seconds=10)
         
-        deal_fee: FEE | None = self.mapper.get_fee(deal)
+        for deal in deals:
+            if (rec := self.__usdt_deal(exchange, asset, coin_id, deal, lookups)) is not None:
+                if isinstance(rec, Trade):
+                    # другие Manager не покупают ту же монету, пока она не дошла до перевода
+                    self._in_work.add(deal.coin_id)
+                return rec
+            
+        return Wait(seconds=10)
+    
+    def __usdt_deal(self, exchange: Exchange, asset: Asset, coin_id: COIN_ID, deal: Deal, lookups: _Lookups) -> Recommendation | None:
+        deal_fee: FEE | None = lookups.fee(deal)
         
         if deal_fee is None: 
             self._logger.info(f"Coin with id {deal.coin_id} not found in commission list deal")
-            return Wait(seconds=10)
+            return None
         
         if exchange is deal.departure:
             usdt_fee: FEE | None = None
-            if coin := self.mapper.get_best_coin_transfer(exchange.name, deal.departure.name, coin_id): usdt_fee = coin.fee
+            if coin := lookups.transfer(exchange.name, deal.departure.name, coin_id): usdt_fee = coin.fee
         
             if usdt_fee is None: 
                 self._logger.info(f"Coin with id {str(coin_id)} not found in commission list usdt")
-                return Wait(seconds=10)
+                return None
             
-            profit: float = (asset.amount - usdt_fee) * (1 + deal.benefit) - self._additive
+            profit: float = self.__expected_value(deal, asset.amount - usdt_fee) - self._additive
         
             if(profit >= deal_fee):
                 transfer = Transfer(
@@ -69,7 +251,7 @@ class Brain:
                 )
                 return transfer
         else:
-            profit: float = (asset.amount) * (1 + deal.benefit) - self._additive
+            profit: float = self.__expected_value(deal, asset.amount) - self._additive
         
             if(profit >= deal_fee):
                 trade = Trade(
@@ -78,9 +260,28 @@ class Brain:
                 )
                 return trade
             
-        return Wait(seconds=10)
+        return None
     
-    async def __other_analyse(self, current_exchange: Exchange, asset: Asset) -> Recommendation:
+    def __expected_value(self, deal: Deal, notional: AMOUNT) -> AMOUNT:
+        """USDT после сделки на notional: по стаканам, если они есть, иначе по лучшим ценам"""
+        if self.slippage is not None:
+            value = self.slippage.realizable_value(deal.coin_id, deal.departure, deal.destination, notional)
+            if value is not None:
+                return value
+        return notional * (1 + self.__roi(deal))
+    
+    @staticmethod
+    def __roi(deal: Deal) -> float:
+        # benefit ранжирует сделки по выгоде в час, для суммы нужен ROI самой сделки
+        return deal.benefit if deal.roi is None else deal.roi
+    
+    def __pays(self, deal: Deal, amount: AMOUNT, fee: FEE) -> bool:
+        return amount * (1 + self.__roi(deal)) - self._additive >= fee
+    
+    async def __other_analyse(self, current_exchange: Exchange, asset: Asset, lookups: _Lookups) -> tuple[Recommendation, tuple[Deal, FEE] | None]:
+        """Рекомендация и сделка с комиссией, по которым она принята"""
+        # купленная монета дошла до Manager - резерв под сделку больше не нужен
+        self.release(asset.coin_id)
         deal: Deal | None = await self.analyst.get_all_benefits(current_exchange, asset.coin_id);
         
         sell: Trade = Trade(
@@ -90,29 +291,27 @@ class Brain:
         
         if deal is None: 
             self._logger.info("No deals available")
-            return sell
+            return sell, None
         
         
         coin_id: int | None = asset.coin_id #self._coin_list.inverse.get(asset.coin_id)
         
         if coin_id is None: 
             self._logger.info(f"Coin ID = {coin_id} not found in coin list")
-            return sell
+            return sell, None
         
-        deal_fee: FEE | None = self.mapper.get_fee(deal)
+        deal_fee: FEE | None = lookups.fee(deal)
         
         if deal_fee is None: 
             self._logger.info(f"Coin with id {coin_id} not found in commission list")
-            return sell
-        
-        profit: float = asset.amount * (1 + deal.benefit) - self._additive
+            return sell, None
         
-        if(profit >= deal_fee):   
+        if self.__pays(deal, asset.amount, deal_fee):
             transfer = Transfer(
                 coin=coin_id,
                 departure=current_exchange,
                 destination=deal.destination,
             )
-            return transfer
+            return transfer, (deal, deal_fee)
         
-        return sell
\ No newline at end of file
+        return sell, (deal, deal_fee)
\ No newline at end of file
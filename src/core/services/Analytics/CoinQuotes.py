@@ -0,0 +1,174 @@
+from operator import itemgetter
+from typing import Callable
+
+from sortedcollections import SortedListWithKey
+
+from core.models.ExchangeBase import ExchangeBase
+from core.models.types import PRICE, PROFIT
+
+
+Quote = tuple[PRICE, ExchangeBase]
+# множитель выгоды для пары (покупка, продажа), например 3600 / длительность перевода в секундах
+Rate = Callable[[ExchangeBase, ExchangeBase], float]
+# (buy, sell, выгода с учетом rate, ROI)
+Pair = tuple[ExchangeBase, ExchangeBase, PROFIT, PROFIT]
+
+
+class CoinQuotes:
+    """
+    Котировки одной монеты по биржам.
+    Ask и bid хранятся в отсортированных списках, поэтому лучшая пара берется с краев за O(1),
+    а обновление одной биржи стоит O(log E).
+    В списки попадают цены с уже учтенной комиссией: ask * buy_mult и bid * sell_mult.
+    """
+
+    __slots__ = ('_quotes', '_asks', '_bids')
+
+    def __init__(self) -> None:
+        # биржа -> (ask, bid, ask с комиссией, bid с комиссией)
+        self._quotes: dict[ExchangeBase, tuple[PRICE, PRICE, PRICE, PRICE]] = {}
+        self._asks: SortedListWithKey = SortedListWithKey(key=itemgetter(0))
+        self._bids: SortedListWithKey = SortedListWithKey(key=itemgetter(0))
+
+    def __len__(self) -> int:
+        return len(self._quotes)
+
+    def __contains__(self, exchange: object) -> bool:
+        return exchange in self._quotes
+
+    def __iter__(self):
+        return iter(self._quotes)
+
+    def get(self, exchange: ExchangeBase) -> tuple[PRICE, PRICE] | None:
+        """(ask, bid) биржи без учета комиссии"""
+        if (quote := self._quotes.get(exchange)) is None:
+            return None
+        return quote[0], quote[1]
+
+    def net(self, exchange: ExchangeBase) -> tuple[PRICE, PRICE] | None:
+        """(ask, bid) биржи с учетом комиссии"""
+        if (quote := self._quotes.get(exchange)) is None:
+            return None
+        return quote[2], quote[3]
+
+    def _edges(self) -> tuple:
+        # для выбора пары используются только два лучших ask и два лучших bid
+        asks, bids = self._asks, self._bids
+        return tuple(asks[:2]), tuple(bids[-2:])
+
+    def update(self, exchange: ExchangeBase, ask: PRICE, bid: PRICE, buy_mult: float = 1.0, sell_mult: float = 1.0, edges_only: bool = True) -> bool:
+        """
+        Обновляет котировку биржи.
+
+        Args:
+            edges_only: при False любое изменение котировки требует переоценки
+                (нужно, когда пары взвешиваются через rate и лучшая пара может быть не на краях)
+
+        Returns:
+            True, если изменились крайние значения и монету нужно переоценить
+        """
+        quote = (ask, bid, ask * buy_mult, bid * sell_mult)
+        before = self._edges()
+        if (old := self._quotes.get(exchange)) is not None:
+            if old == quote:
+                return False
+            self._asks.remove((old[2], exchange))
+            self._bids.remove((old[3], exchange))
+
+        self._quotes[exchange] = quote
+        self._asks.add((quote[2], exchange))
+        self._bids.add((quote[3], exchange))
+        return not edges_only or before != self._edges()
+
+    def reprice(self, exchange: ExchangeBase, buy_mult: float, sell_mult: float, edges_only: bool = True) -> bool:
+        """Пересчитывает цены биржи с новыми комиссиями"""
+        if (old := self._quotes.get(exchange)) is None:
+            return False
+        return self.update(exchange, old[0], old[1], buy_mult, sell_mult, edges_only)
+
+    def remove(self, exchange: ExchangeBase) -> bool:
+        if (old := self._quotes.pop(exchange, None)) is None:
+            return False
+
+        before = self._edges()
+        self._asks.remove((old[2], exchange))
+        self._bids.remove((old[3], exchange))
+        return before != self._edges()
+
+    def best_pair(self, rate: Rate | None = None, bounds: tuple[float, float] = (1.0, 1.0)) -> Pair | None:
+        """
+        Лучшая пара (покупка по ask, продажа по bid) на разных биржах.
+
+        Args:
+            rate: множитель выгоды пары; без него выгода равна ROI и пара берется с краев за O(1)
+            bounds: (min, max) значений rate, нужны для отсечения перебора
+        """
+        if len(self._quotes) < 2:
+            return None
+
+        asks, bids = self._asks, self._bids
+        if rate is not None:
+            return self._search(asks, rate, bounds)
+
+        ask, buy = asks[0]
+        bid, sell = bids[-1]
+
+        if buy == sell:
+            # обе лучшие стороны на одной бирже - берем лучшую из двух соседних пар
+            ask2, buy2 = asks[1]
+            bid2, sell2 = bids[-2]
+            if bid2 / ask >= bid / ask2:
+                bid, sell = bid2, sell2
+            else:
+                ask, buy = ask2, buy2
+
+        roi = bid / ask - 1.0
+        return buy, sell, roi, roi
+
+    def best_sell(self, buy_exchange: ExchangeBase, rate: Rate | None = None, bounds: tuple[float, float] = (1.0, 1.0)) -> Pair | None:
+        """Лучшая биржа для продажи при покупке на buy_exchange"""
+        if (quote := self._quotes.get(buy_exchange)) is None or len(self._quotes) < 2:
+            return None
+
+        if rate is not None:
+            return self._search(((quote[2], buy_exchange),), rate, bounds)
+
+        bids = self._bids
+        bid, sell = bids[-1]
+        if sell == buy_exchange:
+            bid, sell = bids[-2]
+
+        roi = bid / quote[2] - 1.0
+        return buy_exchange, sell, roi, roi
+
+    def best_by_departure(self, rate: Rate | None = None, bounds: tuple[float, float] = (1.0, 1.0)) -> list[Pair]:
+        """Лучшая пара для каждой биржи покупки"""
+        if len(self._quotes) < 2:
+            return []
+        return [pair for exchange in self._quotes if (pair := self.best_sell(exchange, rate, bounds)) is not None]
+
+    def _search(self, asks, rate: Rate, bounds: tuple[float, float]) -> Pair | None:
+        """
+        Перебор пар от лучших цен к худшим с отсечением:
+        выгода пары не больше roi * max(rate) при roi > 0 и roi * min(rate) иначе,
+        а эта граница не растет по мере удаления от краев.
+        """
+        low, high = bounds
+        bids = self._bids
+        top_bid = bids[-1][0]
+        best: Pair | None = None
+        best_value = float('-inf')
+
+        for ask, buy in asks:
+            roi = top_bid / ask - 1.0
+            if roi * (high if roi > 0 else low) <= best_value:
+                break
+            for bid, sell in reversed(bids):
+                if sell == buy:
+                    continue
+                roi = bid / ask - 1.0
+                if roi * (high if roi > 0 else low) <= best_value:
+                    break
+                if (value := roi * rate(buy, sell)) > best_value:
+                    best, best_value = (buy, sell, value, roi), value
+        return best
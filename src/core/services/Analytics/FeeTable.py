@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from typing import Callable, Iterable, Mapping
+
+from core.interfaces.IFeeProvider import IFeeProvider
+from core.models.ExchangeBase import ExchangeBase
+from core.models.types import COIN_ID, FEE
+from core.services.Mapper import Mapper
+
+
+FeeKey = tuple[COIN_ID, ExchangeBase]
+# (множитель для ask, множитель для bid): ask / (1 - fee) и bid * (1 - fee)
+Multipliers = tuple[float, float]
+FeeListener = Callable[[set[FeeKey]], None]
+
+
+class FeeTable:
+    """
+    Taker-комиссии по (coin_id, биржа) в виде готовых множителей цен.
+    Множители применяются к котировке один раз при записи, поэтому в расчете ROI нет поиска комиссий.
+    """
+
+    def __init__(self, mapper: Mapper, default_fee: FEE = 0.01) -> None:
+        self.mapper: Mapper = mapper
+        self._fees: dict[FeeKey, FEE] = {}
+        self._multipliers: dict[FeeKey, Multipliers] = {}
+        self.default_fee: FEE = default_fee
+        self._default: Multipliers = self.to_multipliers(default_fee)
+        self._listeners: list[FeeListener] = []
+        self.logger = logging.getLogger('fees')
+
+    @staticmethod
+    def to_multipliers(fee: FEE) -> Multipliers:
+        return 1.0 / (1.0 - fee), 1.0 - fee
+
+    @property
+    def default(self) -> Multipliers:
+        return self._default
+
+    def get_fee(self, coin_id: COIN_ID, exchange: ExchangeBase) -> FEE | None:
+        return self._fees.get((coin_id, exchange))
+
+    def multipliers(self, coin_id: COIN_ID, exchange: ExchangeBase) -> Multipliers:
+        return self._multipliers.get((coin_id, exchange), self._default)
+
+    def known(self) -> Iterable[FeeKey]:
+        return self._multipliers.keys()
+
+    def subscribe(self, listener: FeeListener) -> None:
+        self._listeners.append(listener)
+
+    def set_fees(self, exchange: ExchangeBase, fees: Mapping[COIN_ID, FEE]) -> set[FeeKey]:
+        """Записывает комиссии биржи, возвращает ключи, у которых комиссия изменилась"""
+        changed: set[FeeKey] = set()
+        for coin_id, fee in fees.items():
+            if fee is None or not 0 <= fee < 1:
+                continue
+            key = (coin_id, exchange)
+            if self._fees.get(key) != fee:
+                self._fees[key] = fee
+                self._multipliers[key] = self.to_multipliers(fee)
+                changed.add(key)
+        return changed
+
+    async def refresh(self, providers: Mapping[ExchangeBase, IFeeProvider]) -> set[FeeKey]:
+        changed: set[FeeKey] = set()
+
+        async def load(exchange: ExchangeBase, provider: IFeeProvider) -> None:
+            try:
+                taker_fees = await provider.get_taker_fees()
+            except Exception as e:
+                self.logger.error(f"Could not load fees for {exchange.name}: {e}")
+                return
+
+            fees: dict[COIN_ID, FEE] = {}
+            for coin_name, fee in taker_fees.items():
+                if (coin_id := self.mapper.get_coin_id_by_name(exchange.name, coin_name)) is not None:
+                    fees[coin_id] = fee
+            changed.update(self.set_fees(exchange, fees))
+
+        await asyncio.gather(*(load(exchange, provider) for exchange, provider in providers.items()))
+
+        if changed:
+            self.logger.info(f"Fees updated for {len(changed)} coin/exchange pairs")
+            for listener in self._listeners:
+                try:
+                    listener(changed)
+                except Exception as e:
+                    self.logger.error(f"Error notifying fee listener: {e}")
+        return changed
+
+    async def launch(self, providers: Mapping[ExchangeBase, IFeeProvider], interval: float = 3600.0) -> None:
+        """Загрузка при старте и периодическое обновление"""
+        try:
+            while True:
+                await self.refresh(providers)
+                await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            self.logger.info("Fee refresh cancelled")
@@ -0,0 +1,268 @@
+from typing import Iterable
+
+import numpy as np
+
+from core.models.ExchangeBase import ExchangeBase
+from core.models.types import COIN_ID, PRICE, PROFIT
+
+
+class PriceMatrix:
+    """
+    Плотные матрицы ask и bid: строки - coin_id из Mapper, столбцы - биржи.
+    Отсутствующая котировка хранится как NaN.
+    Комиссии хранятся матрицами множителей той же формы: ask / (1 - fee) и bid * (1 - fee).
+    Множители выгоды пар (покупка, продажа) - тензор coin x buy x sell, по умолчанию 1.0 (выгода равна ROI).
+    """
+
+    def __init__(self, coin_ids: Iterable[COIN_ID], commission: float = 0.01, capacity: int = 8) -> None:
+        self._rows: dict[COIN_ID, int] = {coin_id: row for row, coin_id in enumerate(coin_ids)}
+        self._row_ids: np.ndarray = np.fromiter(self._rows.keys(), dtype=np.int64, count=len(self._rows))
+        self._cols: dict[ExchangeBase, int] = {}
+        self._exchanges: list[ExchangeBase] = []
+        self._asks: np.ndarray = np.full((len(self._rows), capacity), np.nan, dtype=np.float64)
+        self._bids: np.ndarray = np.full((len(self._rows), capacity), np.nan, dtype=np.float64)
+        self._default_mult: tuple[float, float] = (1.0 / (1.0 - commission), 1.0 - commission)
+        self._buy_mult: np.ndarray = np.full((len(self._rows), capacity), self._default_mult[0], dtype=np.float64)
+        self._sell_mult: np.ndarray = np.full((len(self._rows), capacity), self._default_mult[1], dtype=np.float64)
+        self._rates: np.ndarray = np.ones((len(self._rows), capacity, capacity), dtype=np.float64)
+
+    def __contains__(self, coin_id: object) -> bool:
+        return coin_id in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def exchanges(self) -> list[ExchangeBase]:
+        return list(self._exchanges)
+
+    @property
+    def asks(self) -> np.ndarray:
+        """Только используемые столбцы, без копирования"""
+        return self._asks[:, :len(self._exchanges)]
+
+    @property
+    def bids(self) -> np.ndarray:
+        return self._bids[:, :len(self._exchanges)]
+
+    @property
+    def effective_asks(self) -> np.ndarray:
+        width = len(self._exchanges)
+        return self._asks[:, :width] * self._buy_mult[:, :width]
+
+    @property
+    def effective_bids(self) -> np.ndarray:
+        width = len(self._exchanges)
+        return self._bids[:, :width] * self._sell_mult[:, :width]
+
+    def add_exchange(self, exchange: ExchangeBase) -> int:
+        if (col := self._cols.get(exchange)) is not None:
+            return col
+
+        col = len(self._exchanges)
+        if col == self._asks.shape[1]:
+            self._asks = self._grow(self._asks, col * 2)
+            self._bids = self._grow(self._bids, col * 2)
+            self._buy_mult = self._grow(self._buy_mult, col * 2, self._default_mult[0])
+            self._sell_mult = self._grow(self._sell_mult, col * 2, self._default_mult[1])
+            rates = np.ones((self._rates.shape[0], col * 2, col * 2), dtype=np.float64)
+            rates[:, :col, :col] = self._rates
+            self._rates = rates
+
+        self._cols[exchange] = col
+        self._exchanges.append(exchange)
+        return col
+
+    def add_coins(self, coin_ids: Iterable[COIN_ID]) -> list[COIN_ID]:
+        """Добавляет строки новых монет (например, после обновления Mapper), возвращает добавленные"""
+        added = [coin_id for coin_id in dict.fromkeys(coin_ids) if coin_id not in self._rows]
+        if not added:
+            return added
+
+        count = len(added)
+        width = self._asks.shape[1]
+        for coin_id in added:
+            self._rows[coin_id] = len(self._rows)
+        self._row_ids = np.concatenate([self._row_ids, np.asarray(added, dtype=np.int64)])
+        self._asks = np.vstack([self._asks, np.full((count, width), np.nan)])
+        self._bids = np.vstack([self._bids, np.full((count, width), np.nan)])
+        self._buy_mult = np.vstack([self._buy_mult, np.full((count, width), self._default_mult[0])])
+        self._sell_mult = np.vstack([self._sell_mult, np.full((count, width), self._default_mult[1])])
+        self._rates = np.concatenate([self._rates, np.ones((count, width, width))])
+        return added
+
+    @staticmethod
+    def _grow(matrix: np.ndarray, width: int, fill: float = np.nan) -> np.ndarray:
+        grown = np.full((matrix.shape[0], width), fill, dtype=np.float64)
+        grown[:, :matrix.shape[1]] = matrix
+        return grown
+
+    def set(self, coin_id: COIN_ID, exchange: ExchangeBase, ask: PRICE, bid: PRICE | None = None) -> bool:
+        row = self._rows.get(coin_id)
+        col = self._cols.get(exchange)
+        if row is None or col is None:
+            return False
+
+        if bid is None:
+            bid = ask
+
+        if ask > 0 and bid > 0:
+            self._asks[row, col] = ask
+            self._bids[row, col] = bid
+        else:
+            self._asks[row, col] = np.nan
+            self._bids[row, col] = np.nan
+        return True
+
+    def remove(self, coin_id: COIN_ID, exchange: ExchangeBase) -> bool:
+        return self.set(coin_id, exchange, 0.0)
+
+    def set_fees(self, coin_id: COIN_ID, exchange: ExchangeBase, buy_mult: float, sell_mult: float) -> bool:
+        row = self._rows.get(coin_id)
+        col = self._cols.get(exchange)
+        if row is None or col is None:
+            return False
+
+        self._buy_mult[row, col] = buy_mult
+        self._sell_mult[row, col] = sell_mult
+        return True
+
+    def set_rate(self, coin_id: COIN_ID, buy_exchange: ExchangeBase, sell_exchange: ExchangeBase, rate: float) -> bool:
+        row = self._rows.get(coin_id)
+        buy = self._cols.get(buy_exchange)
+        sell = self._cols.get(sell_exchange)
+        if row is None or buy is None or sell is None:
+            return False
+
+        self._rates[row, buy, sell] = rate
+        return True
+
+    def count(self, coin_id: COIN_ID) -> int:
+        if (row := self._rows.get(coin_id)) is None:
+            return 0
+        return int(np.count_nonzero(~np.isnan(self.asks[row])))
+
+    def best(self, coin_id: COIN_ID) -> tuple[ExchangeBase, ExchangeBase, PROFIT, PROFIT] | None:
+        """Лучшая пара (покупка по ask, продажа по bid), ее выгода и ROI для одной монеты"""
+        if (row := self._rows.get(coin_id)) is None:
+            return None
+
+        width = len(self._exchanges)
+        asks = self._asks[row:row + 1, :width] * self._buy_mult[row:row + 1, :width]
+        bids = self._bids[row:row + 1, :width] * self._sell_mult[row:row + 1, :width]
+        if np.count_nonzero(~np.isnan(asks)) < 2:
+            return None
+
+        buy, sell, value, roi = self._pairs(asks, bids, self._rates[row:row + 1, :width, :width])
+        return self._exchanges[int(buy[0])], self._exchanges[int(sell[0])], float(value[0]), float(roi[0])
+
+    def best_from(self, coin_id: COIN_ID, buy_exchange: ExchangeBase) -> tuple[ExchangeBase, PROFIT, PROFIT] | None:
+        """Лучшая биржа для продажи при покупке на buy_exchange, выгода и ROI"""
+        row = self._rows.get(coin_id)
+        buy = self._cols.get(buy_exchange)
+        if row is None or buy is None:
+            return None
+
+        ask = self._asks[row, buy] * self._buy_mult[row, buy]
+        if np.isnan(ask):
+            return None
+
+        width = len(self._exchanges)
+        roi = self._bids[row, :width] * self._sell_mult[row, :width] / ask - 1.0
+        roi[buy] = np.nan
+        if np.all(np.isnan(roi)):
+            return None
+
+        value = roi * self._rates[row, buy, :width]
+        sell = int(np.nanargmax(value))
+        return self._exchanges[sell], float(value[sell]), float(roi[sell])
+
+    @staticmethod
+    def _pair_values(asks: np.ndarray, bids: np.ndarray, rates: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Выгода и ROI всех пар: тензоры строка x buy x sell, цены уже с комиссией.
+        Пары на одной бирже и без котировок - -inf в тензоре выгоды.
+        """
+        width = asks.shape[1]
+        roi = bids[:, None, :] / asks[:, :, None] - 1.0
+        value = roi * rates
+        diagonal = np.arange(width)
+        value[:, diagonal, diagonal] = np.nan
+        return np.where(np.isnan(value), -np.inf, value), roi
+
+    def _pairs(self, asks: np.ndarray, bids: np.ndarray, rates: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Лучшая пара разных бирж для каждой строки.
+        Выгода пары взвешивается rates, поэтому перебираются все пары.
+        """
+        rows, width = asks.shape
+        value, roi = self._pair_values(asks, bids, rates)
+        flat = value.reshape(rows, -1).argmax(axis=1)
+        buy, sell = np.divmod(flat, width)
+        index = np.arange(rows)
+        return buy, sell, value[index, buy, sell], roi[index, buy, sell]
+
+    def best_all(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Векторный расчет для всех монет сразу.
+
+        Returns:
+            (coin_ids, buy_cols, sell_cols, выгода, roi) только для монет, у которых есть хотя бы две котировки
+        """
+        asks = self.asks
+        rows = np.flatnonzero(np.count_nonzero(~np.isnan(asks), axis=1) >= 2)
+        if rows.size == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty, np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+
+        width = len(self._exchanges)
+        buy, sell, value, roi = self._pairs(
+            asks[rows] * self._buy_mult[rows, :width],
+            self._bids[rows, :width] * self._sell_mult[rows, :width],
+            self._rates[rows, :width, :width],
+        )
+        return self._row_ids[rows], buy, sell, value, roi
+
+    def _departures(self, rows: np.ndarray) -> Iterable[tuple[int, list[tuple[ExchangeBase, ExchangeBase, PROFIT, PROFIT]]]]:
+        width = len(self._exchanges)
+        value, roi = self._pair_values(
+            self._asks[rows, :width] * self._buy_mult[rows, :width],
+            self._bids[rows, :width] * self._sell_mult[rows, :width],
+            self._rates[rows, :width, :width],
+        )
+        sell = value.argmax(axis=2)
+        best = np.take_along_axis(value, sell[:, :, None], axis=2)[:, :, 0]
+        best_roi = np.take_along_axis(roi, sell[:, :, None], axis=2)[:, :, 0]
+        exchanges = self._exchanges
+        for i, row in enumerate(rows.tolist()):
+            buys = np.flatnonzero(np.isfinite(best[i])).tolist()
+            yield row, [(exchanges[b], exchanges[int(sell[i, b])], float(best[i, b]), float(best_roi[i, b])) for b in buys]
+
+    def best_by_departure(self, coin_id: COIN_ID) -> list[tuple[ExchangeBase, ExchangeBase, PROFIT, PROFIT]]:
+        """Лучшая пара для каждой биржи покупки"""
+        if (row := self._rows.get(coin_id)) is None or self.count(coin_id) < 2:
+            return []
+        return next(iter(self._departures(np.array([row]))))[1]
+
+    def iter_best_by_departure(self) -> Iterable[tuple[COIN_ID, list[tuple[ExchangeBase, ExchangeBase, PROFIT, PROFIT]]]]:
+        """best_by_departure для всех монет, у которых есть хотя бы две котировки"""
+        rows = np.flatnonzero(np.count_nonzero(~np.isnan(self.asks), axis=1) >= 2)
+        row_ids = self._row_ids
+        for row, pairs in self._departures(rows):
+            yield int(row_ids[row]), pairs
+
+    def iter_best(self) -> Iterable[tuple[COIN_ID, tuple[ExchangeBase, ExchangeBase, PROFIT, PROFIT]]]:
+        coin_ids, buy, sell, value, roi = self.best_all()
+        exchanges = self._exchanges
+        for coin_id, b, s, v, r in zip(coin_ids.tolist(), buy.tolist(), sell.tolist(), value.tolist(), roi.tolist()):
+            yield coin_id, (exchanges[b], exchanges[s], v, r)
+
+    def all_prices(self) -> dict[ExchangeBase, dict[COIN_ID, PRICE]]:
+        """Цены покупки (ask) по биржам"""
+        result: dict[ExchangeBase, dict[COIN_ID, PRICE]] = {}
+        asks = self.asks
+        for col, exchange in enumerate(self._exchanges):
+            column = asks[:, col]
+            rows = np.flatnonzero(~np.isnan(column))
+            result[exchange] = dict(zip(self._row_ids[rows].tolist(), column[rows].tolist()))
+        return result
@@ -0,0 +1,124 @@
+from collections import deque
+from typing import Iterator, Mapping
+
+from frozendict import frozendict
+
+from core.models.ExchangeBase import ExchangeBase
+from core.models.types import COIN_ID, PRICE
+
+Quote = tuple[PRICE, PRICE]
+PriceKey = tuple[ExchangeBase, COIN_ID]
+# биржа -> номер блока -> coin_id -> (ask, bid)
+Chunks = Mapping[ExchangeBase, Mapping[int, Mapping[COIN_ID, Quote]]]
+
+
+class PriceSnapshot:
+    """Неизменяемый срез цен одной версии. Блоки без изменений общие с предыдущими версиями."""
+
+    __slots__ = ('version', '_chunks', '_chunk_size')
+
+    def __init__(self, version: int, chunks: Chunks, chunk_size: int) -> None:
+        self.version = version
+        self._chunks = chunks
+        self._chunk_size = chunk_size
+
+    @property
+    def exchanges(self) -> list[ExchangeBase]:
+        return list(self._chunks)
+
+    def get(self, exchange: ExchangeBase, coin_id: COIN_ID) -> Quote | None:
+        if (blocks := self._chunks.get(exchange)) is None or (block := blocks.get(coin_id // self._chunk_size)) is None:
+            return None
+        return block.get(coin_id)
+
+    def items(self, exchange: ExchangeBase) -> Iterator[tuple[COIN_ID, Quote]]:
+        for block in self._chunks.get(exchange, frozendict()).values():
+            yield from block.items()
+
+    def asks(self) -> dict[ExchangeBase, dict[COIN_ID, PRICE]]:
+        return {exchange: {coin_id: quote[0] for coin_id, quote in self.items(exchange)} for exchange in self._chunks}
+
+
+class PriceBook:
+    """
+    Цены с публикацией версий копированием при записи.
+    Писатель меняет рабочие блоки и помечает их грязными; publish копирует только грязные блоки,
+    поэтому читатель берет согласованный срез за O(1) и не мешает записи.
+    """
+
+    def __init__(self, chunk_size: int = 64, history: int = 256) -> None:
+        self._chunk_size = chunk_size
+        self._live: dict[ExchangeBase, dict[int, dict[COIN_ID, Quote]]] = {}
+        self._dirty: dict[ExchangeBase, set[int]] = {}
+        self._changed: set[PriceKey] = set()
+        self._snapshot = PriceSnapshot(0, frozendict(), chunk_size)
+        # (версия, ключи, изменившиеся при ее публикации)
+        self._log: deque[tuple[int, frozenset[PriceKey]]] = deque(maxlen=history)
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @property
+    def snapshot(self) -> PriceSnapshot:
+        return self._snapshot
+
+    def put(self, exchange: ExchangeBase, coin_id: COIN_ID, ask: PRICE, bid: PRICE) -> None:
+        block = coin_id // self._chunk_size
+        blocks = self._live.setdefault(exchange, {})
+        quotes = blocks.setdefault(block, {})
+        if quotes.get(coin_id) == (ask, bid):
+            return
+        quotes[coin_id] = (ask, bid)
+        self._touch(exchange, block, coin_id)
+
+    def remove(self, exchange: ExchangeBase, coin_id: COIN_ID) -> None:
+        block = coin_id // self._chunk_size
+        if (quotes := self._live.get(exchange, {}).get(block)) is None or quotes.pop(coin_id, None) is None:
+            return
+        self._touch(exchange, block, coin_id)
+
+    def _touch(self, exchange: ExchangeBase, block: int, coin_id: COIN_ID) -> None:
+        self._dirty.setdefault(exchange, set()).add(block)
+        self._changed.add((exchange, coin_id))
+
+    def publish(self) -> PriceSnapshot:
+        """Новая версия из грязных блоков; без изменений возвращает текущую"""
+        if not self._changed:
+            return self._snapshot
+
+        chunks = dict(self._snapshot._chunks)
+        for exchange, dirty in self._dirty.items():
+            blocks = dict(chunks.get(exchange, frozendict()))
+            live = self._live[exchange]
+            for block in dirty:
+                if quotes := live.get(block):
+                    blocks[block] = frozendict(quotes)
+                else:
+                    blocks.pop(block, None)
+                    live.pop(block, None)
+            chunks[exchange] = frozendict(blocks)
+
+        version = self._snapshot.version + 1
+        self._log.append((version, frozenset(self._changed)))
+        self._snapshot = PriceSnapshot(version, frozendict(chunks), self._chunk_size)
+        self._dirty.clear()
+        self._changed.clear()
+        return self._snapshot
+
+    def changes_since(self, version: int) -> set[PriceKey] | None:
+        """
+        Ключи, изменившиеся после версии version.
+        None - версия старше хранимой истории, читателю нужен полный срез.
+        """
+        if version >= self._snapshot.version:
+            return set()
+        if not self._log or self._log[0][0] > version + 1:
+            return None
+
+        changed: set[PriceKey] = set()
+        for published, keys in reversed(self._log):
+            if published <= version:
+                break
+            changed |= keys
+        return changed
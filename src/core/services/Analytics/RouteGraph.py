@@ -0,0 +1,217 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from heapq import heappop, heappush
+import logging
+import math
+from typing import TYPE_CHECKING, Hashable
+
+from core.models.types import AMOUNT, COIN_ID, EXCHANGE_NAME, PRICE
+
+if TYPE_CHECKING:
+    from core.services.Mapper import Mapper
+
+Node = Hashable
+Edge = tuple[Node, Node]
+# узел графа маршрутов: актив на бирже
+Asset = tuple[EXCHANGE_NAME, COIN_ID]
+
+
+@dataclass(frozen=True)
+class Cycle:
+    """Замкнутый маршрут; weight - сумма -log(множителей), отрицательный вес - прибыль"""
+    nodes: tuple[Node, ...]
+    weight: float
+
+    @property
+    def roi(self) -> float:
+        return math.exp(-self.weight) - 1.0
+
+    @property
+    def edges(self) -> list[Edge]:
+        return list(zip(self.nodes, self.nodes[1:] + self.nodes[:1]))
+
+
+class RouteGraph:
+    """
+    Граф с весами -log(множитель) и инкрементальным поиском отрицательных циклов.
+
+    Для всех ребер, кроме отложенных, поддерживаются потенциалы вершин с неотрицательными
+    приведенными весами w(u, v) + p(u) - p(v). Рост веса их не нарушает. При снижении веса
+    ребра (u, v) Дейкстра по приведенным весам обходит только вершины, чей потенциал должен
+    уменьшиться; если обход дошел до u - найден отрицательный цикл через это ребро.
+    Такое ребро откладывается вместе с циклом и повторно вставляется, когда цикл перестает быть выгодным.
+    """
+
+    def __init__(self, epsilon: float = 1e-12) -> None:
+        self.epsilon = epsilon
+        self._out: defaultdict[Node, dict[Node, float]] = defaultdict(dict)
+        self._potential: defaultdict[Node, float] = defaultdict(float)
+        # отложенное ребро -> его вес и цикл, который оно замыкает
+        self._pending: dict[Edge, float] = {}
+        self._cycles: dict[Edge, Cycle] = {}
+        # ребро -> отложенные ребра, циклы которых через него проходят
+        self._used_by: defaultdict[Edge, set[Edge]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return sum(len(edges) for edges in self._out.values()) + len(self._pending)
+
+    def weight(self, u: Node, v: Node) -> float | None:
+        if (w := self._out.get(u, {}).get(v)) is not None:
+            return w
+        return self._pending.get((u, v))
+
+    def cycles(self) -> list[Cycle]:
+        """Найденные выгодные циклы, лучшие первыми"""
+        return sorted(self._cycles.values(), key=lambda cycle: cycle.weight)
+
+    def set_weight(self, u: Node, v: Node, weight: float) -> Cycle | None:
+        """Добавляет или меняет ребро; возвращает новый цикл через него, если он появился"""
+        edge = (u, v)
+        old = self.weight(u, v)
+        known = self._cycles.get(edge)
+        if edge in self._pending:
+            self._pending[edge] = weight
+        elif old is not None and weight >= old:
+            self._out[u][v] = weight
+        else:
+            self._out[u].pop(v, None)
+            self._insert(edge, weight)
+
+        self._recheck(edge)
+        if (cycle := self._cycles.get(edge)) is not None and (known is None or cycle.nodes != known.nodes):
+            return cycle
+        return None
+
+    def remove(self, u: Node, v: Node) -> None:
+        edge = (u, v)
+        if self._out.get(u, {}).pop(v, None) is None and self._pending.pop(edge, None) is None:
+            return
+        self._drop_cycle(edge)
+        for pending in list(self._used_by.pop(edge, ())):
+            self._drop_cycle(pending)
+            if (weight := self._pending.pop(pending, None)) is not None:
+                self._insert(pending, weight)
+
+    def _recheck(self, edge: Edge) -> None:
+        """Пересчитывает циклы, через которые проходит ребро"""
+        targets = set(self._used_by.get(edge, ()))
+        if edge in self._pending:
+            targets.add(edge)
+        for pending in targets:
+            if (cycle := self._cycles.get(pending)) is None:
+                continue
+            weight = sum(self.weight(a, b) for a, b in cycle.edges) # type: ignore
+            if weight < -self.epsilon:
+                self._cycles[pending] = Cycle(cycle.nodes, weight)
+                continue
+            self._drop_cycle(pending)
+            self._insert(pending, self._pending.pop(pending))
+
+    def _drop_cycle(self, pending: Edge) -> None:
+        if (cycle := self._cycles.pop(pending, None)) is None:
+            return
+        for edge in cycle.edges:
+            if (users := self._used_by.get(edge)) is not None:
+                users.discard(pending)
+                if not users:
+                    del self._used_by[edge]
+
+    def _insert(self, edge: Edge, weight: float) -> None:
+        u, v = edge
+        if (path := self._relax(u, v, weight)) is None:
+            self._out[u][v] = weight
+            return
+
+        out = self._out
+        cycle = Cycle(tuple(path), sum(out[a][b] for a, b in zip(path, path[1:])) + weight)
+        self._pending[edge] = weight
+        self._cycles[edge] = cycle
+        for used in cycle.edges:
+            self._used_by[used].add(edge)
+
+    def _relax(self, u: Node, v: Node, weight: float) -> list[Node] | None:
+        """
+        Обновляет потенциалы после появления ребра (u, v).
+        Returns:
+            путь v ... u отрицательного цикла или None, если потенциалы обновлены
+        """
+        potential = self._potential
+        delta = weight + potential[u] - potential[v]
+        if delta >= -self.epsilon:
+            return None
+
+        keys: dict[Node, float] = {v: delta}
+        parent: dict[Node, Node] = {}
+        settled: dict[Node, float] = {}
+        heap: list[tuple[float, int, Node]] = [(delta, 0, v)]
+        counter = 1
+        while heap:
+            key, _, x = heappop(heap)
+            if x in settled or key > keys[x]:
+                continue
+            if x == u:
+                path = [u]
+                while path[-1] != v:
+                    path.append(parent[path[-1]])
+                path.reverse()
+                return path
+            settled[x] = key
+            base = potential[x]
+            for y, w in self._out.get(x, {}).items():
+                candidate = key + w + base - potential[y]
+                if candidate < -self.epsilon and candidate < keys.get(y, 0.0) and y not in settled:
+                    keys[y] = candidate
+                    parent[y] = x
+                    heappush(heap, (candidate, counter, y))
+                    counter += 1
+
+        for x, key in settled.items():
+            potential[x] += key
+        return None
+
+
+class RouteSearch:
+    """
+    Граф маршрутов арбитража: вершины - (биржа, актив), ребра - покупка и продажа за USDT по ценам
+    с комиссией и переводы между биржами по лучшим сетям Mapper.
+    Комиссия перевода фиксированная, поэтому ее доля считается для объема notional в USDT.
+    """
+
+    def __init__(self, mapper: 'Mapper', notional: AMOUNT = 100.0, graph: RouteGraph | None = None) -> None:
+        self.mapper: 'Mapper' = mapper
+        self.notional = notional
+        self.graph: RouteGraph = graph or RouteGraph()
+        self.logger = logging.getLogger('routes')
+
+    def _transfer(self, departure: EXCHANGE_NAME, coin_id: COIN_ID, price: PRICE) -> None:
+        for destination, coin in self.mapper.get_transfers_from(departure, coin_id).items():
+            share = coin.fee * price / self.notional
+            if not coin.has_known_fee or share >= 1.0:
+                self.graph.remove((departure, coin_id), (destination, coin_id))
+            elif cycle := self.graph.set_weight((departure, coin_id), (destination, coin_id), -math.log1p(-share)):
+                self._found(cycle)
+
+    def add_usdt_transfers(self, exchanges: list[EXCHANGE_NAME]) -> None:
+        for exchange in exchanges:
+            self._transfer(exchange, self.mapper.usdt, 1.0)
+
+    def on_quote(self, exchange: EXCHANGE_NAME, coin_id: COIN_ID, effective_ask: PRICE, effective_bid: PRICE) -> None:
+        usdt = self.mapper.usdt
+        for u, v, weight in (
+            ((exchange, usdt), (exchange, coin_id), math.log(effective_ask)),
+            ((exchange, coin_id), (exchange, usdt), -math.log(effective_bid)),
+        ):
+            if cycle := self.graph.set_weight(u, v, weight):
+                self._found(cycle)
+        self._transfer(exchange, coin_id, effective_bid)
+
+    def on_remove(self, exchange: EXCHANGE_NAME, coin_id: COIN_ID) -> None:
+        usdt = self.mapper.usdt
+        self.graph.remove((exchange, usdt), (exchange, coin_id))
+        self.graph.remove((exchange, coin_id), (exchange, usdt))
+
+    def _found(self, cycle: Cycle) -> None:
+        self.logger.info(f"Profitable route {' -> '.join(map(str, cycle.nodes))}: {cycle.roi:.4%}")
+
+    def cycles(self) -> list[Cycle]:
+        return self.graph.cycles()
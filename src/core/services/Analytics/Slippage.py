@@ -0,0 +1,153 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+from itertools import accumulate
+import logging
+from typing import Iterable, Sequence
+
+from core.models.ExchangeBase import ExchangeBase
+from core.models.types import AMOUNT, COIN_ID, COIN_NAME, PRICE
+from core.protocols.DepthSubscriber import DepthSubscriber, Levels
+from core.services.Analytics.FeeTable import FeeTable
+from core.services.Mapper import Mapper
+
+
+class DepthCurve:
+    """
+    Одна сторона стакана с накопленными объемами.
+    cum_qty[i] и cum_cost[i] - сколько монет и USDT проходит через первые i + 1 уровней,
+    поэтому VWAP для любого объема ищется бинарным поиском за O(log L).
+    """
+
+    __slots__ = ('prices', 'cum_qty', 'cum_cost')
+
+    def __init__(self, levels: Iterable[Sequence[float]]) -> None:
+        prices: list[PRICE] = []
+        amounts: list[AMOUNT] = []
+        for level in levels:
+            price, amount = float(level[0]), float(level[1])
+            if price > 0 and amount > 0:
+                prices.append(price)
+                amounts.append(amount)
+
+        self.prices: list[PRICE] = prices
+        self.cum_qty: list[AMOUNT] = list(accumulate(amounts))
+        self.cum_cost: list[AMOUNT] = list(accumulate(p * a for p, a in zip(prices, amounts)))
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    @property
+    def total_qty(self) -> AMOUNT:
+        return self.cum_qty[-1] if self.cum_qty else 0.0
+
+    @property
+    def total_cost(self) -> AMOUNT:
+        return self.cum_cost[-1] if self.cum_cost else 0.0
+
+    def qty_for_cost(self, cost: AMOUNT) -> AMOUNT | None:
+        """Сколько монет можно купить на cost USDT (для стороны ask)"""
+        i = bisect_left(self.cum_cost, cost)
+        if i == len(self.prices):
+            return None
+        prev_cost = self.cum_cost[i - 1] if i else 0.0
+        prev_qty = self.cum_qty[i - 1] if i else 0.0
+        return prev_qty + (cost - prev_cost) / self.prices[i]
+
+    def cost_for_qty(self, qty: AMOUNT) -> AMOUNT | None:
+        """Сколько USDT принесет продажа qty монет (для стороны bid)"""
+        i = bisect_left(self.cum_qty, qty)
+        if i == len(self.prices):
+            return None
+        prev_cost = self.cum_cost[i - 1] if i else 0.0
+        prev_qty = self.cum_qty[i - 1] if i else 0.0
+        return prev_cost + (qty - prev_qty) * self.prices[i]
+
+
+@dataclass(frozen=True)
+class Book:
+    asks: DepthCurve
+    bids: DepthCurve
+
+
+class SlippageModel:
+    """Стаканы монет-кандидатов и расчет реально достижимой прибыли с учетом глубины"""
+
+    def __init__(self, mapper: Mapper, fees: FeeTable | None = None) -> None:
+        self.mapper: Mapper = mapper
+        self.fees: FeeTable = fees or FeeTable(mapper)
+        self._books: dict[tuple[COIN_ID, ExchangeBase], Book] = {}
+        self.logger = logging.getLogger('slippage')
+
+    def update(self, coin_id: COIN_ID, exchange: ExchangeBase, asks: Levels, bids: Levels) -> None:
+        self._books[(coin_id, exchange)] = Book(DepthCurve(asks), DepthCurve(bids))
+
+    def discard(self, coin_id: COIN_ID, exchange: ExchangeBase) -> None:
+        self._books.pop((coin_id, exchange), None)
+
+    def get_book(self, coin_id: COIN_ID, exchange: ExchangeBase) -> Book | None:
+        return self._books.get((coin_id, exchange))
+
+    def _books_for(self, coin_id: COIN_ID, buy_exchange: ExchangeBase, sell_exchange: ExchangeBase) -> tuple[Book, Book, float, float] | None:
+        """Стаканы и множители комиссий пары бирж: (стакан покупки, стакан продажи, buy_mult, sell_mult)"""
+        buy_book = self._books.get((coin_id, buy_exchange))
+        sell_book = self._books.get((coin_id, sell_exchange))
+        if buy_book is None or sell_book is None:
+            return None
+        buy_mult, _ = self.fees.multipliers(coin_id, buy_exchange)
+        _, sell_mult = self.fees.multipliers(coin_id, sell_exchange)
+        return buy_book, sell_book, buy_mult, sell_mult
+
+    @staticmethod
+    def _value(buy_book: Book, sell_book: Book, buy_mult: float, sell_mult: float, notional: AMOUNT) -> AMOUNT | None:
+        if notional <= 0:
+            return None
+        if (qty := buy_book.asks.qty_for_cost(notional / buy_mult)) is None:
+            return None
+        if (proceeds := sell_book.bids.cost_for_qty(qty)) is None:
+            return None
+        return proceeds * sell_mult
+
+    def realizable_value(self, coin_id: COIN_ID, buy_exchange: ExchangeBase, sell_exchange: ExchangeBase, notional: AMOUNT) -> AMOUNT | None:
+        """
+        Сколько USDT вернется, если купить монету на notional USDT по стакану buy_exchange
+        и продать весь объем по стакану sell_exchange. None - стаканов нет или глубины не хватает.
+        """
+        if (books := self._books_for(coin_id, buy_exchange, sell_exchange)) is None:
+            return None
+        return self._value(*books, notional)
+
+    def realizable_profit(self, coin_id: COIN_ID, buy_exchange: ExchangeBase, sell_exchange: ExchangeBase, notional: AMOUNT) -> AMOUNT | None:
+        if (value := self.realizable_value(coin_id, buy_exchange, sell_exchange, notional)) is None:
+            return None
+        return value - notional
+
+    def profit_curve(self, coin_id: COIN_ID, buy_exchange: ExchangeBase, sell_exchange: ExchangeBase, notionals: Iterable[AMOUNT]) -> list[AMOUNT | None]:
+        """Прибыль для набора объемов, стаканы и комиссии берутся один раз"""
+        if (books := self._books_for(coin_id, buy_exchange, sell_exchange)) is None:
+            return [None for _ in notionals]
+        curve: list[AMOUNT | None] = []
+        for notional in notionals:
+            value = self._value(*books, notional)
+            curve.append(None if value is None else value - notional)
+        return curve
+
+    async def start(self, exchanges: set[ExchangeBase]) -> None:
+        for exchange in exchanges:
+
+            @dataclass
+            class Subscriber(DepthSubscriber):
+                model: SlippageModel
+                exchange: ExchangeBase
+
+                def __hash__(self) -> int:
+                    return hash("slippage" + str(self.exchange.__hash__()))
+
+                async def on_depth_update(self, coin_name: COIN_NAME, asks: Levels, bids: Levels) -> None:
+                    if (coin_id := self.model.mapper.get_coin_id_by_name(self.exchange.name, coin_name)) is None:
+                        return
+                    if asks and bids:
+                        self.model.update(coin_id, self.exchange, asks, bids)
+                    else:
+                        self.model.discard(coin_id, self.exchange)
+
+            await exchange.subscribe_depth(Subscriber(self, exchange)) # type: ignore
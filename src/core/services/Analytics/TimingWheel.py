@@ -0,0 +1,73 @@
+import time
+from typing import Generic, Hashable, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+
+
+class TimingWheel(Generic[K]):
+    """
+    Колесо таймеров для истечения ключей.
+    Ключ лежит в слоте своего срока. Продление срока только меняет дедлайн, а слот при срабатывании
+    перекладывает еще живые ключи дальше, поэтому touch - O(1), а advance - O(1) амортизированно на тик.
+    """
+
+    def __init__(self, resolution: float = 1.0, slots: int = 64, now: float | None = None) -> None:
+        self.resolution = resolution
+        self._slots: list[set[K]] = [set() for _ in range(slots)]
+        self._deadlines: dict[K, float] = {}
+        self._received: dict[K, float] = {}
+        self._tick: int = int((time.monotonic() if now is None else now) / resolution)
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._deadlines
+
+    def received(self, key: K) -> float | None:
+        """Время получения последнего значения ключа"""
+        return self._received.get(key)
+
+    def touch(self, key: K, received: float, ttl: float) -> None:
+        scheduled = key in self._deadlines
+        self._received[key] = received
+        self._deadlines[key] = received + ttl
+        if not scheduled:
+            self._schedule(key, received + ttl)
+
+    def discard(self, key: K) -> None:
+        # запись в слоте остается и пропускается при срабатывании
+        self._deadlines.pop(key, None)
+        self._received.pop(key, None)
+
+    def _schedule(self, key: K, deadline: float) -> None:
+        # срок за горизонтом колеса - ключ будет переложен, когда до него дойдет очередь
+        size = len(self._slots)
+        tick = min(max(int(deadline / self.resolution), self._tick + 1), self._tick + size)
+        self._slots[tick % size].add(key)
+
+    def advance(self, now: float) -> list[K]:
+        """Проходит слоты до now и возвращает истекшие ключи"""
+        target = int(now / self.resolution)
+        size = len(self._slots)
+        expired: list[K] = []
+
+        # после долгой паузы достаточно одного оборота
+        for tick in range(max(self._tick + 1, target - size + 1), target + 1):
+            self._tick = tick
+            index = tick % size
+            if not (slot := self._slots[index]):
+                continue
+            self._slots[index] = set()
+            for key in slot:
+                if (deadline := self._deadlines.get(key)) is None:
+                    continue
+                if deadline <= now:
+                    del self._deadlines[key]
+                    self._received.pop(key, None)
+                    expired.append(key)
+                else:
+                    self._schedule(key, deadline)
+
+        self._tick = max(self._tick, target)
+        return expired
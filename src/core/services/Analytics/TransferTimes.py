@@ -0,0 +1,98 @@
+from collections import defaultdict, deque
+import logging
+import time
+
+from core.models.types import CHAIN, COIN_ID, DEPARTURE_NAME, DESTINATION_NAME, EXCHANGE_NAME
+
+RouteKey = tuple[DEPARTURE_NAME, DESTINATION_NAME, CHAIN]
+
+# Типичное время от вывода до зачисления, секунды. Ключ - нормализованное название сети.
+DEFAULT_CHAIN_SECONDS: dict[CHAIN, float] = {
+    'TRC20': 180.0,
+    'TRX': 180.0,
+    'BEP20': 240.0,
+    'BSC': 240.0,
+    'BEP20(BSC)': 240.0,
+    'SOL': 120.0,
+    'SOLANA': 120.0,
+    'MATIC': 600.0,
+    'POLYGON': 600.0,
+    'ARBITRUM': 600.0,
+    'ARBONE': 600.0,
+    'ARBITRUMONE': 600.0,
+    'OPTIMISM': 600.0,
+    'AVAXC': 300.0,
+    'AVAX-C': 300.0,
+    'TON': 180.0,
+    'XRP': 120.0,
+    'XLM': 120.0,
+    'APT': 120.0,
+    'SUI': 120.0,
+    'ERC20': 1200.0,
+    'ETH': 1200.0,
+    'BTC': 3600.0,
+    'LTC': 1800.0,
+    'DOGE': 1800.0,
+}
+
+
+class TransferTimes:
+    """
+    Оценка длительности перевода (биржа отправления, биржа назначения, сеть).
+    Начальные значения берутся из таблицы по сети, затем уточняются по наблюдаемому времени
+    от вывода до зачисления (экспоненциальное сглаживание).
+    """
+
+    def __init__(self, seed: dict[CHAIN, float] | None = None, default_seconds: float = 1800.0, alpha: float = 0.3) -> None:
+        self._seed: dict[CHAIN, float] = {self.normalize(chain): seconds for chain, seconds in (seed or DEFAULT_CHAIN_SECONDS).items()}
+        self._observed: dict[RouteKey, float] = {}
+        self._pending: defaultdict[tuple[DESTINATION_NAME, COIN_ID], deque[tuple[DEPARTURE_NAME, CHAIN, float]]] = defaultdict(deque)
+        self.default_seconds = default_seconds
+        self.alpha = alpha
+        self.version: int = 0
+        self.logger = logging.getLogger('transfer_times')
+
+    @staticmethod
+    def normalize(chain: CHAIN) -> CHAIN:
+        return chain.upper().replace(' ', '').replace('_', '')
+
+    @property
+    def min_seconds(self) -> float:
+        return min(min(self._seed.values(), default=self.default_seconds),
+                   min(self._observed.values(), default=self.default_seconds),
+                   self.default_seconds)
+
+    @property
+    def max_seconds(self) -> float:
+        return max(max(self._seed.values(), default=self.default_seconds),
+                   max(self._observed.values(), default=self.default_seconds),
+                   self.default_seconds)
+
+    def duration(self, departure: DEPARTURE_NAME, destination: DESTINATION_NAME, chain: CHAIN | None) -> float:
+        if chain is None:
+            return self.default_seconds
+        chain = self.normalize(chain)
+        if (seconds := self._observed.get((departure, destination, chain))) is not None:
+            return seconds
+        return self._seed.get(chain, self.default_seconds)
+
+    def record(self, departure: DEPARTURE_NAME, destination: DESTINATION_NAME, chain: CHAIN, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        key = (departure, destination, self.normalize(chain))
+        previous = self._observed.get(key, self._seed.get(key[2]))
+        self._observed[key] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+        self.version += 1
+        self.logger.info(f"Transfer {departure} -> {destination} via {chain} took {seconds:.0f}s, estimate {self._observed[key]:.0f}s")
+
+    def on_withdraw(self, departure: DEPARTURE_NAME, destination: DESTINATION_NAME, chain: CHAIN, coin_id: COIN_ID) -> None:
+        self._pending[(destination, coin_id)].append((departure, chain, time.monotonic()))
+
+    def on_deposit(self, destination: EXCHANGE_NAME, coin_id: COIN_ID) -> None:
+        """Зачисление на destination закрывает самый старый ожидающий перевод этой монеты"""
+        if not (pending := self._pending.get((destination, coin_id))):
+            return
+        departure, chain, started = pending.popleft()
+        if not pending:
+            del self._pending[(destination, coin_id)]
+        self.record(departure, destination, chain, time.monotonic() - started)
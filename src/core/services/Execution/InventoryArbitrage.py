@@ -0,0 +1,158 @@
+import asyncio
+from dataclasses import dataclass
+import logging
+from typing import Any
+
+from core.interfaces import Exchange
+from core.models.Deal import Deal
+from core.models.types import AMOUNT, COIN_ID, COIN_NAME
+from core.services.Analytics.Analyst import Analyst
+from core.services.Execution.Rebalancer import Rebalancer
+from core.services.Mapper import Mapper
+
+
+@dataclass(frozen=True)
+class Rebalance:
+    """Возврат монеты после сделки: с биржи покупки, где она накопилась, на биржу продажи"""
+    coin_id: COIN_ID
+    departure: Exchange
+    destination: Exchange
+    amount: AMOUNT
+
+
+class InventoryArbitrage:
+    """
+    Арбитраж на запасах: монета и USDT заранее лежат на нескольких биржах,
+    поэтому покупка на departure и продажа на destination исполняются одновременно.
+    Перевод монеты обратно на биржу продажи уходит в фоновую очередь и не стоит на пути сделки.
+    """
+
+    def __init__(
+        self,
+        analyst: Analyst,
+        mapper: Mapper,
+        notional: AMOUNT = 100.0,
+        min_roi: float = 0.002,
+        min_benefit: float | None = None,
+        queue_size: int = 1000,
+        rebalancer: Rebalancer | None = None,
+    ) -> None:
+        self.analyst = analyst
+        self.mapper = mapper
+        self.notional = notional
+        self.min_roi = min_roi
+        self.min_benefit = min_benefit
+        self.rebalances: asyncio.Queue[Rebalance] = asyncio.Queue(queue_size)
+        # с фоновым выравниванием запасов переводы после сделок объединяются им в пакеты
+        self.rebalancer = rebalancer
+        # монеты, по которым сейчас исполняются ноги сделки
+        self._busy: set[COIN_ID] = set()
+        # монеты с одной исполненной ногой: позиция разошлась, новые сделки ждут resolve
+        self._halted: dict[COIN_ID, Deal] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.logger = logging.getLogger('InventoryArbitrage')
+
+    def start(self) -> None:
+        for coro in (self._watch(), self._rebalance_loop()):
+            task = asyncio.create_task(coro)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _watch(self) -> None:
+        async for deal in self.analyst.opportunities(self.min_benefit):
+            if deal.coin_id in self._busy or deal.coin_id in self._halted:
+                continue
+            self._busy.add(deal.coin_id)
+            task = asyncio.create_task(self._run(deal))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, deal: Deal) -> None:
+        try:
+            await self.execute(deal)
+        except Exception as e:
+            self.logger.exception(f"Inventory deal {deal} failed: {e}")
+        finally:
+            self._busy.discard(deal.coin_id)
+
+    @property
+    def halted(self) -> dict[COIN_ID, Deal]:
+        return self._halted
+
+    def resolve(self, coin_id: COIN_ID) -> Deal | None:
+        """Позиция по монете выровнена вручную - снова разрешаем сделки"""
+        return self._halted.pop(coin_id, None)
+
+    def _coin_name(self, exchange: Exchange, coin_id: COIN_ID) -> COIN_NAME | None:
+        return self.mapper.get_coin_name_id_for_ex(exchange.name).inverse.get(coin_id)
+
+    async def execute(self, deal: Deal) -> bool:
+        """Обе ноги сделки по запасам бирж; False - запасов или цен не хватает, либо нога не исполнилась"""
+        buy_ex, sell_ex = deal.departure, deal.destination
+        if (deal.benefit if deal.roi is None else deal.roi) < self.min_roi:
+            return False
+
+        buy_name = self._coin_name(buy_ex, deal.coin_id)
+        sell_name = self._coin_name(sell_ex, deal.coin_id)
+        quote = self.analyst.snapshot().get(buy_ex, deal.coin_id)
+        if buy_name is None or sell_name is None or quote is None:
+            return False
+
+        quantity: AMOUNT = self.notional / quote[0]
+        if buy_ex.wallet.get(buy_ex.usdt, 0.0) < self.notional or sell_ex.wallet.get(sell_name, 0.0) < quantity:
+            self.logger.debug(f"Not enough inventory for coin {deal.coin_id} on {buy_ex.name} -> {sell_ex.name}")
+            return False
+
+        bought, sold = await asyncio.gather(
+            buy_ex.buy(buy_name, self.notional),
+            sell_ex.sell(sell_name, quantity),
+            return_exceptions=True,
+        )
+        buy_ok, sell_ok = self._filled(bought), self._filled(sold)
+        if buy_ok and sell_ok:
+            if self.rebalancer is not None:
+                self.rebalancer.request()
+            else:
+                filled = bought.get('filled') or quantity # type: ignore
+                self._enqueue(Rebalance(deal.coin_id, buy_ex, sell_ex, filled))
+            return True
+
+        if buy_ok or sell_ok:
+            # прошла одна нога - запасы разошлись, монета остановлена до проверки позиции вручную
+            self._halted[deal.coin_id] = deal
+            self.logger.critical(f"Only one leg filled for coin {deal.coin_id}, halted until resolve: buy on {buy_ex.name} {bought}, sell on {sell_ex.name} {sold}")
+        return False
+
+    @staticmethod
+    def _filled(order: Any) -> bool:
+        return order is not None and not isinstance(order, BaseException)
+
+    def _enqueue(self, job: Rebalance) -> None:
+        try:
+            self.rebalances.put_nowait(job)
+        except asyncio.QueueFull:
+            self.logger.error(f"Rebalance queue is full, dropping {job}")
+
+    async def _rebalance_loop(self) -> None:
+        while True:
+            job = await self.rebalances.get()
+            try:
+                await self.rebalance(job)
+            except Exception as e:
+                self.logger.exception(f"Rebalance {job} failed: {e}")
+
+    async def rebalance(self, job: Rebalance) -> bool:
+        coin = self.mapper.get_best_coin_transfer(job.departure.name, job.destination.name, job.coin_id)
+        if coin is None:
+            self.logger.error(f"No transfer route for coin {job.coin_id} from {job.departure.name} to {job.destination.name}")
+            return False
+
+        result: bool = await job.departure.withdraw(coin.name, coin.chain, job.amount, job.destination)
+        if result:
+            self.analyst.transfer_times.on_withdraw(job.departure.name, job.destination.name, coin.chain, job.coin_id)
+        return result
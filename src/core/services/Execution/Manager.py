@@ -23,12 +23,38 @@ class Manager(BalanceSubscriber):
         self.logger: logging.Logger = logging.getLogger(f'Manager for {ex.name}')
         self.pending_coins: dict[COIN_ID, BALANCE] = {}
         self.locks: dict[COIN_ID, asyncio.Lock] = {}
+        # будит отложенные консультации, как только появилась сделка выше порога
+        self._opportunity: asyncio.Event = asyncio.Event()
+        self._opportunity_task: asyncio.Task | None = None
+        # последний известный баланс монеты: зачисление перевода - только рост баланса
+        self._last_balance: dict[COIN_ID, BALANCE] = {}
         
 
     async def start(self):
         # await asyncio.sleep(5)
         self.logger.info(f"{self.ex.name} прогружена")
+        if self._opportunity_task is None:
+            self._opportunity_task = asyncio.create_task(self._watch_opportunities())
+        names = self.mapper.get_coin_name_id_for_ex(self.ex.name)
+        for coin_name, amount in self.ex.wallet.items():
+            if (coin_id := names.get(coin_name)) is not None:
+                self._last_balance[coin_id] = amount
         await self.ex.subscribe_balance(self)
+    
+    async def stop(self) -> None:
+        """Останавливает подписку на сделки: поток закрывается, и его буфер уходит из Analyst"""
+        if self._opportunity_task is not None:
+            self._opportunity_task.cancel()
+            await asyncio.gather(self._opportunity_task, return_exceptions=True)
+            self._opportunity_task = None
+    
+    async def _watch_opportunities(self) -> None:
+        stream = self.brain.analyst.opportunities()
+        try:
+            async for _ in stream:
+                self._opportunity.set()
+        finally:
+            await stream.aclose()
         # coin_dict = await self.ex.get_balance()
     
     async def _get_lock(self, coin_id: COIN_ID) -> asyncio.Lock:
@@ -57,15 +83,22 @@ class Manager(BalanceSubscriber):
             self.pending_coins.pop(coin_id, None)
                   
     async def consultation(self, asset: Asset):
-        rec: Recommendation = await self.brain.analyse(self.ex, asset)
+        if asset.coin_id == self.mapper.usdt and self.brain.allocator is not None:
+            # USDT делится между несколькими сделками, доли исполняются параллельно
+            recs: list[Recommendation] = (await self.brain.allocate_usdt({self.ex: asset.amount}))[self.ex]
+            await asyncio.gather(*(self._execute(asset, rec) for rec in recs))
+            return
+        await self._execute(asset, await self.brain.analyse(self.ex, asset))
+
+    async def _execute(self, asset: Asset, rec: Recommendation):
         self.logger.critical(rec)
         if isinstance(rec, Wait):
             seconds: int = rec.seconds
             await self.set_pending_coin(asset.coin_id, asset.amount)
             await self.postponed_consultation(seconds, asset.coin_id)
         elif isinstance(rec, Trade):
-            if rec.sell_coin == self.mapper.usdt: await self.ex.buy(rec.buy_coin)
-            else: await self.ex.sell(rec.sell_coin)
+            if rec.sell_coin == self.mapper.usdt: await self.ex.buy(rec.buy_coin, rec.amount)
+            else: await self.ex.sell(rec.sell_coin, rec.amount)
             await self.remove_pending_coin(asset.coin_id)  # Очистка после действия
         elif isinstance(rec, Transfer):
             coin_id: COIN_ID = rec.coin
@@ -76,7 +109,9 @@ class Manager(BalanceSubscriber):
             elif coin := self.mapper.get_best_coin_transfer(self.ex.name, destination.name,coin_id):
                 coin_name = coin.name
                 chain = coin.chain
-                transfer_result = await self.ex.withdraw(coin_name, chain, asset.amount, destination)
+                transfer_result = await self.ex.withdraw(coin_name, chain, asset.amount if rec.amount is None else rec.amount, destination)
+                if transfer_result:
+                    self.brain.analyst.transfer_times.on_withdraw(self.ex.name, destination.name, chain, coin_id)
             else:
                 self.logger.error(f"невозможно выполнить перевод {rec}")
                     # await self.ex.sell(rec.coin)
@@ -86,12 +121,21 @@ class Manager(BalanceSubscriber):
             await self.remove_pending_coin(asset.coin_id)  # Очистка после действия
 
     async def postponed_consultation(self, seconds: int, coin_id):
-        await asyncio.sleep(seconds)
+        # Wait - верхняя граница ожидания: новая сделка выше порога будит сразу
+        self._opportunity.clear()
+        try:
+            await asyncio.wait_for(self._opportunity.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
         balance = await self.get_and_remove_pending_coin(coin_id)  # Получить и удалить
         if balance is not None:  # Проверка на случай параллельного удаления
             await self.consultation(Asset(coin_id, balance))
 
     async def on_balance_update(self, coin_id: COIN_ID, balance: float) -> None:
+        # продажа, вывод или списание комиссии не закрывают перевод в пути
+        if balance > self._last_balance.get(coin_id, 0.0):
+            self.brain.analyst.transfer_times.on_deposit(self.ex.name, coin_id)
+        self._last_balance[coin_id] = balance
         if await self.check_pending_coin(coin_id):
             await self.set_pending_coin(coin_id, balance)
         else:
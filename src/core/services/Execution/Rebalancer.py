@@ -0,0 +1,189 @@
+import asyncio
+from dataclasses import dataclass, field
+import logging
+import time
+from typing import Iterable, Mapping
+
+from core.interfaces import Exchange
+from core.models.types import AMOUNT, COIN_ID, COIN_NAME, EXCHANGE_NAME
+from core.protocols.BalanceSubscriber import BalanceSubscriber
+from core.services.Analytics.TransferTimes import TransferTimes
+from core.services.Mapper import Mapper
+
+
+@dataclass(frozen=True)
+class Move:
+    coin_id: COIN_ID
+    departure: Exchange
+    destination: Exchange
+    amount: AMOUNT
+    fee: AMOUNT
+    seconds: float
+
+
+@dataclass
+class _DepositWatcher(BalanceSubscriber):
+    """Сообщает Rebalancer о росте баланса монеты на бирже"""
+    rebalancer: 'Rebalancer'
+    exchange: Exchange
+    last: dict[COIN_NAME, float] = field(default_factory=dict)
+
+    def __hash__(self) -> int:
+        return hash("rebalancer" + self.exchange.name)
+
+    async def on_balance_update(self, coin: COIN_NAME, balance: float) -> None:
+        grew = balance > self.last.get(coin, 0.0)
+        self.last[coin] = balance
+        if grew and (coin_id := self.rebalancer.mapper.get_coin_id_by_name(self.exchange.name, coin)) is not None:
+            self.rebalancer.on_deposit(self.exchange.name, coin_id)
+
+
+class Rebalancer:
+    """
+    Фоновое выравнивание запасов по целевым уровням бирж.
+
+    Биржа с запасом выше target * (1 + tolerance) отдает излишек, биржа ниже target * (1 - tolerance)
+    добирает до target. Переводы выбираются от дешевых к дорогим (комиссия, затем время сети),
+    и на каждую пару бирж идет один вывод на всю нехватку. Вывод, у которого постоянная комиссия
+    больше max_fee_share от суммы, откладывается: мелкие нехватки копятся до одного крупного перевода.
+    За один проход монеты обходятся по кругу, пока не кончится бюджет budget секунд.
+    """
+
+    def __init__(
+        self,
+        mapper: Mapper,
+        transfer_times: TransferTimes,
+        exchanges: Iterable[Exchange],
+        targets: Mapping[COIN_ID, Mapping[EXCHANGE_NAME, AMOUNT]] | None = None,
+        tolerance: float = 0.2,
+        max_fee_share: float = 0.01,
+        interval: float = 30.0,
+        budget: float = 0.05,
+    ) -> None:
+        self.mapper = mapper
+        self.transfer_times = transfer_times
+        self.exchanges: dict[EXCHANGE_NAME, Exchange] = {exchange.name: exchange for exchange in exchanges}
+        self.targets: dict[COIN_ID, dict[EXCHANGE_NAME, AMOUNT]] = {coin_id: dict(levels) for coin_id, levels in (targets or {}).items()}
+        self.tolerance = tolerance
+        self.max_fee_share = max_fee_share
+        self.interval = interval
+        self.budget = budget
+        # отправленные, но еще не зачисленные переводы: (монета, биржа назначения) -> [(сумма, срок)]
+        self._in_flight: dict[tuple[COIN_ID, EXCHANGE_NAME], list[tuple[AMOUNT, float]]] = {}
+        self._cursor: int = 0
+        self._wake: asyncio.Event = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.logger = logging.getLogger('Rebalancer')
+
+    def set_target(self, coin_id: COIN_ID, exchange_name: EXCHANGE_NAME, amount: AMOUNT) -> None:
+        self.targets.setdefault(coin_id, {})[exchange_name] = amount
+
+    def request(self) -> None:
+        """Внеочередной проход, например после сделки"""
+        self._wake.set()
+
+    async def start(self) -> None:
+        for exchange in self.exchanges.values():
+            # текущий баланс - точка отсчета: первый снимок после старта не считается зачислением
+            await exchange.subscribe_balance(_DepositWatcher(self, exchange, dict(exchange.wallet)))
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def on_deposit(self, exchange_name: EXCHANGE_NAME, coin_id: COIN_ID) -> None:
+        """Баланс вырос - самый ранний перевод на биржу считается зачисленным"""
+        if incoming := self._in_flight.get((coin_id, exchange_name)):
+            incoming.pop(0)
+            self.request()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            for move in self.plan():
+                try:
+                    await self.execute(move)
+                except Exception as e:
+                    self.logger.exception(f"Rebalance {move} failed: {e}")
+
+    def _balance(self, exchange: Exchange, coin_id: COIN_ID, now: float) -> AMOUNT | None:
+        if (coin_name := self.mapper.get_coin_name_id_for_ex(exchange.name).inverse.get(coin_id)) is None:
+            return None
+        incoming = self._in_flight.get((coin_id, exchange.name), [])
+        incoming[:] = [(amount, deadline) for amount, deadline in incoming if deadline > now]
+        return exchange.wallet.get(coin_name, 0.0) + sum(amount for amount, _ in incoming)
+
+    def plan(self) -> list[Move]:
+        """Переводы для монет, обойденных в пределах бюджета"""
+        coins = list(self.targets)
+        moves: list[Move] = []
+        if not coins:
+            return moves
+
+        started = time.monotonic()
+        now = time.time()
+        first = self._cursor
+        for step in range(len(coins)):
+            if step and time.monotonic() - started > self.budget:
+                break
+            coin_id = coins[(first + step) % len(coins)]
+            moves.extend(self.plan_coin(coin_id, now))
+            self._cursor = (first + step + 1) % len(coins)
+        return moves
+
+    def plan_coin(self, coin_id: COIN_ID, now: float | None = None) -> list[Move]:
+        now = time.time() if now is None else now
+        surplus: dict[EXCHANGE_NAME, AMOUNT] = {}
+        deficit: dict[EXCHANGE_NAME, AMOUNT] = {}
+        for exchange_name, target in self.targets.get(coin_id, {}).items():
+            exchange = self.exchanges.get(exchange_name)
+            if exchange is None or (balance := self._balance(exchange, coin_id, now)) is None:
+                continue
+            if balance > target * (1 + self.tolerance):
+                surplus[exchange_name] = balance - target
+            elif balance < target * (1 - self.tolerance):
+                deficit[exchange_name] = target - balance
+        if not surplus or not deficit:
+            return []
+
+        routes: list[tuple[AMOUNT, float, EXCHANGE_NAME, EXCHANGE_NAME, str]] = []
+        for departure in surplus:
+            for destination in deficit:
+                coin = self.mapper.get_best_coin_transfer(departure, destination, coin_id)
+                if coin is None or not coin.has_known_fee:
+                    continue
+                seconds = self.transfer_times.duration(departure, destination, coin.chain)
+                routes.append((coin.fee, seconds, departure, destination, coin.chain))
+        routes.sort()
+
+        moves: list[Move] = []
+        for fee, seconds, departure, destination, _ in routes:
+            amount = min(surplus[departure], deficit[destination] + fee)
+            if amount <= fee or fee > self.max_fee_share * amount:
+                continue
+            moves.append(Move(coin_id, self.exchanges[departure], self.exchanges[destination], amount, fee, seconds))
+            surplus[departure] -= amount
+            deficit[destination] -= amount - fee
+        return moves
+
+    async def execute(self, move: Move) -> bool:
+        coin = self.mapper.get_best_coin_transfer(move.departure.name, move.destination.name, move.coin_id)
+        if coin is None:
+            return False
+        result: bool = await move.departure.withdraw(coin.name, coin.chain, move.amount, move.destination)
+        if result:
+            self.transfer_times.on_withdraw(move.departure.name, move.destination.name, coin.chain, move.coin_id)
+            # до зачисления перевод считается запасом биржи назначения, с запасом по времени на задержки сети
+            self._in_flight.setdefault((move.coin_id, move.destination.name), []).append(
+                (move.amount - move.fee, time.time() + 2 * move.seconds)
+            )
+        return result
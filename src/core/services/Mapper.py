@@ -3,18 +3,24 @@ from collections import defaultdict
 from dataclasses import dataclass, field
 import logging
 import pickle
-from typing import ValuesView 
+from typing import Callable, Iterable, Mapping, ValuesView 
 
 from bidict import ValueDuplicationError, bidict
 
 from core.interfaces import Exchange
+from core.interfaces.INetworkProvider import INetworkProvider, NetworkStatus
 from core.models.dto import Coins, ExchangeDict
 from core.models import Coin
 from core.models.Deal import Deal
+from core.models.ExchangeBase import ExchangeBase
 from core.models.types import CHAIN, COIN_ID, DEPARTURE_NAME, DESTINATION_NAME, FEE, ADDRESS, EXCHANGE_NAME, COIN_NAME
+from core.services.PairRoutes import PairRoutes
+from core.services.MapperSnapshot import SnapshotError, SnapshotInfo, read_snapshot, write_snapshot
 
 logger = logging.getLogger(__name__)
 
+RoutesListener = Callable[[set[COIN_ID]], None]
+
 
 class Mapper:
     def __init__(self):
@@ -26,7 +32,20 @@ class Mapper:
         self._all_coin_names: defaultdict[EXCHANGE_NAME, bidict[COIN_NAME, COIN_ID]] = defaultdict()
         self._usdt: int | None = None
 
-        self._best_transfer: defaultdict[DEPARTURE_NAME, dict[DESTINATION_NAME, dict[COIN_ID, Coin]]] = defaultdict(lambda: defaultdict(dict))
+        # таблица маршрутов пары бирж, один объект под обоими порядками имен
+        self._routes: dict[EXCHANGE_NAME, dict[EXCHANGE_NAME, PairRoutes]] = {}
+        
+        # обратный индекс: монета -> битовая маска бирж, где она торгуется
+        self._exchange_bits: dict[EXCHANGE_NAME, int] = {}
+        self._exchange_coin_ids: dict[EXCHANGE_NAME, frozenset[COIN_ID]] = {}
+        self._coin_exchanges: dict[COIN_ID, int] = {}
+        self._analyzed: set[COIN_ID] = set()
+        self._analyzed_frozen: frozenset[COIN_ID] | None = None
+        
+        # приостановленные сети: нормализованные адреса, по которым биржа не принимает депозит или не выводит
+        self._no_deposit: defaultdict[EXCHANGE_NAME, set[ADDRESS]] = defaultdict(set)
+        self._no_withdraw: defaultdict[EXCHANGE_NAME, set[ADDRESS]] = defaultdict(set)
+        self._routes_listeners: list[RoutesListener] = []
         
     
     @property
@@ -36,29 +55,18 @@ class Mapper:
         return self.__name_iter
 
     async def generate_data(self, exchanges: ValuesView[Exchange]) -> None:
+        """
+        Полная загрузка монет бирж и маршрутов между ними.
+        Монеты разных бирж получают один coin_id по общему адресу контракта; hex-адреса EVM сравниваются
+        без учета регистра. Если сети монеты совпадают с несколькими известными ID, берется наименьший -
+        так же, как в refresh, поэтому ID не зависят от порядка обхода сетей.
+        """
         address_id: dict[str, COIN_ID] = {}
 
         logger.info("Starting data generation for exchanges.")
         
-        # Создаем задачи для всех exchanges
-        tasks = []
-        for departure in exchanges:
-            logger.debug(f"Creating task for exchange: {departure.name}")
-            task = asyncio.create_task(departure.get_current_coins())
-            tasks.append((departure, task))
-
-        # Ждем завершения всех задач
-        results = []
-        for departure, task in tasks:
-            try:
-                coins = await task
-                results.append((departure, coins))
-            except Exception as e:
-                logger.error(f"Error getting coins from {departure.name}: {e}")
-                results.append((departure, None))
-
         # Обрабатываем результаты
-        for departure, coins in results:
+        for departure, coins in await self._fetch_coins(exchanges):
             if coins is not None:
                 logger.debug(f"Processing exchange: {departure.name}")
                 current_exchange_name_id: bidict[COIN_NAME, COIN_ID] = bidict()
@@ -74,23 +82,18 @@ class Mapper:
             
             for coin_name, coin_set in coins.items():
                 c_id: COIN_ID = self.next_id
-                normal_coins: set[Coin] = set()
-                for coin in coin_set:
-                    if not coin.address or not coin.name or coin.fee < 0 or coin.chain == "Aptos" or coin.chain == "ETH" or coin.chain == "ERC20":
-                        continue
-                    else: normal_coins.add(coin)
-                        
-                    if coin.address in address_id:
-                        c_id = address_id[coin.address]
-                        logger.debug(f"Found existing ID {c_id} for coin address '{coin.address}' in global address_id.")
-                        break
+                # все поддерживаемые сети монеты; ID - наименьший среди уже известных адресов, как в refresh
+                normal_coins: set[Coin] = {coin for coin in coin_set if self._is_supported(coin)}
+                if matches := [address_id[address] for coin in normal_coins if (address := self._normalize_address(coin.address)) in address_id]:
+                    c_id = min(matches)
+                    logger.debug(f"Found existing ID {c_id} for coin '{coin_name}' in global address_id.")
                 
                 if coin_name not in current_exchange_name_id: 
-                    if c_id in current_exchange_name_id.inverse: logger.debug(f"ex - {departure.name}, name - {coin.name}, address - {coin.address} | in arr {current_exchange_name_id.inverse[c_id]}")
+                    if c_id in current_exchange_name_id.inverse: logger.debug(f"ex - {departure.name}, name - {coin_name} | in arr {current_exchange_name_id.inverse[c_id]}")
                     else: current_exchange_name_id[coin_name] = c_id
                 
                 for coin in normal_coins:
-                    address_id[coin.address] = c_id
+                    address_id[self._normalize_address(coin.address)] = c_id
                     self._ex_coins[departure.name][c_id].add(coin) 
                     self._ex_coin_dict[departure.name][coin.address] = coin.name, coin.chain
                 
@@ -99,52 +102,17 @@ class Mapper:
 
                 # TODO: заполнение _all_coins
                 
-            self._all_coin_names[departure.name] = current_exchange_name_id
-        
-        def intersection_with_priority(set1: set[Coin], set2: set[Coin]) -> set[Coin]:
-            """Пересечение множеств с приоритетом объектов из set1"""
-            result = set()
-            
-            for coin1 in set1:
-                for coin2 in set2:
-                    if coin1 == coin2:  # Используем перегруженный __eq__
-                        result.add(coin1)  # Добавляем экземпляр из set1
-                        break
-            
-            return result
-        
-        for departure_name, data in self._ex_coins.items():
-            for destination_name, data2 in self._ex_coins.items():
-                if departure_name == destination_name: continue
-                common_coin_ids = set(data.keys()) & set(data2.keys())
-                
-                from pprint import pprint
-                
-                # pprint(common_coin_ids)
-                print(departure_name + "    ----    " + destination_name)
-                for coin_id in common_coin_ids:
-                    
-                    intersection: set[Coin] = intersection_with_priority(data2[coin_id], data[coin_id])
-                    
-                    # if coin_id == self.usdt and departure_name == 'kucoin' and destination_name == 'okx':
-                    #     print('from - ' +  destination_name)
-                    #     pprint(data2[coin_id])
-                    #     print('================')
-                        
-                    #     print('from - ' + departure_name)
-                    #     pprint(data[coin_id])
-                    #     print('================')
-                        
-                    #     print('Intersection: ')
-                    #     pprint(intersection)
-                    
-                    
-                    if len(intersection):
-                        # print(min(intersection))
-                        self._best_transfer[departure_name][destination_name][coin_id] = min(intersection)
+            self._set_exchange_coins(departure.name, current_exchange_name_id)
         
-        
-        # print(self.print_best_transfer())                     
+        # адреса монет каждой биржи: coin_id -> нормализованный адрес -> монета
+        address_maps: dict[EXCHANGE_NAME, dict[COIN_ID, dict[ADDRESS, Coin]]] = {
+            ex_name: {coin_id: self._address_map(coin_set) for coin_id, coin_set in ex_coins.items()}
+            for ex_name, ex_coins in self._ex_coins.items()
+        }
+        ex_names = list(address_maps)
+        for i, departure_name in enumerate(ex_names):
+            for destination_name in ex_names[i + 1:]:
+                self._join_routes(departure_name, destination_name, address_maps[departure_name], address_maps[destination_name])
             
         logger.info(f"Data generation completed. Generated {len(address_id)} unique coin addresses.")
 
@@ -165,22 +133,56 @@ class Mapper:
         return set(self._all_coins.values())
     
     @property
-    def analyzed_coins(self) -> set[COIN_ID]:
-        ex_sets: dict[EXCHANGE_NAME, set[COIN_ID]] = {}
+    def analyzed_coins(self) -> frozenset[COIN_ID]:
+        """Монеты, которые торгуются хотя бы на двух биржах"""
+        if self._analyzed_frozen is None:
+            self._analyzed_frozen = frozenset(self._analyzed)
+        return self._analyzed_frozen
+    
+    def is_analyzed(self, coin_id: COIN_ID) -> bool:
+        return coin_id in self._analyzed
+    
+    def get_exchanges_of(self, coin_id: COIN_ID) -> tuple[EXCHANGE_NAME, ...]:
+        mask = self._coin_exchanges.get(coin_id, 0)
+        return tuple(ex_name for ex_name, bit in self._exchange_bits.items() if mask & bit)
+    
+    def _set_exchange_coins(self, ex_name: EXCHANGE_NAME, coin_names: bidict[COIN_NAME, COIN_ID]) -> None:
+        """Заменяет список монет биржи и обновляет обратный индекс только по изменившимся монетам"""
+        self._all_coin_names[ex_name] = coin_names
         
-        for ex_name, coin_pair in self._all_coin_names.items():
-            ex_sets[ex_name] = set()
-            for ex_name2, coin_pair2 in self._all_coin_names.items():
-                if ex_name == ex_name2: continue
-                intersection: set[COIN_ID] = set(coin_pair.values()) & set(coin_pair2.values())
-                ex_sets[ex_name] |= intersection
+        if (bit := self._exchange_bits.get(ex_name)) is None:
+            bit = self._exchange_bits[ex_name] = 1 << len(self._exchange_bits)
         
-        analyzed_coins: set[COIN_ID] = set()
-            
-        for coin_set in ex_sets.values():
-            analyzed_coins |= coin_set
-            
-        return analyzed_coins
+        old: frozenset[COIN_ID] = self._exchange_coin_ids.get(ex_name, frozenset())
+        new: frozenset[COIN_ID] = frozenset(coin_names.values())
+        self._exchange_coin_ids[ex_name] = new
+        
+        changed = False
+        for coin_id in old - new:
+            mask = self._coin_exchanges.get(coin_id, 0) & ~bit
+            if mask: self._coin_exchanges[coin_id] = mask
+            else: self._coin_exchanges.pop(coin_id, None)
+            if (mask & (mask - 1)) == 0 and coin_id in self._analyzed:
+                self._analyzed.discard(coin_id)
+                changed = True
+        for coin_id in new - old:
+            mask = self._coin_exchanges[coin_id] = self._coin_exchanges.get(coin_id, 0) | bit
+            # два и больше установленных бита - монета есть хотя бы на двух биржах
+            if mask & (mask - 1) and coin_id not in self._analyzed:
+                self._analyzed.add(coin_id)
+                changed = True
+        
+        if changed:
+            self._analyzed_frozen = None
+    
+    def _rebuild_index(self) -> None:
+        self._exchange_bits.clear()
+        self._exchange_coin_ids.clear()
+        self._coin_exchanges.clear()
+        self._analyzed.clear()
+        self._analyzed_frozen = None
+        for ex_name, coin_names in list(self._all_coin_names.items()):
+            self._set_exchange_coins(ex_name, coin_names)
         
     
     # @property
@@ -198,7 +200,48 @@ class Mapper:
     
     def get_best_coin_transfer(self, departure_name: str, destination_name: str, coin_id: int) -> Coin | None:
         # logger.warning(f"from {departure_name} to {destination_name} with {coin_id}")
-        return self._best_transfer.get(departure_name, {}).get(destination_name, {}).get(coin_id)
+        if (pair := self._routes.get(departure_name, {}).get(destination_name)) is None:
+            return None
+        return pair.get(departure_name, coin_id)
+    
+    def get_transfers_from(self, departure_name: str, coin_id: int) -> dict[DESTINATION_NAME, Coin]:
+        """Лучшие переводы монеты с биржи по всем биржам назначения"""
+        return {
+            destination_name: coin
+            for destination_name, pair in self._routes.get(departure_name, {}).items()
+            if (coin := pair.get(departure_name, coin_id)) is not None
+        }
+    
+    def transfer_tables(self) -> dict[DEPARTURE_NAME, dict[DESTINATION_NAME, dict[COIN_ID, Coin]]]:
+        """Все маршруты в виде словарей: откуда -> куда -> coin_id -> монета"""
+        tables: dict[DEPARTURE_NAME, dict[DESTINATION_NAME, dict[COIN_ID, Coin]]] = {}
+        for departure_name, destinations in self._routes.items():
+            for destination_name, pair in destinations.items():
+                if coins := dict(pair.items(departure_name)):
+                    tables.setdefault(departure_name, {})[destination_name] = coins
+        return tables
+    
+    def _set_pair(self, routes: dict[EXCHANGE_NAME, dict[EXCHANGE_NAME, PairRoutes]], first_name: EXCHANGE_NAME, second_name: EXCHANGE_NAME, pair: PairRoutes | None) -> None:
+        if pair is not None and len(pair):
+            routes.setdefault(first_name, {})[second_name] = pair
+            routes.setdefault(second_name, {})[first_name] = pair
+        else:
+            routes.get(first_name, {}).pop(second_name, None)
+            routes.get(second_name, {}).pop(first_name, None)
+    
+    def _set_tables(self, tables: Mapping[DEPARTURE_NAME, Mapping[DESTINATION_NAME, Mapping[COIN_ID, Coin]]]) -> None:
+        """Собирает таблицы пар из словарей маршрутов (старый pickle, снимок)"""
+        rows: defaultdict[tuple[EXCHANGE_NAME, EXCHANGE_NAME], dict[COIN_ID, list[Coin | None]]] = defaultdict(dict)
+        for departure_name, destinations in tables.items():
+            for destination_name, coins in destinations.items():
+                key = (departure_name, destination_name) if departure_name < destination_name else (destination_name, departure_name)
+                side = 0 if departure_name == key[0] else 1
+                for coin_id, coin in coins.items():
+                    rows[key].setdefault(coin_id, [None, None])[side] = coin
+        self._routes = {}
+        for (first_name, second_name), coins in rows.items():
+            pair = PairRoutes(first_name, second_name, ((coin_id, forward, backward) for coin_id, (forward, backward) in coins.items()))
+            self._set_pair(self._routes, first_name, second_name, pair)
     
     def get_fee(self, deal: Deal, coin_id: COIN_ID | None = None) -> FEE | None:
         if coin := self.get_best_coin_transfer(
@@ -229,14 +272,304 @@ class Mapper:
         return self._usdt
     
     
+    async def _fetch_coins(self, exchanges: Iterable[Exchange]) -> list[tuple[Exchange, dict[COIN_NAME, set[Coin]] | None]]:
+        # Создаем задачи для всех exchanges
+        tasks = []
+        for departure in exchanges:
+            logger.debug(f"Creating task for exchange: {departure.name}")
+            task = asyncio.create_task(departure.get_current_coins())
+            tasks.append((departure, task))
+
+        # Ждем завершения всех задач
+        results = []
+        for departure, task in tasks:
+            try:
+                coins = await task
+                results.append((departure, coins))
+            except Exception as e:
+                logger.error(f"Error getting coins from {departure.name}: {e}")
+                results.append((departure, None))
+        return results
+    
+    @staticmethod
+    def _is_supported(coin: Coin) -> bool:
+        return bool(coin.address and coin.name) and coin.fee >= 0 and coin.chain not in ("Aptos", "ETH", "ERC20")
+    
+    @staticmethod
+    def _coin_key(coin: Coin) -> tuple[ADDRESS, COIN_NAME, CHAIN, FEE]:
+        return coin.address, coin.name, coin.chain, coin.fee
+    
+    async def refresh(self, exchanges: Iterable[Exchange]) -> set[COIN_ID]:
+        """
+        Сверяет текущие списки монет бирж с загруженными и применяет только изменения:
+        пересчитываются маршруты монет, у которых поменялись сети или комиссии.
+        Returns:
+            измененные монеты
+        """
+        # адрес -> ID монеты на каждой бирже, где он есть
+        owners: defaultdict[ADDRESS, dict[EXCHANGE_NAME, COIN_ID]] = defaultdict(dict)
+        for ex_name, ex_coins in self._ex_coins.items():
+            for coin_id, coin_set in ex_coins.items():
+                for coin in coin_set:
+                    owners[self._normalize_address(coin.address)][ex_name] = coin_id
+        
+        changed: dict[EXCHANGE_NAME, set[COIN_ID]] = {}
+        for exchange, coins in await self._fetch_coins(exchanges):
+            if not coins:
+                logger.warning(f"No coins returned from {exchange.name}. Keeping the loaded list.")
+                continue
+            if coin_ids := self._update_exchange(exchange.name, coins, owners):
+                changed[exchange.name] = coin_ids
+        
+        result = self._rejoin(changed)
+        logger.info(f"Refresh changed {len(result)} coins on {len(changed)} exchanges")
+        return result
+    
+    def _update_exchange(self, ex_name: EXCHANGE_NAME, coins: dict[COIN_NAME, set[Coin]], owners: defaultdict[ADDRESS, dict[EXCHANGE_NAME, COIN_ID]]) -> set[COIN_ID]:
+        """
+        Заменяет монеты биржи свежим списком.
+        ID берется по адресу контракта на других биржах, затем прежний ID названия, иначе новый.
+        """
+        known: bidict[COIN_NAME, COIN_ID] = self._all_coin_names.get(ex_name, bidict())
+        names: bidict[COIN_NAME, COIN_ID] = bidict()
+        ex_coins: defaultdict[COIN_ID, set[Coin]] = defaultdict(set)
+        coin_dict: dict[ADDRESS, tuple[COIN_NAME, CHAIN]] = {}
+        
+        for coin_name, coin_set in coins.items():
+            normal_coins = {coin for coin in coin_set if self._is_supported(coin)}
+            matches = [
+                coin_id
+                for coin in normal_coins
+                for owner, coin_id in owners.get(self._normalize_address(coin.address), {}).items()
+                if owner != ex_name
+            ]
+            c_id = min(matches) if matches else known.get(coin_name)
+            if c_id is None:
+                c_id = self.next_id
+            if c_id not in names.inverse:
+                names[coin_name] = c_id
+            for coin in normal_coins:
+                ex_coins[c_id].add(coin)
+                coin_dict[coin.address] = coin.name, coin.chain
+        
+        old = self._ex_coins.get(ex_name, {})
+        for coin_id, coin_set in old.items():
+            for coin in coin_set:
+                owners[self._normalize_address(coin.address)].pop(ex_name, None)
+        for coin_id, coin_set in ex_coins.items():
+            for coin in coin_set:
+                owners[self._normalize_address(coin.address)][ex_name] = coin_id
+        
+        changed = {
+            coin_id
+            for coin_id in old.keys() | ex_coins.keys()
+            if {self._coin_key(coin) for coin in old.get(coin_id, ())} != {self._coin_key(coin) for coin in ex_coins.get(coin_id, ())}
+        }
+        changed |= set(known.values()) ^ set(names.values())
+        
+        self._ex_coins[ex_name] = ex_coins
+        self._ex_coin_dict[ex_name] = coin_dict
+        self._set_exchange_coins(ex_name, names)
+        return changed
+    
+    @staticmethod
+    def _normalize_address(address: ADDRESS) -> ADDRESS:
+        """Hex-адреса EVM сравниваются без учета регистра, остальные (base58 и т.п.) - как есть"""
+        address = address.strip()
+        return address.lower() if address[:2] in ('0x', '0X') else address
+    
+    @classmethod
+    def _address_map(cls, coin_set: set[Coin]) -> dict[ADDRESS, Coin]:
+        coins: dict[ADDRESS, Coin] = {}
+        for coin in coin_set:
+            address = cls._normalize_address(coin.address)
+            if (known := coins.get(address)) is None or coin < known:
+                coins[address] = coin
+        return coins
+    
+    def _join_routes(
+        self,
+        first_name: EXCHANGE_NAME,
+        second_name: EXCHANGE_NAME,
+        first: dict[COIN_ID, dict[ADDRESS, Coin]],
+        second: dict[COIN_ID, dict[ADDRESS, Coin]],
+    ) -> None:
+        """
+        Лучшие переводы между парой бирж в обе стороны за один проход: hash join по адресам контрактов.
+        Для перевода берется сеть биржи назначения, из общих сетей - с минимальной комиссией.
+        """
+        if len(first) > len(second):
+            first_name, second_name, first, second = second_name, first_name, second, first
+        
+        rows: list[tuple[COIN_ID, Coin | None, Coin | None]] = []
+        for coin_id, first_coins in first.items():
+            if (second_coins := second.get(coin_id)) is None:
+                continue
+            rows.append((coin_id, *self._best_pair(first_name, second_name, first_coins, second_coins)))
+        
+        self._set_pair(self._routes, first_name, second_name, PairRoutes(first_name, second_name, rows))
+    
+    def _can_transfer(self, departure_name: DEPARTURE_NAME, destination_name: DESTINATION_NAME, address: ADDRESS) -> bool:
+        return address not in self._no_withdraw.get(departure_name, ()) and address not in self._no_deposit.get(destination_name, ())
+    
+    def _best_pair(
+        self,
+        first_name: EXCHANGE_NAME,
+        second_name: EXCHANGE_NAME,
+        first: dict[ADDRESS, Coin],
+        second: dict[ADDRESS, Coin],
+    ) -> tuple[Coin | None, Coin | None]:
+        """Лучшие сети first -> second и second -> first среди общих адресов без приостановленных выводов и депозитов"""
+        common = first.keys() & second.keys()
+        there = [second[address] for address in common if self._can_transfer(first_name, second_name, address)]
+        back = [first[address] for address in common if self._can_transfer(second_name, first_name, address)]
+        return min(there) if there else None, min(back) if back else None
+    
+    def _route_pair(self, first_name: EXCHANGE_NAME, second_name: EXCHANGE_NAME, coin_id: COIN_ID) -> tuple[Coin | None, Coin | None]:
+        """Маршруты одной монеты между парой бирж в обе стороны"""
+        return self._best_pair(
+            first_name,
+            second_name,
+            self._address_map(self._ex_coins.get(first_name, {}).get(coin_id, set())),
+            self._address_map(self._ex_coins.get(second_name, {}).get(coin_id, set())),
+        )
+    
+    def _rejoin(self, changed: Mapping[EXCHANGE_NAME, set[COIN_ID]]) -> set[COIN_ID]:
+        """
+        Пересчитывает маршруты измененных монет и подменяет _routes целиком.
+        Затронутые пары бирж собираются новыми таблицами, поэтому читатели, взявшие
+        прежние маршруты, не видят половину обновления.
+        Returns:
+            монеты, у которых изменился хотя бы один маршрут или набор сетей
+        """
+        # (first, second) таблицы пары -> coin_id -> (first -> second, second -> first)
+        updates: dict[tuple[EXCHANGE_NAME, EXCHANGE_NAME], dict[COIN_ID, tuple[Coin | None, Coin | None]]] = {}
+        result: set[COIN_ID] = set()
+        for ex_name, coin_ids in changed.items():
+            result |= coin_ids
+            for other_name in list(self._ex_coins):
+                if other_name == ex_name:
+                    continue
+                # порядок пары - как у ее таблицы, для новой пары - по именам
+                if (old := self._routes.get(ex_name, {}).get(other_name)) is not None:
+                    key = (old.first, old.second)
+                else:
+                    key = (ex_name, other_name) if ex_name < other_name else (other_name, ex_name)
+                reverse = key[0] != ex_name
+                rows = updates.setdefault(key, {})
+                for coin_id in coin_ids:
+                    there, back = self._route_pair(ex_name, other_name, coin_id)
+                    rows[coin_id] = (back, there) if reverse else (there, back)
+        
+        staged = {departure_name: dict(destinations) for departure_name, destinations in self._routes.items()}
+        for (first_name, second_name), rows in updates.items():
+            if (old := self._routes.get(first_name, {}).get(second_name)) is not None:
+                pair = old.replace(rows)
+            else:
+                pair = PairRoutes(first_name, second_name, ((coin_id, forward, backward) for coin_id, (forward, backward) in rows.items()))
+            self._set_pair(staged, first_name, second_name, pair)
+        
+        self._routes = staged
+        self._notify_routes(result)
+        return result
+    
+    def subscribe_routes(self, listener: RoutesListener) -> None:
+        """listener получает монеты, у которых поменялись маршруты, сети или комиссии перевода"""
+        self._routes_listeners.append(listener)
+    
+    def _notify_routes(self, coin_ids: set[COIN_ID]) -> None:
+        if not coin_ids:
+            return
+        for listener in self._routes_listeners:
+            try:
+                listener(coin_ids)
+            except Exception as e:
+                logger.error(f"Error notifying routes listener: {e}")
+    
+    def apply_network_status(self, ex_name: EXCHANGE_NAME, status: Mapping[COIN_NAME, Mapping[CHAIN, NetworkStatus]]) -> set[COIN_ID]:
+        """
+        Применяет комиссии и приостановки сетей биржи, маршруты не пересчитывает.
+        Монета с новой комиссией заменяется новым объектом: прежний остается у тех, кто его уже взял.
+        Сети, которых нет в status, не трогаются; новые сети добавляет только refresh.
+        Returns:
+            монеты биржи, у которых что-то изменилось
+        """
+        changed: set[COIN_ID] = set()
+        no_deposit: set[ADDRESS] = set()
+        no_withdraw: set[ADDRESS] = set()
+        old_deposit = self._no_deposit.get(ex_name, set())
+        old_withdraw = self._no_withdraw.get(ex_name, set())
+        
+        for coin_id, coin_set in self._ex_coins.get(ex_name, {}).items():
+            updated: set[Coin] | None = None
+            for coin in coin_set:
+                address = self._normalize_address(coin.address)
+                if (network := status.get(coin.name, {}).get(coin.chain)) is None:
+                    # нет данных - прежнее состояние сети сохраняется
+                    if address in old_deposit: no_deposit.add(address)
+                    if address in old_withdraw: no_withdraw.add(address)
+                    continue
+                
+                fee, deposit, withdraw = network
+                if not deposit: no_deposit.add(address)
+                if not withdraw: no_withdraw.add(address)
+                if (address in old_deposit) != (not deposit) or (address in old_withdraw) != (not withdraw):
+                    changed.add(coin_id)
+                
+                if fee >= 0 and fee != coin.fee:
+                    if updated is None:
+                        updated = set(coin_set)
+                    updated.discard(coin)
+                    updated.add(Coin(coin.address, coin.name, coin.chain, fee))
+                    changed.add(coin_id)
+            
+            if updated is not None:
+                self._ex_coins[ex_name][coin_id] = updated
+        
+        self._no_deposit[ex_name] = no_deposit
+        self._no_withdraw[ex_name] = no_withdraw
+        return changed
+    
+    async def refresh_networks(self, providers: Mapping[ExchangeBase, INetworkProvider]) -> set[COIN_ID]:
+        """Комиссии и приостановки сетей со всех бирж, затем пересчет маршрутов только измененных монет"""
+        changed: dict[EXCHANGE_NAME, set[COIN_ID]] = {}
+        
+        async def load(exchange: ExchangeBase, provider: INetworkProvider) -> None:
+            try:
+                status = await provider.get_network_status()
+            except Exception as e:
+                logger.error(f"Could not load networks for {exchange.name}: {e}")
+                return
+            if not status:
+                logger.warning(f"No network status returned from {exchange.name}. Keeping the loaded one.")
+                return
+            if coin_ids := self.apply_network_status(exchange.name, status):
+                changed[exchange.name] = coin_ids
+        
+        await asyncio.gather(*(load(exchange, provider) for exchange, provider in providers.items()))
+        
+        result = self._rejoin(changed)
+        if result:
+            logger.info(f"Networks changed for {len(result)} coins on {len(changed)} exchanges")
+        return result
+    
+    async def launch_network_refresh(self, providers: Mapping[ExchangeBase, INetworkProvider], interval: float = 600.0) -> None:
+        """Периодическое обновление комиссий и состояния сетей"""
+        try:
+            while True:
+                await self.refresh_networks(providers)
+                await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            logger.info("Network refresh cancelled")
+    
     def print_best_transfer(self) -> str:
         """Красивый вывод best_transfer в виде дерева"""
-        if not self._best_transfer:
+        if not (tables := self.transfer_tables()):
             return "No transfer data available"
         
         result = ["🏗️  Best Transfer Routes:"]
         
-        for departure, destinations in self._best_transfer.items():
+        for departure, destinations in tables.items():
             result.append(f"┌─ From: {departure}")
             
             dest_list = list(destinations.items())
@@ -257,6 +590,96 @@ class Mapper:
     
     
     
+    def save_snapshot(self, path: str) -> SnapshotInfo:
+        """
+        Бинарный снимок для быстрого старта: монеты хранятся одной таблицей,
+        маршруты и списки бирж ссылаются на строки таблицы.
+        """
+        table: list[tuple[ADDRESS, COIN_NAME, CHAIN, FEE]] = []
+        rows: dict[int, int] = {}
+        
+        def row(coin: Coin) -> int:
+            if (index := rows.get(id(coin))) is None:
+                index = rows[id(coin)] = len(table)
+                table.append(self._coin_key(coin))
+            return index
+        
+        data = {
+            'name_iter': self.__name_iter,
+            'usdt': self._usdt,
+            'ex_coins': {ex_name: {coin_id: [row(coin) for coin in coin_set] for coin_id, coin_set in ex_coins.items()} for ex_name, ex_coins in self._ex_coins.items()},
+            'ex_coin_dict': {ex_name: dict(coin_dict) for ex_name, coin_dict in self._ex_coin_dict.items()},
+            'names': {ex_name: dict(names) for ex_name, names in self._all_coin_names.items()},
+            'best': {
+                departure_name: {destination_name: {coin_id: row(coin) for coin_id, coin in coins.items()} for destination_name, coins in destinations.items()}
+                for departure_name, destinations in self.transfer_tables().items()
+            },
+        }
+        data['coins'] = table
+        return write_snapshot(path, data)
+    
+    def load_snapshot(self, path: str, max_age: float | None = None) -> SnapshotInfo | None:
+        """
+        Загружает снимок; None - файла нет или он поврежден, нужен generate_data.
+        Устаревший снимок тоже загружается: торговля начинается сразу, а refresh догоняет изменения.
+        """
+        try:
+            data, info = read_snapshot(path)
+        except FileNotFoundError:
+            logger.info(f"Snapshot {path} not found")
+            return None
+        except SnapshotError as e:
+            logger.error(f"Snapshot rejected: {e}")
+            return None
+        
+        if max_age is not None and info.is_stale(max_age):
+            logger.warning(f"Snapshot {path} is {info.age:.0f}s old, refresh is required")
+        
+        coins = [Coin(*key) for key in data['coins']]
+        self.__name_iter = data['name_iter']
+        self._usdt = data['usdt']
+        
+        self._ex_coins = defaultdict(lambda: defaultdict(set))
+        for ex_name, ex_coins in data['ex_coins'].items():
+            for coin_id, indexes in ex_coins.items():
+                self._ex_coins[ex_name][coin_id] = {coins[index] for index in indexes}
+        
+        self._ex_coin_dict = defaultdict(dict)
+        self._ex_coin_dict.update({ex_name: dict(coin_dict) for ex_name, coin_dict in data['ex_coin_dict'].items()})
+        
+        self._all_coin_names = defaultdict(bidict)
+        self._all_coin_names.update({ex_name: bidict(names) for ex_name, names in data['names'].items()})
+        
+        self._set_tables({
+            departure_name: {destination_name: {coin_id: coins[index] for coin_id, index in routes.items()} for destination_name, routes in destinations.items()}
+            for departure_name, destinations in data['best'].items()
+        })
+        
+        self._rebuild_index()
+        return info
+    
+    async def warm_start(self, path: str, exchanges: Iterable[Exchange], max_age: float | None = None) -> asyncio.Task | None:
+        """
+        Старт со снимка: данные доступны сразу, refresh со свежими списками бирж идет в фоне и обновляет снимок.
+        Без пригодного снимка - полный generate_data.
+        Returns:
+            фоновая задача refresh или None
+        """
+        exchanges = list(exchanges)
+        if self.load_snapshot(path, max_age) is None:
+            await self.generate_data(exchanges) # type: ignore
+            self.save_snapshot(path)
+            return None
+        
+        async def refresh_and_save() -> None:
+            try:
+                await self.refresh(exchanges)
+                self.save_snapshot(path)
+            except Exception as e:
+                logger.exception(f"Background refresh failed: {e}")
+        
+        return asyncio.create_task(refresh_and_save())
+    
     def save(self, filename: str) -> None:
         """
         Сохраняет состояние объекта Mapper в файл
@@ -272,7 +695,7 @@ class Mapper:
             '_ex_coin_dict': dict(self._ex_coin_dict),  # Преобразуем defaultdict в dict
             '_all_coin_names': dict(self._all_coin_names),  # Преобразуем defaultdict в dict
             '_usdt': self._usdt,
-            '_best_transfer': dict(self._best_transfer)  # Преобразуем defaultdict в dict
+            '_best_transfer': self.transfer_tables()
         }
         
         with open(filename, 'wb') as f:
@@ -302,11 +725,11 @@ class Mapper:
             
             self._all_coin_names = defaultdict(bidict)
             self._all_coin_names.update(data['_all_coin_names'])
+            self._rebuild_index()
             
             self._usdt = data['_usdt']
             
-            self._best_transfer = defaultdict(lambda: defaultdict(dict))
-            self._best_transfer.update(data['_best_transfer'])
+            self._set_tables(data['_best_transfer'])
             
         except FileNotFoundError:
             print(f"Файл {filename} не найден")
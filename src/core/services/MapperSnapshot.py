@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+import marshal
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from typing import Any
+
+# заголовок: сигнатура, версия схемы, версия Python (major, minor), длина данных, время создания, crc32 данных
+MAGIC = b'MAPS'
+SCHEMA = 2
+_PREFIX = struct.Struct('<4sH')
+_HEADER = struct.Struct('<4sHBBQdI')
+# формат marshal не обязан совпадать между версиями Python
+PYTHON = sys.version_info[:2]
+
+
+class SnapshotError(ValueError):
+    """Снимок Mapper поврежден или записан другой версией схемы"""
+
+
+@dataclass(frozen=True)
+class SnapshotInfo:
+    schema: int
+    created_at: float
+    size: int
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    def is_stale(self, max_age: float) -> bool:
+        return self.age > max_age
+
+
+def write_snapshot(path: str, data: Any) -> SnapshotInfo:
+    """
+    Пишет данные (только встроенные типы: dict, list, tuple, str, int, float, None) в бинарный снимок.
+    Файл пишется во временный и подменяется атомарно, читатель не увидит половину записи.
+    """
+    payload = marshal.dumps(data)
+    info = SnapshotInfo(SCHEMA, time.time(), len(payload))
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, SCHEMA, *PYTHON, len(payload), info.created_at, zlib.crc32(payload)))
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return info
+
+
+def read_snapshot(path: str) -> tuple[Any, SnapshotInfo]:
+    """
+    Отображает снимок в память, проверяет сигнатуру, схему, версию Python и контрольную сумму.
+    Снимок другой версии Python отвергается так же, как поврежденный: marshal может его не прочитать.
+    """
+    with open(path, 'rb') as f:
+        # пустой файл нельзя отобразить в память
+        if os.fstat(f.fileno()).st_size < _PREFIX.size:
+            raise SnapshotError(f"{path}: file is too short")
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"{path}: {e}") from e
+    with mm:
+        magic, schema = _PREFIX.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path}: not a mapper snapshot")
+        if schema != SCHEMA:
+            raise SnapshotError(f"{path}: schema {schema}, expected {SCHEMA}")
+        if len(mm) < _HEADER.size:
+            raise SnapshotError(f"{path}: file is too short")
+        _, _, major, minor, size, created_at, crc = _HEADER.unpack_from(mm, 0)
+        if (major, minor) != PYTHON:
+            raise SnapshotError(f"{path}: written by Python {major}.{minor}, running {PYTHON[0]}.{PYTHON[1]}")
+        if len(mm) != _HEADER.size + size:
+            raise SnapshotError(f"{path}: truncated, {len(mm) - _HEADER.size} of {size} bytes")
+
+        payload = memoryview(mm)[_HEADER.size:]
+        try:
+            if zlib.crc32(payload) != crc:
+                raise SnapshotError(f"{path}: checksum mismatch")
+            try:
+                data = marshal.loads(payload)
+            except (EOFError, TypeError, ValueError) as e:
+                raise SnapshotError(f"{path}: {e}") from e
+        finally:
+            payload.release()
+    return data, SnapshotInfo(schema, created_at, size)
@@ -0,0 +1,53 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, Mapping
+
+from core.models.Coin import Coin
+from core.models.types import COIN_ID, EXCHANGE_NAME
+
+# (coin_id, перевод first -> second, перевод second -> first)
+RouteRow = tuple[COIN_ID, Coin | None, Coin | None]
+
+
+class PairRoutes:
+    """
+    Лучшие переводы между парой бирж в обе стороны.
+    coin_id пары лежат в отсортированном массиве, маршруты обоих направлений - в параллельных списках,
+    поиск монеты - бинарный. Таблица не меняется после создания: обновление собирает новую.
+    """
+
+    __slots__ = ('first', 'second', '_coin_ids', '_forward', '_backward')
+
+    def __init__(self, first: EXCHANGE_NAME, second: EXCHANGE_NAME, rows: Iterable[RouteRow]) -> None:
+        self.first = first
+        self.second = second
+        rows = sorted((row for row in rows if row[1] is not None or row[2] is not None), key=lambda row: row[0])
+        self._coin_ids: array = array('q', (row[0] for row in rows))
+        self._forward: list[Coin | None] = [row[1] for row in rows]
+        self._backward: list[Coin | None] = [row[2] for row in rows]
+
+    def __len__(self) -> int:
+        return len(self._coin_ids)
+
+    def _routes(self, departure_name: EXCHANGE_NAME) -> list[Coin | None]:
+        return self._forward if departure_name == self.first else self._backward
+
+    def get(self, departure_name: EXCHANGE_NAME, coin_id: COIN_ID) -> Coin | None:
+        coin_ids = self._coin_ids
+        index = bisect_left(coin_ids, coin_id)
+        if index == len(coin_ids) or coin_ids[index] != coin_id:
+            return None
+        return self._routes(departure_name)[index]
+
+    def items(self, departure_name: EXCHANGE_NAME) -> Iterator[tuple[COIN_ID, Coin]]:
+        """Маршруты с биржи departure_name"""
+        return ((coin_id, coin) for coin_id, coin in zip(self._coin_ids, self._routes(departure_name)) if coin is not None)
+
+    def rows(self) -> Iterator[RouteRow]:
+        return zip(self._coin_ids, self._forward, self._backward)
+
+    def replace(self, updates: Mapping[COIN_ID, tuple[Coin | None, Coin | None]]) -> 'PairRoutes':
+        """Новая таблица с замененными строками; (None, None) удаляет монету"""
+        rows = {coin_id: (forward, backward) for coin_id, forward, backward in self.rows()}
+        rows.update(updates)
+        return PairRoutes(self.first, self.second, ((coin_id, forward, backward) for coin_id, (forward, backward) in rows.items()))
@@ -97,7 +97,6 @@ class CcxtExchange(BalanceObserver, PriceObserver, Trader, Courier):
             self.logger.error(f"[{self.name}] Error in start: {e}")
         finally:
             self._is_running = False
-            for coin_id in self.coins.values():
-                self.logger.debug(f"[{self.name}]: clear coin {coin_id} in analyst")
-                await self._price_notify(coin_id, -10.0)
+            self.logger.debug(f"[{self.name}]: clear coins in analyst")
+            await self._prices_notify([(coin_id, -10.0, -10.0) for coin_id in self.coins.values()])
             self.logger.info(f"[{self.name}] Мониторинг остановлен")
@@ -1,6 +1,7 @@
 from abc import abstractmethod
 from bidict import bidict
-from typing import Optional, Any
+from collections import defaultdict
+from typing import Hashable, Iterable, Optional, Any
 
 import ccxt
 
@@ -9,6 +10,7 @@ from core.interfaces import Exchange
 # from core.models import Coin
 from core.models.Coins import  Coin
 from core.protocols import BalanceSubscriber, PriceSubscriber
+from core.protocols.PriceSubscriber import BatchPriceSubscriber, PriceBatch
 from core.models.types import COIN_ID, DESTINATION, COIN_NAME, AMOUNT, CHAIN
 
 
@@ -18,6 +20,7 @@ import ccxt.pro  as ccxtpro
 import logging
 
 from core.services.Mapper import Mapper
+from infrastructure.services.CoinDiscovery import CoinDiscovery, Request
 
 
 # этот класс ничего не должен знать о COIN_ID
@@ -30,8 +33,12 @@ class CcxtExchange(Exchange):
         
         self.balance_sudscribers: set[BalanceSubscriber] = set()
         self.price_subscribers: set[PriceSubscriber] = set()
+        self._batch_subscribers: set[BatchPriceSubscriber] = set()
         self.__coin_locks: dict[COIN_NAME, asyncio.Lock] = {}
         self.logger = logging.getLogger(f'CcxtExchange.{name}')
+        # запросы обнаружения монет идут параллельно в пределах лимита запросов биржи
+        rate_limit = getattr(instance, 'rateLimit', None)
+        self.discovery = CoinDiscovery(name, weight_per_second=1000.0 / rate_limit if rate_limit else 10.0)
     
     @property
     def instance(self) -> ccxtpro.Exchange:
@@ -104,9 +111,8 @@ class CcxtExchange(Exchange):
         finally:
             # Cleanup
             self._is_running = False
-            for coin_id in self.coins.values():
-                self.logger.debug(f"[{self.name}]: clear coin {coin_id} in analyst")
-                await self._price_notify(coin_id, -10.0)
+            self.logger.debug(f"[{self.name}]: clear coins in analyst")
+            await self._prices_notify([(coin_id, -10.0, -10.0) for coin_id in self.coins.values()])
             self.logger.info(f"[{self.name}] Мониторинг остановлен")
     
     def _get_symbols(self, coin_names: list[COIN_NAME]) -> list[str]:
@@ -120,24 +126,20 @@ class CcxtExchange(Exchange):
             while self._is_running:
                 try:
                     tickers = await self.instance.watch_tickers(symbols)
+                    batch: PriceBatch = []
                     for symbol, ticker in tickers.items():
                         coin_name = symbol.split('/')[0]
                         
-                        price = 0 #ticker['last']
-                        
-                        if (ticker['ask'] is not None):
-                            price = ticker['ask']
-                            
-                        elif (ticker['lastPrice'] is not None):
-                            price = ticker['lastPrice']
-                            
-                        elif (ticker['info']['lastPrice'] is not None):
-                            price = ticker['info']['lastPrice']
+                        last = ticker.get('last') or ticker['info'].get('lastPrice') or 0
+                        ask = ticker['ask'] if ticker.get('ask') is not None else last
+                        bid = ticker['bid'] if ticker.get('bid') is not None else last
                             
-                        if (price == 0):
+                        if (ask == 0 or bid == 0):
                             self.logger.warning(f"There is not fee data for Coin {coin_name} in exchange {self.name}")
                         
-                        await self._price_notify(coin_name, price)
+                        batch.append((coin_name, float(ask), float(bid)))
+
+                    await self._prices_notify(batch)
                     
                 except asyncio.CancelledError:
                     self.logger.debug(f"Observation cancelled for {self.name}")
@@ -149,19 +151,40 @@ class CcxtExchange(Exchange):
         except Exception as e:
             self.logger.exception(f"Fatal error: {e}")
     
-    async def _price_notify(self, coin_name: str, value: float):
+    async def _price_notify(self, coin_name: str, ask: float, bid: float | None = None):
         for sub in self.price_subscribers:
             try:
-                asyncio.create_task(sub.on_price_update(coin_name, value))
+                asyncio.create_task(sub.on_price_update(coin_name, ask, bid))
+            except Exception as e:
+                self.logger.exception(f"Error notifying price subscriber: {e}")
+
+    @staticmethod
+    async def _per_coin_notify(sub: PriceSubscriber, batch: PriceBatch):
+        """Адаптер для подписчиков без on_prices_update"""
+        for coin_name, ask, bid in batch:
+            await sub.on_price_update(coin_name, ask, bid)
+
+    async def _prices_notify(self, batch: PriceBatch):
+        """Один кадр тикеров - одна задача на подписчика"""
+        if not batch:
+            return
+        for sub in self.price_subscribers:
+            try:
+                if sub in self._batch_subscribers:
+                    asyncio.create_task(sub.on_prices_update(batch)) # type: ignore
+                else:
+                    asyncio.create_task(self._per_coin_notify(sub, batch))
             except Exception as e:
                 self.logger.exception(f"Error notifying price subscriber: {e}")
 
-                
     async def subscribe_price(self, sub: PriceSubscriber):
         self.price_subscribers.add(sub)
+        if isinstance(sub, BatchPriceSubscriber):
+            self._batch_subscribers.add(sub)
         
     async def unsubscribe_price(self, sub: PriceSubscriber):
         self.price_subscribers.discard(sub)
+        self._batch_subscribers.discard(sub) # type: ignore
     
     # Balance observer
     async def _balance_notify(self, coin_name: str, value: float):
@@ -354,8 +377,53 @@ class CcxtExchange(Exchange):
         return False
 
     async def get_current_coins(self) -> dict[COIN_NAME, set[Coin]]:
-        # loge NotImplementedError
-        return {}
+        """
+        Общий конвейер обнаружения: валюты с парой к USDT, параллельные запросы
+        из _discovery_requests, затем разбор ответов биржей в _parse_coins.
+        """
+        markets = await self.instance.fetch_markets()
+        currencies: dict | None = await self.instance.fetch_currencies()
+        if not currencies:
+            self.logger.warning(f"No currencies fetched from {self.name}.")
+            return {}
+        
+        usdt_bases = self._usdt_bases(markets)
+        candidates = {coin_name: item for coin_name, item in currencies.items() if coin_name == "USDT" or coin_name in usdt_bases}
+        
+        requests: dict[tuple[COIN_NAME, Hashable], Request] = {}
+        for coin_name, item in candidates.items():
+            for key, request in self._discovery_requests(coin_name, item).items():
+                requests[coin_name, key] = request
+        self.logger.info(f"Discovering {len(candidates)} currencies with {len(requests)} requests")
+        
+        responses: defaultdict[COIN_NAME, dict[Hashable, Any]] = defaultdict(dict)
+        for (coin_name, key), response in (await self.discovery.run(requests)).items():
+            responses[coin_name][key] = response
+        
+        coins: defaultdict[COIN_NAME, set[Coin]] = defaultdict(set)
+        for coin_name, item in candidates.items():
+            try:
+                for coin in self._parse_coins(coin_name, item, responses.get(coin_name, {})):
+                    coins[coin_name].add(coin)
+            except (KeyError, TypeError, ValueError) as e:
+                self.logger.warning(f"Could not parse {coin_name}: {e}")
+        return coins
+    
+    @staticmethod
+    def _usdt_bases(markets: list[dict]) -> set[COIN_NAME]:
+        return {
+            market['base']
+            for market in markets
+            if market['quote'] == 'USDT' and market['active'] and market['symbol'] == f"{market['base']}/USDT"
+        }
+    
+    def _discovery_requests(self, coin_name: COIN_NAME, item: dict) -> dict[Hashable, Request]:
+        """Запросы, нужные для разбора валюты; по умолчанию - адреса депозита по всем сетям"""
+        return {'addresses': lambda: self.instance.fetch_deposit_addresses_by_network(coin_name)}
+    
+    def _parse_coins(self, coin_name: COIN_NAME, item: dict, responses: dict[Hashable, Any]) -> Iterable[Coin]:
+        """Монеты валюты по ответу fetch_currencies и успешным запросам _discovery_requests"""
+        return ()
         
     def set_coins_by_mapper(self, coins: bidict[COIN_NAME, COIN_ID]):
         self.coins = coins
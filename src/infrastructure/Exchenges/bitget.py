@@ -1,49 +1,37 @@
+from functools import partial
+from typing import Any, Hashable, Iterable, Iterator
 from core.models.dto import Coins
 from core.models import Coin
 from infrastructure.CcxtExchange import CcxtExchange
 from core.models.types import COIN_NAME
-from collections import defaultdict
+from infrastructure.services.CoinDiscovery import Request
 
 class BitgetExchange(CcxtExchange):
-    async def get_current_coins(self) -> dict[COIN_NAME, set[Coin]]:
-        markets = await self.instance.fetch_markets()
-        currencies: dict | None= await self.instance.fetch_currencies()
-        if not currencies:
-            self.logger.warning(f"No currencies fetched from {self.name}.")
-            return {}
-        
-        coins: defaultdict[COIN_NAME, set[Coin]] = defaultdict(lambda: set())
-        
-        count = len(currencies.items())
-        
-        i = 0
-        
-        for coin_name, item in currencies.items():
-            if coin_name != "USDT":
-                trades_with_usdt = await self._is_trading_with_usdt(markets, coin_name)
-                if not trades_with_usdt: continue
-
-            self.logger.info(f"check {coin_name} is {i}/{count}")
-            i += 1
-            networkList = item['info']['chains']
-            for net in networkList:
-                chain = net['chain']
-                if chain == "ETH":
-                    continue     
-                if 'contractAddress' not in net or not net['contractAddress']: address = f'{coin_name}_{chain}'
-                else: address = net['contractAddress']
-            
-
-                try:
-                    await self.instance.fetch_deposit_address(coin_name, {'chain': chain, 'network': chain})
-                    fee = float(net['withdrawFee'])
-                    coin: Coin = Coin(_address = address, name=coin_name, chain=chain, fee=fee)
-                    coins[coin_name].add(coin)
-                    
-                except Exception as e:
-                    continue
-
-                    
-        return coins
+    @staticmethod
+    def _chains(coin_name: COIN_NAME, item: dict) -> Iterator[tuple[str, str, dict]]:
+        """(сеть, адрес контракта, описание сети) без сети ETH"""
+        for net in item['info']['chains']:
+            chain = net['chain']
+            if chain == "ETH":
+                continue
+            if 'contractAddress' not in net or not net['contractAddress']: address = f'{coin_name}_{chain}'
+            else: address = net['contractAddress']
+            yield chain, address, net
+    
+    def _discovery_requests(self, coin_name: COIN_NAME, item: dict) -> dict[Hashable, Request]:
+        # адрес депозита запрашивается по каждой сети: сеть без адреса не подходит для переводов
+        return {
+            chain: partial(self.instance.fetch_deposit_address, coin_name, {'chain': chain, 'network': chain})
+            for chain, _, _ in self._chains(coin_name, item)
+        }
+    
+    def _parse_coins(self, coin_name: COIN_NAME, item: dict, responses: dict[Hashable, Any]) -> Iterable[Coin]:
+        for chain, address, net in self._chains(coin_name, item):
+            if chain not in responses:
+                continue
+            try:
+                fee = float(net['withdrawFee'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            yield Coin(_address = address, name=coin_name, chain=chain, fee=fee)
     
-    
\ No newline at end of file
@@ -1,58 +1,32 @@
 import asyncio
-from typing import Any
+from typing import Any, Hashable, Iterable
 from core.models.dto import Coins
 from core.models import Coin
 from core.models.types import COIN_NAME, COIN_ID
+from core.protocols.PriceSubscriber import PriceBatch
 from infrastructure.CcxtExchange import CcxtExchange
 import ccxt.pro  as ccxtpro
-from collections import defaultdict
 
 class KucoinExchange(CcxtExchange):
     def __init__(self, name: str, instance: ccxtpro.Exchange):
         super().__init__(name, instance)
         self.prices_wallet: dict[COIN_ID, float] = dict()
     
-    async def get_current_coins(self) -> dict[COIN_NAME, set[Coin]]:
-        markets = await self.instance.fetch_markets()
-        currencies: dict | None= await self.instance.fetch_currencies()
-        if not currencies:
-            self.logger.warning(f"No currencies fetched from {self.name}.")
-            return {}
+    def _parse_coins(self, coin_name: COIN_NAME, item: dict, responses: dict[Hashable, Any]) -> Iterable[Coin]:
+        if (addresses := responses.get('addresses')) is None:
+            return
+        deposit_addresses = {net_data['info']['contractAddress'] for net_data in addresses.values()}
         
-        
-        
-        coins: defaultdict[COIN_NAME, set[Coin]] = defaultdict(lambda: set())
-        
-        for coin_name, item in currencies.items():
-            if coin_name != "USDT":
-                trades_with_usdt = await self._is_trading_with_usdt(markets, coin_name)
-                if not trades_with_usdt: continue
-
-            self.logger.info(f"check {coin_name}")
+        for net in item['info']['chains']:
+            chain = net['chainId']
+            if chain == "ERC20":
+                continue
+            if 'contractAddress' not in net or not net['contractAddress']: address = f'{coin_name}_{chain}'
+            else: address = net['contractAddress']
             
-            deposit_addresses_fetch_results = await self.instance.fetch_deposit_addresses_by_network(coin_name)
-            deposit_addresses = set()
-            
-            for net, net_data in deposit_addresses_fetch_results.items():                
-                deposit_addresses.add(net_data['info']['contractAddress'])
-                
-            networkList = item['info']['chains']
-            for net in networkList:
-                chain = net['chainId']
-                if chain == "ERC20":
-                    continue     
-                if 'contractAddress' not in net or not net['contractAddress']: address = f'{coin_name}_{chain}'
-                else: address = net['contractAddress']
-            
-                if (address in deposit_addresses):
-                    fee = float(net['withdrawalMinFee']) if net['withdrawalMinFee'] is not None else -1
-                    coin: Coin = Coin(_address = address, name=coin_name, chain=chain, fee=fee)
-                    coins[coin_name].add(coin)
-                    
-                else:
-                    continue
-                    
-        return coins
+            if address in deposit_addresses:
+                fee = float(net['withdrawalMinFee']) if net['withdrawalMinFee'] is not None else -1
+                yield Coin(_address = address, name=coin_name, chain=chain, fee=fee)
 
     async def watch_tickers(self, coin_names: list[COIN_NAME]) -> None:
         coin_names = coin_names[:390]
@@ -68,14 +42,19 @@ class KucoinExchange(CcxtExchange):
         # Ждем выполнения всех корутин
         await asyncio.gather(*coroutines, return_exceptions=True)
         
-    async def _price_notify(self, coin_id: int, value: float):
+    async def _price_notify(self, coin_id: int, ask: float, bid: float | None = None):
         for sub in self.price_subscribers:
             try:
-                self.prices_wallet[coin_id] = value
-                asyncio.create_task(sub.on_price_update(coin_id, value))
+                self.prices_wallet[coin_id] = ask
+                asyncio.create_task(sub.on_price_update(coin_id, ask, bid))
             except Exception as e:
                 self.logger.exception(f"Error notifying price subscriber: {e}")
 
+    async def _prices_notify(self, batch: PriceBatch):
+        for coin_id, ask, _ in batch:
+            self.prices_wallet[coin_id] = ask
+        await super()._prices_notify(batch)
+
 
     async def sell(self, coin_id: int, quantity: float | None = None, usdt_name: str = 'USDT'):
         if coin_id not in self.coins.inverse:
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Hashable, Mapping, TypeVar
+
+import ccxt
+
+K = TypeVar('K', bound=Hashable)
+Request = Callable[[], Awaitable[Any]]
+# (выполнено, всего)
+ProgressCallback = Callable[[int, int], None]
+
+
+class CoinDiscovery:
+    """
+    Параллельные запросы обнаружения монет одной биржи (адреса депозита по сетям и т.п.).
+
+    Одновременно выполняется не больше concurrency запросов, а их суммарный вес ограничен
+    бюджетом weight_per_second с запасом burst. Сетевые ошибки и превышение лимита повторяются
+    с экспоненциальной паузой, после RateLimitExceeded бюджет обнуляется для всех запросов.
+    Прочие ошибки биржи означают, что у монеты нет ответа: запрос не повторяется.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int = 8,
+        weight_per_second: float = 10.0,
+        burst: float | None = None,
+        retries: int = 3,
+        backoff: float = 1.0,
+        progress: ProgressCallback | None = None,
+        progress_step: float = 0.1,
+    ) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.weight_per_second = weight_per_second
+        self.burst = weight_per_second if burst is None else burst
+        self.retries = retries
+        self.backoff = backoff
+        self.progress = progress
+        self.progress_step = progress_step
+        self._tokens: float = self.burst
+        self._updated: float = time.monotonic()
+        self._bucket_lock = asyncio.Lock()
+        self._semaphore: asyncio.Semaphore | None = None
+        self.logger = logging.getLogger(f'CoinDiscovery.{name}')
+
+    async def _acquire(self, weight: float) -> None:
+        async with self._bucket_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.weight_per_second)
+                self._updated = now
+                if self._tokens >= weight:
+                    self._tokens -= weight
+                    return
+                await asyncio.sleep((weight - self._tokens) / self.weight_per_second)
+
+    async def _call(self, key: Hashable, request: Request, weight: float, semaphore: asyncio.Semaphore) -> tuple[bool, Any]:
+        """(успех, ответ); неуспех - ответа нет и после повторов"""
+        error: Exception | None = None
+        for attempt in range(self.retries + 1):
+            async with semaphore:
+                await self._acquire(weight)
+                try:
+                    return True, await request()
+                except ccxt.RateLimitExceeded as e:
+                    self._tokens = 0.0
+                    error = e
+                except ccxt.NetworkError as e:
+                    error = e
+                except Exception as e:
+                    self.logger.debug(f"{key}: {e}")
+                    return False, None
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        self.logger.warning(f"{key}: gave up after {self.retries + 1} attempts: {error}")
+        return False, None
+
+    async def run(self, requests: Mapping[K, Request], weight: float = 1.0) -> dict[K, Any]:
+        """
+        Args:
+            requests: ключ -> функция, создающая запрос
+            weight: вес одного запроса в бюджете
+        Returns:
+            ответы успешных запросов по ключам
+        """
+        total = len(requests)
+        if not total:
+            return {}
+        # семафор создается в цикле событий, где идет обнаружение, и общий для всех run биржи
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        semaphore = self._semaphore
+
+        results: dict[K, Any] = {}
+        done = 0
+        step = max(1, int(total * self.progress_step))
+        started = time.monotonic()
+
+        async def call(key: K, request: Request) -> None:
+            nonlocal done
+            ok, response = await self._call(key, request, weight, semaphore)
+            if ok:
+                results[key] = response
+            done += 1
+            if done % step == 0 or done == total:
+                self.logger.info(f"Discovery {done}/{total}, {len(results)} answered, {time.monotonic() - started:.1f}s")
+                if self.progress is not None:
+                    self.progress(done, total)
+
+        await asyncio.gather(*(call(key, request) for key, request in requests.items()))
+        return results
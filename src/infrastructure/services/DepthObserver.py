@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from typing import Callable, Iterable
+
+import ccxt
+from zope.interface import implementer
+
+from core.interfaces.IDepthObserver import IDepthObserver
+from core.models.types import COIN_NAME
+from core.protocols.DepthSubscriber import DepthSubscriber, Levels
+from infrastructure.CcxtExchangeModel import CcxtExchangModel
+from infrastructure.Connection import Connection
+
+
+@implementer(IDepthObserver)
+class DepthObserver():
+    """
+    Наблюдение за стаканами только для текущих монет-кандидатов.
+    Набор кандидатов берется из candidates() каждые refresh_seconds секунд.
+    """
+
+    def __init__(self, ex: CcxtExchangModel, candidates: Callable[[], Iterable[COIN_NAME]], levels: int = 20, refresh_seconds: float = 5.0):
+        self.__ex = ex
+        self._logger = logging.getLogger(f'DepthObserver.{self.__ex.name}')
+        self.depth_subscribers: set[DepthSubscriber] = set()
+        self._candidates = candidates
+        self._levels = levels
+        self._refresh_seconds = refresh_seconds
+        self._watchers: dict[COIN_NAME, asyncio.Task] = {}
+
+    @property
+    def _connection(self):
+        return self.__ex.connection
+
+    @property
+    def _working(self):
+        return self.__ex.working
+
+    @property
+    def _instance(self) -> Connection:
+        return self.__ex.instance
+
+    async def subscribe_depth(self, sub: DepthSubscriber):
+        self.depth_subscribers.add(sub)
+
+    async def unsubscribe_depth(self, sub: DepthSubscriber):
+        self.depth_subscribers.discard(sub)
+
+    async def _depth_notify(self, coin_name: COIN_NAME, asks: Levels, bids: Levels):
+        try:
+            notify_tasks = [sub.on_depth_update(coin_name, asks, bids) for sub in self.depth_subscribers]
+            if notify_tasks:
+                await asyncio.gather(*notify_tasks, return_exceptions=True)
+        except Exception as e:
+            self._logger.exception(f"Error notifying depth subscriber: {e}")
+
+    async def _watch_book(self, coin_name: COIN_NAME) -> None:
+        symbol = self.__ex.symbol(coin_name)
+        try:
+            async with self._connection as exchange:
+                while self._working:
+                    if not (await self._instance.wait_ready() and exchange is not None):
+                        break
+                    try:
+                        book = await exchange.watch_order_book(symbol, self._levels)
+                        await self._depth_notify(coin_name, book['asks'][:self._levels], book['bids'][:self._levels])
+                    except asyncio.CancelledError:
+                        raise
+                    except ccxt.BadSymbol as e:
+                        self._logger.error(f"Invalid symbol for depth observation: {e}")
+                        break
+                    except ccxt.NotSupported as e:
+                        self._logger.error(f"Order book observation is not supported: {e}")
+                        break
+                    except Exception as e:
+                        self._logger.error(f"Order book error for {symbol}: {e}")
+                        await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # пустой стакан - сигнал подписчикам забыть монету
+            await self._depth_notify(coin_name, [], [])
+
+    def _sync_watchers(self) -> None:
+        wanted = set(self._candidates())
+
+        for coin_name in list(self._watchers):
+            task = self._watchers[coin_name]
+            if coin_name not in wanted or task.done():
+                task.cancel()
+                del self._watchers[coin_name]
+
+        for coin_name in wanted - self._watchers.keys():
+            self._watchers[coin_name] = asyncio.create_task(self._watch_book(coin_name))
+
+    async def launch(self) -> None:
+        self._logger.info("Launch")
+        try:
+            while self._working:
+                self._sync_watchers()
+                await asyncio.sleep(self._refresh_seconds)
+        except asyncio.CancelledError:
+            self._logger.info("Depth observation cancelled")
+        finally:
+            for task in self._watchers.values():
+                task.cancel()
+            await asyncio.gather(*self._watchers.values(), return_exceptions=True)
+            self._watchers.clear()
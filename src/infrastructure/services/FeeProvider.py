@@ -0,0 +1,53 @@
+import logging
+
+import ccxt
+from zope.interface import implementer
+
+from core.interfaces.IFeeProvider import IFeeProvider
+from core.models.types import COIN_NAME, FEE
+from infrastructure.CcxtExchangeModel import CcxtExchangModel
+
+
+@implementer(IFeeProvider)
+class FeeProvider():
+    def __init__(self, ex: CcxtExchangModel):
+        self.__ex = ex
+        self._logger = logging.getLogger(f'FeeProvider.{self.__ex.name}')
+
+    @property
+    def _connection(self):
+        return self.__ex.connection
+
+    @property
+    def _usdt(self):
+        return self.__ex.usdt
+
+    async def get_taker_fees(self) -> dict[COIN_NAME, FEE]:
+        fees: dict[COIN_NAME, FEE] = {}
+
+        async with self._connection as exchange:
+            if exchange is None:
+                self._logger.warning("Connection access is missing")
+                return fees
+
+            symbols: dict[str, COIN_NAME] = {}
+            for symbol, market in (exchange.markets or {}).items():
+                if market.get('quote') != self._usdt or not market.get('spot', True):
+                    continue
+                symbols[symbol] = market['base']
+                if market.get('taker') is not None:
+                    fees[market['base']] = float(market['taker'])
+
+            # уровень аккаунта важнее публичных значений из markets
+            if exchange.has.get('fetchTradingFees'):
+                try:
+                    trading_fees = await exchange.fetch_trading_fees()
+                    for symbol, data in trading_fees.items():
+                        if symbol in symbols and data.get('taker') is not None:
+                            fees[symbols[symbol]] = float(data['taker'])
+                except ccxt.NotSupported as e:
+                    self._logger.info(f"Account fee tier is not supported: {e}")
+                except Exception as e:
+                    self._logger.warning(f"Could not fetch account fee tier, using market fees: {e}")
+
+        return fees
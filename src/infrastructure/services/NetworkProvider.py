@@ -0,0 +1,96 @@
+import logging
+from typing import Any, Callable, Iterator
+
+from zope.interface import implementer
+
+from core.interfaces.INetworkProvider import INetworkProvider, NetworkStatus
+from core.models.types import CHAIN, COIN_NAME, FEE
+from infrastructure.CcxtExchangeModel import CcxtExchangModel
+
+# разбор одной валюты fetch_currencies: (сеть, комиссия, депозит, вывод)
+NetworkParser = Callable[[dict[str, Any]], Iterator[tuple[CHAIN, Any, Any, Any]]]
+
+
+def _flag(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.lower() in ('true', 'allowed', '1')
+    return bool(value)
+
+
+def _fee(value: Any) -> FEE:
+    try:
+        return float(value) if value is not None else -1.0
+    except (TypeError, ValueError):
+        return -1.0
+
+
+def _unified(currency: dict[str, Any]) -> Iterator[tuple[CHAIN, Any, Any, Any]]:
+    for network in (currency.get('networks') or {}).values():
+        active = network.get('active') is not False
+        yield network.get('id'), network.get('fee'), active and network.get('deposit'), active and network.get('withdraw')
+
+
+def _okx(currency: dict[str, Any]) -> Iterator[tuple[CHAIN, Any, Any, Any]]:
+    for net in currency.get('info') or []:
+        yield net['chain'][5:], net.get('fee'), net.get('canDep'), net.get('canWd')
+
+
+def _bitget(currency: dict[str, Any]) -> Iterator[tuple[CHAIN, Any, Any, Any]]:
+    for net in (currency.get('info') or {}).get('chains') or []:
+        yield net['chain'], net.get('withdrawFee'), net.get('rechargeable'), net.get('withdrawable')
+
+
+def _htx(currency: dict[str, Any]) -> Iterator[tuple[CHAIN, Any, Any, Any]]:
+    for net in (currency.get('info') or {}).get('chains') or []:
+        fee = net.get('transactFeeWithdraw', net.get('withdrawFee'))
+        yield net['chain'], fee, net.get('depositStatus'), net.get('withdrawStatus')
+
+
+def _kucoin(currency: dict[str, Any]) -> Iterator[tuple[CHAIN, Any, Any, Any]]:
+    for net in (currency.get('info') or {}).get('chains') or []:
+        yield net['chainId'], net.get('withdrawalMinFee'), net.get('isDepositEnabled'), net.get('isWithdrawEnabled')
+
+
+# имена сетей должны совпадать с теми, что биржа отдает в get_current_coins
+_PARSERS: dict[str, NetworkParser] = {
+    'okx': _okx,
+    'bitget': _bitget,
+    'htx': _htx,
+    'kucoin': _kucoin,
+}
+
+
+@implementer(INetworkProvider)
+class NetworkProvider():
+    def __init__(self, ex: CcxtExchangModel):
+        self.__ex = ex
+        self._logger = logging.getLogger(f'NetworkProvider.{self.__ex.name}')
+        self._parse: NetworkParser = _PARSERS.get(self.__ex.name, _unified)
+
+    @property
+    def _connection(self):
+        return self.__ex.connection
+
+    async def get_network_status(self) -> dict[COIN_NAME, dict[CHAIN, NetworkStatus]]:
+        status: dict[COIN_NAME, dict[CHAIN, NetworkStatus]] = {}
+
+        async with self._connection as exchange:
+            if exchange is None:
+                self._logger.warning("Connection access is missing")
+                return status
+
+            # один запрос на все валюты вместо адресов депозита по каждой монете
+            currencies: dict[str, Any] = await exchange.fetch_currencies() or {}
+            for coin_name, currency in currencies.items():
+                networks: dict[CHAIN, NetworkStatus] = {}
+                try:
+                    for chain, fee, deposit, withdraw in self._parse(currency):
+                        if chain:
+                            networks[chain] = (_fee(fee), _flag(deposit), _flag(withdraw))
+                except (KeyError, TypeError, AttributeError) as e:
+                    self._logger.debug(f"Unexpected currency format for {coin_name}: {e}")
+                    continue
+                if networks:
+                    status[coin_name] = networks
+
+        return status
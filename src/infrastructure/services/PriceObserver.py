@@ -6,8 +6,8 @@ from zope.interface import implementer
 
 
 from core.interfaces.IPriceObserver import IPriceObserver
-from core.models.types import COIN_NAME
-from core.protocols.PriceSubscriber import PriceSubscriber
+from core.models.types import COIN_NAME, PRICE
+from core.protocols.PriceSubscriber import BatchPriceSubscriber, PriceBatch, PriceSubscriber
 from infrastructure.CcxtExchangeModel import CcxtExchangModel
 from infrastructure.Connection import Connection
 
@@ -17,6 +17,7 @@ class PriceObserver():
         self.__ex = ex
         self._logger = logging.getLogger(f'PriceObserver.{self.__ex.name}')
         self.price_subscribers: set[PriceSubscriber] = set()
+        self._batch_subscribers: set[BatchPriceSubscriber] = set()
 
     @property
     def _wallet(self):
@@ -38,11 +39,32 @@ class PriceObserver():
     def _instance(self) -> Connection:
         return self.__ex.instance
     
-    async def _price_notify(self, coin_name: str, value: float):
+    async def _price_notify(self, coin_name: str, ask: PRICE, bid: PRICE):
         try:
             notify_tasks = []
             for sub in self.price_subscribers:
-                notify_tasks.append(sub.on_price_update(coin_name, value))
+                notify_tasks.append(sub.on_price_update(coin_name, ask, bid))
+            if notify_tasks:
+                await asyncio.gather(*notify_tasks, return_exceptions=True)
+        except Exception as e:
+            self._logger.exception(f"Error notifying price subscriber: {e}")
+    
+    @staticmethod
+    async def _per_coin_notify(sub: PriceSubscriber, batch: PriceBatch):
+        """Адаптер для подписчиков без on_prices_update"""
+        for coin_name, ask, bid in batch:
+            await sub.on_price_update(coin_name, ask, bid)
+    
+    async def _prices_notify(self, batch: PriceBatch):
+        if not batch:
+            return
+        try:
+            notify_tasks = []
+            for sub in self.price_subscribers:
+                if sub in self._batch_subscribers:
+                    notify_tasks.append(sub.on_prices_update(batch)) # type: ignore
+                else:
+                    notify_tasks.append(self._per_coin_notify(sub, batch))
             if notify_tasks:
                 await asyncio.gather(*notify_tasks, return_exceptions=True)
         except Exception as e:
@@ -50,6 +72,25 @@ class PriceObserver():
 
     def _get_symbols(self, coin_names: list[COIN_NAME]) -> list[str]:
         return [f"{coin_name}/USDT" for coin_name in coin_names]
+    
+    @staticmethod
+    def _last_price(ticker: dict) -> float:
+        if ticker.get('last') is not None:
+            return float(ticker['last'])
+        if (info := ticker.get('info')) and info.get('lastPrice') is not None:
+            return float(info['lastPrice'])
+        return 0.0
+    
+    @classmethod
+    def _get_quote(cls, ticker: dict) -> tuple[PRICE, PRICE]:
+        """Лучшие ask и bid тикера, при отсутствии стороны стакана - последняя цена"""
+        ask = ticker.get('ask')
+        bid = ticker.get('bid')
+        if ask is None or bid is None:
+            last = cls._last_price(ticker)
+            ask = last if ask is None else ask
+            bid = last if bid is None else bid
+        return float(ask), float(bid)
 
     async def _start_price_observation(self, coin_names: list[COIN_NAME]) -> None:
         self._logger.info("Start price observe")
@@ -61,21 +102,17 @@ class PriceObserver():
                     if await self._instance.wait_ready() and exchange is not None:
                         try:
                             tickers = await exchange.watch_tickers(symbols)
+                            batch: PriceBatch = []
                             for symbol, ticker in tickers.items():
                                 coin_name = symbol.split('/')[0]
-                                price = 0
+                                ask, bid = self._get_quote(ticker)
 
-                                if ticker['ask'] is not None:
-                                    price = ticker['ask']
-                                elif ticker['lastPrice'] is not None:
-                                    price = ticker['lastPrice']
-                                elif ticker['info']['lastPrice'] is not None:
-                                    price = ticker['info']['lastPrice']
-
-                                if price == 0:
+                                if ask == 0 or bid == 0:
                                     self._logger.warning(f"There is not fee data for Coin {coin_name}")
 
-                                await self._price_notify(coin_name, price)
+                                batch.append((coin_name, ask, bid))
+
+                            await self._prices_notify(batch)
 
                         except asyncio.CancelledError:
                             self._logger.info("Price observation cancelled")
@@ -117,17 +154,19 @@ class PriceObserver():
 
     async def subscribe_price(self, sub: PriceSubscriber):
         self.price_subscribers.add(sub)
+        if isinstance(sub, BatchPriceSubscriber):
+            self._batch_subscribers.add(sub)
 
     async def unsubscribe_price(self, sub: PriceSubscriber):
         self.price_subscribers.discard(sub)
+        self._batch_subscribers.discard(sub) # type: ignore
 
-    async def launch(self) -> None:
+    async def launch(self, coin_names: list[COIN_NAME] | None = None) -> None:
+        """coin_names - монеты для наблюдения, по умолчанию - монеты кошелька"""
         self._logger.info("Launch")
         if not self._working: return
-        coin_names: list[COIN_NAME] = []
-
-        for coin_name in self._wallet.keys():
-            coin_names.append(coin_name)
+        if coin_names is None:
+            coin_names = list(self._wallet.keys())
         
         self.__price_task = asyncio.create_task(self._start_price_observation(coin_names))
 
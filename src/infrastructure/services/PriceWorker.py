@@ -0,0 +1,152 @@
+import asyncio
+from dataclasses import dataclass
+import logging
+import multiprocessing
+from typing import Any
+
+from zope.interface import implementer
+
+from core.interfaces.IPriceObserver import IPriceObserver
+from core.models.types import COIN_NAME, EXCHANGE_NAME, PRICE
+from core.protocols.PriceSubscriber import BatchPriceSubscriber, PriceBatch, PriceSubscriber
+from infrastructure.services.SharedPriceTable import SharedPriceTable
+
+
+@dataclass
+class _TableWriter(BatchPriceSubscriber):
+    """Подписчик воркера: котировки биржи в слоты разделяемой таблицы"""
+    ex_name: EXCHANGE_NAME
+    table: SharedPriceTable
+    slots: dict[COIN_NAME, int]
+
+    def __hash__(self) -> int:
+        return hash("shared" + self.ex_name)
+
+    async def on_price_update(self, coin_name: COIN_NAME, ask: PRICE, bid: PRICE | None = None) -> None:
+        if (slot := self.slots.get(coin_name)) is not None:
+            self.table.write(slot, ask, ask if bid is None else bid)
+
+    async def on_prices_update(self, batch: PriceBatch) -> None:
+        for coin_name, ask, bid in batch:
+            if (slot := self.slots.get(coin_name)) is not None:
+                self.table.write(slot, ask, bid)
+
+
+async def publish_prices(ex_name: EXCHANGE_NAME, observer: Any, table: SharedPriceTable, coin_names: list[COIN_NAME]) -> None:
+    """Подписывает таблицу на наблюдатель и запускает наблюдение именно за coin_names: кошелек в процессе воркера пуст"""
+    slots = {coin_name: slot for slot, coin_name in enumerate(coin_names)}
+    await observer.subscribe_price(_TableWriter(ex_name, table, slots))
+    await observer.launch(coin_names)
+
+
+def run_price_worker(ex_name: EXCHANGE_NAME, params: Any, coin_names: list[COIN_NAME], table_name: str) -> None:
+    """Точка входа процесса: websocket и разбор тикеров ccxt, запись котировок в разделяемую память"""
+    from infrastructure.CcxtExchangeModel import CcxtExchangModel
+    from infrastructure.Connection import Connection
+    from infrastructure.services.PriceObserver import PriceObserver
+
+    logger = logging.getLogger(f'PriceWorker.{ex_name}')
+    table = SharedPriceTable.attach(table_name)
+
+    async def main() -> None:
+        conn = Connection(ex_name, params)
+        observer = PriceObserver(CcxtExchangModel(ex_name, conn))
+        await asyncio.gather(conn.connection(), publish_prices(ex_name, observer, table, coin_names))
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        logger.exception(f"Price worker stopped: {e}")
+    finally:
+        table.close()
+
+
+@implementer(IPriceObserver)
+class SharedPriceObserver:
+    """
+    Наблюдатель цен главного процесса: запускает воркер биржи и читает его таблицу.
+    Изменения за один опрос уходят подписчикам одним кадром через on_prices_update.
+    """
+
+    def __init__(self, ex_name: EXCHANGE_NAME, params: Any, coin_names: list[COIN_NAME], poll_interval: float = 0.005) -> None:
+        self.ex_name = ex_name
+        self._params = params
+        self._coin_names = list(coin_names)
+        self.poll_interval = poll_interval
+        self._logger = logging.getLogger(f'SharedPriceObserver.{ex_name}')
+        self.price_subscribers: set[PriceSubscriber] = set()
+        self._batch_subscribers: set[BatchPriceSubscriber] = set()
+        self._table: SharedPriceTable | None = None
+        self._process: multiprocessing.Process | None = None
+        self._cursor: int = 0
+
+    async def subscribe_price(self, sub: PriceSubscriber):
+        self.price_subscribers.add(sub)
+        if isinstance(sub, BatchPriceSubscriber):
+            self._batch_subscribers.add(sub)
+
+    async def unsubscribe_price(self, sub: PriceSubscriber):
+        self.price_subscribers.discard(sub)
+        self._batch_subscribers.discard(sub) # type: ignore
+
+    def start(self) -> None:
+        self._table = SharedPriceTable.create(f"prices_{self.ex_name}_{id(self):x}", len(self._coin_names))
+        context = multiprocessing.get_context('spawn')
+        self._process = context.Process(
+            target=run_price_worker,
+            args=(self.ex_name, self._params, self._coin_names, self._table.name),
+            name=f"prices-{self.ex_name}",
+            daemon=True,
+        )
+        self._process.start()
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(timeout=5)
+            self._process = None
+        if self._table is not None:
+            self._table.close()
+            self._table = None
+
+    def poll(self) -> PriceBatch:
+        """Котировки, записанные воркером с прошлого опроса"""
+        table = self._table
+        if table is None:
+            return []
+
+        self._cursor, slots = table.changes(self._cursor)
+        if slots is None:
+            self._logger.warning("Reader fell behind the worker, rescanning the table")
+            slots = range(table.slots) # type: ignore
+
+        batch: PriceBatch = []
+        for slot in slots:
+            if (quote := table.read(slot)) is not None:
+                batch.append((self._coin_names[slot], quote[0], quote[1]))
+        return batch
+
+    async def _prices_notify(self, batch: PriceBatch) -> None:
+        notify_tasks = []
+        for sub in self.price_subscribers:
+            if sub in self._batch_subscribers:
+                notify_tasks.append(sub.on_prices_update(batch)) # type: ignore
+            else:
+                notify_tasks.extend(sub.on_price_update(coin_name, ask, bid) for coin_name, ask, bid in batch)
+        if notify_tasks:
+            await asyncio.gather(*notify_tasks, return_exceptions=True)
+
+    async def launch(self) -> None:
+        self._logger.info("Launch")
+        self.start()
+        try:
+            while True:
+                if batch := self.poll():
+                    await self._prices_notify(batch)
+                await asyncio.sleep(self.poll_interval)
+        except asyncio.CancelledError:
+            self._logger.info("Shared price observation cancelled")
+        finally:
+            self.stop()
@@ -0,0 +1,102 @@
+from multiprocessing import shared_memory
+import struct
+import time
+
+from core.models.types import PRICE
+
+# заголовок: курсор записи в кольце, число ячеек, размер кольца
+_HEADER = struct.Struct('<QQQ')
+# ячейка: seqlock, ask, bid, время записи
+_CELL = struct.Struct('<Qddd')
+_SLOT = struct.Struct('<I')
+_SEQ = struct.Struct('<Q')
+
+
+class SharedPriceTable:
+    """
+    Таблица цен одной биржи в разделяемой памяти: пишет один процесс-воркер, читает главный процесс.
+
+    Каждая ячейка защищена seqlock: нечетный счетчик - запись идет, читатель повторяет попытку.
+    Номера измененных ячеек пишутся в кольцо, поэтому читатель обходит только изменения;
+    если воркер обогнал читателя на целое кольцо, читатель сканирует таблицу целиком.
+    """
+
+    MAX_RETRIES = 1000
+
+    def __init__(self, memory: shared_memory.SharedMemory, owner: bool) -> None:
+        self._memory = memory
+        self._owner = owner
+        self._buf = memory.buf
+        _, self.slots, self.ring_size = _HEADER.unpack_from(self._buf, 0)
+        self._ring = _HEADER.size
+        self._cells = self._ring + self.ring_size * _SLOT.size
+
+    @classmethod
+    def create(cls, name: str, slots: int, ring_size: int = 4096) -> 'SharedPriceTable':
+        size = _HEADER.size + ring_size * _SLOT.size + slots * _CELL.size
+        memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        memory.buf[:size] = bytes(size)
+        _HEADER.pack_into(memory.buf, 0, 0, slots, ring_size)
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> 'SharedPriceTable':
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    @property
+    def cursor(self) -> int:
+        return _SEQ.unpack_from(self._buf, 0)[0]
+
+    def write(self, slot: int, ask: PRICE, bid: PRICE, received: float | None = None) -> None:
+        """Запись одной котировки; вызывается только процессом-писателем"""
+        offset = self._cells + slot * _CELL.size
+        seq = _SEQ.unpack_from(self._buf, offset)[0]
+        _SEQ.pack_into(self._buf, offset, seq + 1)
+        _CELL.pack_into(self._buf, offset, seq + 1, ask, bid, time.time() if received is None else received)
+        _SEQ.pack_into(self._buf, offset, seq + 2)
+
+        cursor = self.cursor
+        _SLOT.pack_into(self._buf, self._ring + (cursor % self.ring_size) * _SLOT.size, slot)
+        _SEQ.pack_into(self._buf, 0, cursor + 1)
+
+    def read(self, slot: int) -> tuple[PRICE, PRICE, float] | None:
+        """Согласованная котировка ячейки или None, если в нее еще не писали"""
+        offset = self._cells + slot * _CELL.size
+        for _ in range(self.MAX_RETRIES):
+            seq, ask, bid, received = _CELL.unpack_from(self._buf, offset)
+            if seq & 1:
+                continue
+            if _SEQ.unpack_from(self._buf, offset)[0] == seq:
+                return None if seq == 0 else (ask, bid, received)
+        # писатель завис посреди записи - ячейку считаем пустой
+        return None
+
+    def changes(self, since: int) -> tuple[int, set[int] | None]:
+        """
+        Ячейки, измененные после курсора since.
+
+        Returns:
+            (новый курсор, номера ячеек) или (новый курсор, None) - нужен полный обход
+        """
+        cursor = self.cursor
+        if cursor - since > self.ring_size:
+            return cursor, None
+
+        slots = {
+            _SLOT.unpack_from(self._buf, self._ring + (position % self.ring_size) * _SLOT.size)[0]
+            for position in range(since, cursor)
+        }
+        # пока читали кольцо, воркер мог перезаписать прочитанные позиции
+        if self.cursor - since > self.ring_size:
+            return self.cursor, None
+        return cursor, slots
+
+    def close(self) -> None:
+        self._buf = None # type: ignore
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
@@ -0,0 +1,48 @@
+from core.models.Deal import Deal
+from core.models.ExchangeBase import ExchangeBase
+from core.services.Analytics.Allocator import CapitalAllocator
+
+
+ex1, ex2, ex3 = ExchangeBase("ex1"), ExchangeBase("ex2"), ExchangeBase("ex3")
+
+
+class Depth:
+    """Стакан, в котором прибыль перестает расти после capacity USDT"""
+
+    def __init__(self, capacities: dict[int, float]) -> None:
+        self.capacities = capacities
+
+    def get_book(self, coin_id, exchange):
+        return coin_id
+
+    def realizable_profit(self, coin_id, buy_exchange, sell_exchange, notional):
+        capacity = self.capacities[coin_id]
+        return 0.01 * min(notional, capacity) - 0.02 * max(notional - capacity, 0.0)
+
+
+def test_capital_is_split_by_capacity():
+    deals = [
+        Deal(coin_id=1, departure=ex1, destination=ex3, benefit=0.02, roi=0.01),
+        Deal(coin_id=2, departure=ex1, destination=ex3, benefit=0.01, roi=0.01),
+    ]
+    allocator = CapitalAllocator(Depth({1: 300.0, 2: 1000.0}), step=100.0)  # type: ignore
+    allocations = allocator.allocate({ex1: 1000.0}, deals)
+
+    notionals = {allocation.deal.coin_id: allocation.notional for allocation in allocations}
+    assert notionals == {1: 300.0, 2: 700.0}
+
+
+def test_transfer_and_fixed_costs():
+    deal = Deal(coin_id=1, departure=ex1, destination=ex3, benefit=0.05, roi=0.05)
+    allocator = CapitalAllocator(step=100.0)
+
+    # без перевода USDT капитал другой биржи не используется
+    assert [a.exchange for a in allocator.allocate({ex1: 100.0, ex2: 500.0}, [deal])] == [ex1]
+
+    allocations = allocator.allocate({ex1: 100.0, ex2: 500.0}, [deal], lambda deal: 1.0, lambda source, departure: (2.0, 1800.0))
+    assert {a.exchange: a.notional for a in allocations} == {ex1: 100.0, ex2: 500.0}
+    # каждая доля - отдельный перевод монеты, перевод USDT только у ex2
+    assert abs(sum(a.profit for a in allocations) - (600.0 * 0.05 - 2 * 1.0 - 2.0)) < 1e-9
+
+    # постоянные расходы больше прибыли - сделка не берется
+    assert allocator.allocate({ex1: 10.0}, [deal], lambda deal: 5.0) == []
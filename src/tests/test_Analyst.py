@@ -1,5 +1,8 @@
 import pytest
 import asyncio
+import random
+from functools import partial
+from types import SimpleNamespace
 from core.services.Analytics.Analyst import Analyst
 
 class DummyAnalyst(Analyst):
@@ -51,4 +54,203 @@ async def test_get_best_deal_returns_highest_benefit_deal():
     assert deal.coin == "BTC"
     assert deal.departure == "ex1"
     assert deal.destination == "ex2"
-    assert deal.benefit == 0.5
\ No newline at end of file
+    assert deal.benefit == 0.5
+
+from core.models.ExchangeBase import ExchangeBase
+from core.services.Analytics.FeeTable import FeeTable
+from core.services.Analytics.TransferTimes import TransferTimes
+
+
+class FakeMapper:
+    analyzed_coins = {1, 2, 3}
+
+    def subscribe_routes(self, listener) -> None:
+        self.routes_listener = listener
+
+    def get_best_coin_transfer(self, departure_name, destination_name, coin_id):
+        return None
+
+    def get_coin_id_by_name(self, ex_name, coin_name):
+        return {"X": 1, "Y": 2, "Z": 3}.get(coin_name)
+
+
+class FeedExchange(ExchangeBase):
+    async def subscribe_price(self, sub) -> None:
+        self.sub = sub
+
+    async def feed(self, *quotes) -> None:
+        await self.sub.on_prices_update([(coin_id, price, price) for coin_id, price in quotes])
+        await asyncio.sleep(0)
+
+    async def feed_quote(self, coin_id, ask, bid) -> None:
+        await self.sub.on_prices_update([(coin_id, ask, bid)])
+        await asyncio.sleep(0)
+
+
+async def started_analyst(**kwargs):
+    analyst = Analyst(FakeMapper(), **kwargs)
+    a, b = FeedExchange("a"), FeedExchange("b")
+    await analyst.start({a, b})
+    await a.feed((1, 100.0), (2, 10.0), (3, 1.0))
+    return analyst, a, b
+
+
+def test_opportunities_are_edge_triggered():
+    async def run() -> list[int]:
+        analyst, _, b = await started_analyst(threshold=0.01)
+        stream = analyst.opportunities()
+        got: list[int] = []
+        consumer = asyncio.create_task(anext(stream))
+
+        await b.feed((1, 105.0))
+        got.append((await consumer).coin_id)
+        # выгода выросла, но монета не опускалась ниже порога - повтора нет
+        await b.feed((1, 106.0))
+        await b.feed((1, 100.0))
+        await b.feed((1, 107.0))
+        got.append((await anext(stream)).coin_id)
+        assert len(analyst._streams) == 1
+
+        # закрытый поток снимает свой буфер с Analyst
+        await stream.aclose()
+        assert not analyst._streams
+        await analyst.stop()
+        return got
+
+    assert asyncio.run(run()) == [1, 1]
+
+
+def test_slow_consumer_loses_oldest_events():
+    async def run() -> list[int]:
+        analyst, _, b = await started_analyst(threshold=0.01)
+        stream = analyst.opportunities(buffer=2)
+        consumer = asyncio.create_task(anext(stream))
+        await asyncio.sleep(0)
+
+        # первое событие забирает ожидающий потребитель, из трех следующих в буфере остаются два последних
+        await b.feed((1, 105.0))
+        first = (await consumer).coin_id
+        for coin_id, price in ((2, 10.5), (3, 1.05), (1, 100.0), (1, 110.0)):
+            await b.feed((coin_id, price))
+        got = [first, (await anext(stream)).coin_id, (await anext(stream)).coin_id]
+        assert analyst._streams and next(iter(analyst._streams)).queue.empty()
+
+        await stream.aclose()
+        await analyst.stop()
+        return got
+
+    assert asyncio.run(run()) == [1, 3, 1]
+
+
+@pytest.mark.parametrize("use_matrix", [False, True])
+def test_routes_update_adds_new_coins(use_matrix):
+    async def run() -> None:
+        analyst, a, b = await started_analyst(use_matrix=use_matrix)
+        analyst.mapper.analyzed_coins = {1, 2, 3, 4}
+        await a.feed((4, 10.0))
+        await b.feed((4, 11.0))
+        # до уведомления Mapper монета не отслеживается и ее цены отбрасываются
+        assert 4 not in analyst.coin_list
+
+        analyst.mapper.routes_listener({4})
+        await a.feed((4, 10.0))
+        await b.feed((4, 11.0))
+        assert (4, a, b) in analyst.top_candidates(4)
+        await analyst.stop()
+
+    asyncio.run(run())
+
+
+class FeeSource:
+    def __init__(self, fees) -> None:
+        self.fees = fees
+
+    async def get_taker_fees(self):
+        return self.fees
+
+
+@pytest.mark.parametrize("use_matrix", [False, True])
+def test_exchange_fees_change_best_pair(use_matrix):
+    async def run() -> list[tuple]:
+        mapper = FakeMapper()
+        analyst = Analyst(mapper, use_matrix=use_matrix, fees=FeeTable(mapper, default_fee=0.0))
+        a, b, c = FeedExchange("a"), FeedExchange("b"), FeedExchange("c")
+        # на b монета дороже всего, но с комиссией 2% продажа там хуже, чем на c
+        providers = {a: FeeSource({}), b: FeeSource({"X": 0.02}), c: FeeSource({"X": 0.001})}
+        await analyst.start({a, b, c}, fee_providers=providers)
+        await a.feed((1, 100.0))
+        await b.feed((1, 102.0))
+        await c.feed((1, 101.0))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        best = analyst.top_candidates(1)
+        await analyst.stop()
+        return [(coin_id, departure.name, destination.name) for coin_id, departure, destination in best]
+
+    assert asyncio.run(run()) == [(1, "a", "c")]
+
+
+def test_conflation_rescores_burst_once_with_last_price():
+    async def run(conflation: float) -> tuple[dict[int, int], tuple]:
+        analyst, _, b = await started_analyst(conflation=conflation)
+        await asyncio.sleep(conflation * 2)
+        counts: dict[int, int] = {}
+        rescore = analyst._rescore
+
+        def counting(coin_id: int) -> None:
+            counts[coin_id] = counts.get(coin_id, 0) + 1
+            rescore(coin_id)
+
+        analyst._rescore = counting
+        for price in (101.0, 103.0, 105.0, 104.0):
+            await b.feed((1, price), (2, price / 10))
+        await asyncio.sleep(conflation * 2)
+        best = analyst.sorted_coin[1]
+        await analyst.stop()
+        return counts, (best[0].name, best[1].name, best[3])
+
+    counts, best = asyncio.run(run(0.05))
+    # четыре обновления за окно - один пересчет на монету
+    assert counts == {1: 1, 2: 1}
+    # итог совпадает с пересчетом каждого обновления: побеждает последняя цена
+    _, eager = asyncio.run(run(0.0))
+    assert best == eager
+    assert best[:2] == ("a", "b")
+
+
+class ChainMapper(FakeMapper):
+    """Переводы между парами бирж идут по разным сетям, поэтому выгода пар взвешена по-разному"""
+    chains = ("TRC20", "BEP20", "SOL", "BTC")
+
+    def get_best_coin_transfer(self, departure_name, destination_name, coin_id):
+        chain = self.chains[(ord(departure_name) * 7 + ord(destination_name) * 3 + coin_id) % len(self.chains)]
+        return SimpleNamespace(chain=chain, fee=0.0, has_known_fee=True)
+
+
+def test_partial_rescore_matches_full_rescore_with_route_rates():
+    async def run() -> int:
+        times = TransferTimes(seed={"TRC20": 120.0, "BEP20": 600.0, "SOL": 60.0, "BTC": 3600.0})
+        mapper = ChainMapper()
+        analyst = Analyst(mapper, transfer_times=times, fees=FeeTable(mapper, default_fee=0.0))
+        exchanges = [FeedExchange(name) for name in "abcdef"]
+        await analyst.start(set(exchanges))
+        rng = random.Random(7)
+        mismatches = 0
+        for _ in range(3000):
+            exchange = rng.choice(exchanges)
+            coin_id = rng.choice((1, 2))
+            if rng.random() < 0.05:
+                await exchange.feed((coin_id, 0.0))
+            else:
+                ask = rng.uniform(99.0, 101.0)
+                await exchange.feed_quote(coin_id, ask, ask * rng.uniform(0.995, 1.0))
+            full = analyst.coin_list[coin_id].best_by_departure(partial(analyst._pair_rate, coin_id), analyst._rate_bounds)
+            stored = [index[coin_id] for index in analyst._by_departure.values() if coin_id in index]
+            if sorted(stored, key=lambda pair: pair[0].name) != sorted(full, key=lambda pair: pair[0].name):
+                mismatches += 1
+            elif full and analyst.sorted_coin[coin_id] != max(full, key=lambda pair: pair[2]):
+                mismatches += 1
+        await analyst.stop()
+        return mismatches
+
+    assert asyncio.run(run()) == 0
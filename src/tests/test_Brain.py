@@ -0,0 +1,123 @@
+import asyncio
+from types import SimpleNamespace
+
+from core.models.Deal import Deal
+from core.models.ExchangeBase import ExchangeBase
+from core.models.dto import Trade, Transfer, Wait
+from core.models.dto.Asset import Asset
+from core.services.Analytics.Brain import Brain
+
+USDT = 0
+
+
+class FakeMapper:
+    usdt = USDT
+    analyzed_coins = {1, 2, 3}
+
+    def __init__(self) -> None:
+        self.fee_calls = 0
+
+    def subscribe_routes(self, listener) -> None:
+        self.routes_listener = listener
+
+    def is_analyzed(self, coin_id: int) -> bool:
+        return coin_id in self.analyzed_coins
+
+    def get_fee(self, deal: Deal) -> float:
+        self.fee_calls += 1
+        return 0.1
+
+    def get_best_coin_transfer(self, departure_name: str, destination_name: str, coin_id: int):
+        return SimpleNamespace(fee=1.0, has_known_fee=True, chain="TRC20")
+
+
+class FakeAnalyst:
+    def __init__(self, departure: ExchangeBase, destination: ExchangeBase) -> None:
+        self.departure = departure
+        self.destination = destination
+        self.version = 1
+        self.roi = 0.1
+
+    def _deal(self, coin_id: int, departure: ExchangeBase) -> Deal:
+        return Deal(coin_id=coin_id, departure=departure, destination=self.destination, benefit=0.1, roi=self.roi)
+
+    async def get_top_deals(self, k: int, departure=None, exclude=()) -> list[Deal]:
+        return [self._deal(coin_id, self.departure) for coin_id in (1, 2, 3) if coin_id not in exclude][:k]
+
+    async def get_all_benefits(self, exchange: ExchangeBase, coin_id: int) -> Deal:
+        return self._deal(coin_id, exchange)
+
+    def deal_version(self, coin_id=None) -> int:
+        return self.version
+
+
+def make_brain() -> tuple[Brain, ExchangeBase, ExchangeBase, ExchangeBase]:
+    a, b, c = ExchangeBase("a"), ExchangeBase("b"), ExchangeBase("c")
+    return Brain(FakeAnalyst(b, c), FakeMapper()), a, b, c
+
+
+def test_cache_hit_releases_bought_coin():
+    brain, a, _, _ = make_brain()
+
+    async def run() -> None:
+        first = await brain.analyse(a, Asset(2, 50.0))
+        assert isinstance(first, Transfer)
+        # покупка резервирует монету 1
+        assert await brain.analyse(a, Asset(USDT, 100.0)) == Trade(buy_coin=1, sell_coin=USDT)
+        assert brain._in_work == {1}
+
+        # та же корзина суммы и версия сделок - ответ из кеша, но резерв снимается
+        brain._in_work.add(2)
+        assert await brain.analyse(a, Asset(2, 50.5)) is first
+        assert 2 not in brain._in_work
+
+        # маршруты монеты изменились
+        brain.mapper.routes_listener({2})
+        assert await brain.analyse(a, Asset(2, 50.5)) is not first
+
+    asyncio.run(run())
+
+
+def test_cache_drops_deal_that_fell_below_fee():
+    brain, a, _, _ = make_brain()
+
+    async def run() -> None:
+        first = await brain.analyse(a, Asset(2, 50.0))
+        assert isinstance(first, Transfer)
+
+        # выгода внутри маршрута изменилась, но осталась выше порога - ответ из кеша
+        brain.analyst.roi = 0.05
+        assert await brain.analyse(a, Asset(2, 50.0)) is first
+
+        # маршрут тот же и версия сделок не изменилась, но перевод больше не окупает комиссию
+        brain.analyst.roi = -0.99
+        assert await brain.analyse(a, Asset(2, 50.0)) == Trade(buy_coin=USDT, sell_coin=2)
+
+        brain.analyst.roi = 0.1
+        assert isinstance(await brain.analyse(a, Asset(2, 50.0)), Transfer)
+
+    asyncio.run(run())
+
+
+def test_portfolio_assigns_usdt_largest_first():
+    brain, a, b, c = make_brain()
+    portfolio = {
+        a: [Asset(USDT, 100.0), Asset(2, 50.0), Asset(9, 5.0)],
+        b: [Asset(USDT, 200.0)],
+        c: [Asset(USDT, 300.0)],
+    }
+    result = asyncio.run(brain.analyse_portfolio(portfolio))
+
+    # крупный остаток первым берет лучшую сделку, монета не покупается дважды
+    assert result[c][USDT] == Trade(buy_coin=1, sell_coin=USDT)
+    # USDT на бирже покупки переводится туда, где монету продают
+    assert result[b][USDT] == Transfer(coin=USDT, departure=b, destination=c)
+    assert result[a][USDT] == Trade(buy_coin=3, sell_coin=USDT)
+    assert result[a][2] == Transfer(coin=2, departure=a, destination=c)
+    # монета не из списка Mapper продается
+    assert result[a][9] == Trade(buy_coin=USDT, sell_coin=9)
+
+    # в работе только купленные монеты
+    assert brain._in_work == {1, 3}
+    # комиссия каждой сделки запрашивается один раз на весь портфель
+    assert brain.mapper.fee_calls == 4
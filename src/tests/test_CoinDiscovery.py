@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+# ccxt - необязательная зависимость, без нее модуль не импортируется
+ccxt = pytest.importorskip("ccxt")
+
+from infrastructure.services.CoinDiscovery import CoinDiscovery
+
+
+def test_concurrency_and_retries():
+    calls: dict[str, int] = {}
+    active = peak = 0
+
+    async def request(key: str) -> str:
+        nonlocal active, peak
+        calls[key] = calls.get(key, 0) + 1
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        if key == "flaky" and calls[key] < 3:
+            raise ccxt.RequestTimeout("timeout")
+        if key == "missing":
+            raise ccxt.BadRequest("no deposit address")
+        return key.upper()
+
+    progress: list[tuple[int, int]] = []
+    discovery = CoinDiscovery("test", concurrency=3, weight_per_second=1000.0, retries=3, backoff=0.001, progress=lambda done, total: progress.append((done, total)))
+    keys = ["flaky", "missing"] + [f"coin{i}" for i in range(10)]
+    results = asyncio.run(discovery.run({key: (lambda key=key: request(key)) for key in keys}))
+
+    assert peak <= 3
+    assert results["flaky"] == "FLAKY" and calls["flaky"] == 3
+    # ошибка биржи не повторяется
+    assert "missing" not in results and calls["missing"] == 1
+    assert len(results) == 11
+    assert progress[-1] == (12, 12)
@@ -0,0 +1,72 @@
+import math
+
+from core.models.ExchangeBase import ExchangeBase
+from core.services.Analytics.CoinQuotes import CoinQuotes
+
+
+ex1, ex2, ex3 = ExchangeBase("ex1"), ExchangeBase("ex2"), ExchangeBase("ex3")
+
+
+def test_best_pair_uses_extremes():
+    quotes = CoinQuotes()
+    assert quotes.update(ex1, 100.0, 100.0)
+    assert quotes.best_pair() is None
+
+    quotes.update(ex2, 110.0, 110.0)
+    quotes.update(ex3, 105.0, 105.0)
+    buy, sell, _, roi = quotes.best_pair()
+    assert (buy, sell) == (ex1, ex2)
+    assert math.isclose(roi, 0.1)
+
+
+def test_update_of_inner_exchange_does_not_require_rescore():
+    quotes = CoinQuotes()
+    quotes.update(ex1, 100.0, 100.0)
+    quotes.update(ex2, 110.0, 110.0)
+    quotes.update(ex3, 101.0, 101.0)
+    quotes.update(ExchangeBase("ex5"), 109.0, 109.0)
+    ex4 = ExchangeBase("ex4")
+    quotes.update(ex4, 105.0, 105.0)
+
+    assert not quotes.update(ex4, 106.0, 106.0)
+    assert quotes.update(ex4, 120.0, 120.0)
+    assert quotes.best_pair()[1] == ex4
+
+
+def test_best_sides_on_same_exchange():
+    quotes = CoinQuotes()
+    quotes.update(ex1, 100.0, 130.0)
+    quotes.update(ex2, 110.0, 120.0)
+    buy, sell, _, _ = quotes.best_pair()
+    assert buy != sell
+
+
+def test_remove_and_best_sell():
+    quotes = CoinQuotes()
+    quotes.update(ex1, 100.0, 100.0)
+    quotes.update(ex2, 110.0, 110.0)
+    assert quotes.best_sell(ex2)[1] == ex1
+    assert quotes.remove(ex1)
+    assert quotes.best_sell(ex2) is None
+    assert not quotes.remove(ex1)
+
+
+def test_rate_prefers_faster_route():
+    quotes = CoinQuotes()
+    quotes.update(ex1, 100.0, 100.0)
+    quotes.update(ex2, 110.0, 110.0)
+    quotes.update(ex3, 105.0, 105.0)
+    rates = {(ex1, ex2): 1.0, (ex1, ex3): 4.0}
+    buy, sell, value, roi = quotes.best_pair(lambda b, s: rates.get((b, s), 1.0), (1.0, 4.0))
+    assert (buy, sell) == (ex1, ex3)
+    assert math.isclose(value, 4 * roi)
+    assert quotes.best_sell(ex1, lambda b, s: rates.get((b, s), 1.0), (1.0, 4.0))[1] == ex3
+
+
+def test_best_by_departure():
+    quotes = CoinQuotes()
+    quotes.update(ex1, 100.0, 100.0)
+    quotes.update(ex2, 110.0, 110.0)
+    quotes.update(ex3, 105.0, 105.0)
+    pairs = {pair[0]: pair[1] for pair in quotes.best_by_departure()}
+    assert pairs == {ex1: ex2, ex2: ex3, ex3: ex2}
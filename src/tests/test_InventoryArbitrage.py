@@ -0,0 +1,86 @@
+import asyncio
+
+from bidict import bidict
+
+from core.models.Deal import Deal
+from core.models.ExchangeBase import ExchangeBase
+from core.services.Execution.InventoryArbitrage import InventoryArbitrage, Rebalance
+
+
+class FakeMapper:
+    def get_coin_name_id_for_ex(self, ex_name):
+        return bidict({"X": 1})
+
+
+class FakeSnapshot:
+    def get(self, exchange, coin_id):
+        return (10.0, 10.0)
+
+
+class FakeAnalyst:
+    def __init__(self, deals: list[Deal] | None = None) -> None:
+        self.deals = deals or []
+
+    def snapshot(self):
+        return FakeSnapshot()
+
+    async def opportunities(self, min_benefit=None):
+        for deal in self.deals:
+            yield deal
+        await asyncio.Event().wait()
+
+
+class OrderExchange(ExchangeBase):
+    def __init__(self, name: str, fails: bool = False) -> None:
+        super().__init__(name)
+        self.fails = fails
+        self.orders: list[tuple[str, str, float]] = []
+        self.wallet.update({self.usdt: 1000.0, "X": 100.0})
+
+    async def buy(self, coin_name, amount):
+        self.orders.append(("buy", coin_name, amount))
+        if self.fails:
+            raise RuntimeError("rejected")
+        return {'filled': amount / 10.0}
+
+    async def sell(self, coin_name, amount):
+        self.orders.append(("sell", coin_name, amount))
+        if self.fails:
+            raise RuntimeError("rejected")
+        return {'filled': amount}
+
+
+def test_both_legs_queue_rebalance():
+    async def run() -> None:
+        a, b = OrderExchange("a"), OrderExchange("b")
+        arbitrage = InventoryArbitrage(FakeAnalyst(), FakeMapper(), notional=100.0)
+        assert await arbitrage.execute(Deal(1, a, b, 0.01, roi=0.01))
+
+        assert a.orders == [("buy", "X", 100.0)]
+        assert b.orders == [("sell", "X", 10.0)]
+        assert arbitrage.rebalances.get_nowait() == Rebalance(1, a, b, 10.0)
+        assert not arbitrage.halted
+
+    asyncio.run(run())
+
+
+def test_one_leg_halts_coin_until_resolved():
+    async def run() -> None:
+        a, b = OrderExchange("a"), OrderExchange("b", fails=True)
+        deal = Deal(1, a, b, 0.01, roi=0.01)
+        arbitrage = InventoryArbitrage(FakeAnalyst([deal, deal]), FakeMapper(), notional=100.0)
+        assert not await arbitrage.execute(deal)
+        assert arbitrage.rebalances.empty()
+        assert arbitrage.halted == {1: deal}
+
+        # остановленная монета не торгуется, пока позицию не выровняют
+        arbitrage.start()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert len(a.orders) == 1
+        await arbitrage.stop()
+
+        assert arbitrage.resolve(1) is deal
+        assert not arbitrage.halted
+
+    asyncio.run(run())
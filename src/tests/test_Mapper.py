@@ -0,0 +1,206 @@
+import asyncio
+from collections import defaultdict
+import json
+from pathlib import Path
+import random
+import time
+
+from bidict import bidict
+import pytest
+
+from core.models.Coin import Coin
+from core.models.ExchangeBase import ExchangeBase
+from core.services.Mapper import Mapper
+
+
+class CoinsExchange(ExchangeBase):
+    def __init__(self, name: str, coins: dict[str, set[Coin]]) -> None:
+        super().__init__(name)
+        self.coins = coins
+
+    async def get_current_coins(self) -> dict[str, set[Coin]]:
+        return self.coins
+
+
+class StatusSource:
+    def __init__(self, status) -> None:
+        self.status = status
+
+    async def get_network_status(self):
+        return self.status
+
+
+def make_exchanges() -> list[CoinsExchange]:
+    return [
+        CoinsExchange("a", {
+            "BTC": {Coin("btc-bep", "BTC", "BEP20", 0.5), Coin("btc-trc", "BTC", "TRC20", 0.1)},
+            "USDT": {Coin("usdt-trc", "USDT", "TRC20", 1.0), Coin("usdt-sol", "USDT", "SOL", 0.5)},
+            "ONLY": {Coin("only", "ONLY", "TRC20", 0.1)},
+        }),
+        CoinsExchange("b", {
+            "BTC": {Coin("btc-bep", "BTC", "BEP20", 0.2), Coin("btc-trc", "BTC", "TRC20", 0.3)},
+            "USDT": {Coin("usdt-trc", "USDT", "TRC20", 0.8)},
+            "DOGE": {Coin("doge", "DOGE", "BEP20", 3.0)},
+        }),
+        CoinsExchange("c", {
+            "BTC": {Coin("btc-bep", "BTC", "BEP20", 0.4)},
+            "USDT": {Coin("usdt-sol", "USDT", "SOL", 0.1), Coin("usdt-trc", "USDT", "TRC20", 2.0)},
+            "DOGE": {Coin("doge", "DOGE", "BEP20", 1.0)},
+        }),
+    ]
+
+
+def make_mapper() -> Mapper:
+    mapper = Mapper()
+    asyncio.run(mapper.generate_data(make_exchanges())) # type: ignore
+    return mapper
+
+
+def nested_loop_routes(ex_coins) -> dict:
+    """Прежний перебор всех пар монет: из общих сетей берется монета биржи назначения с минимальной комиссией"""
+    routes: defaultdict = defaultdict(dict)
+    for departure_name, data in ex_coins.items():
+        for destination_name, data2 in ex_coins.items():
+            if departure_name == destination_name:
+                continue
+            for coin_id in set(data) & set(data2):
+                intersection = {coin2 for coin2 in data2[coin_id] for coin1 in data[coin_id] if coin1 == coin2}
+                if intersection:
+                    routes[(departure_name, destination_name)][coin_id] = min(intersection)
+    return dict(routes)
+
+
+def routes_of(mapper: Mapper) -> dict:
+    return {
+        (departure_name, destination_name): coins
+        for departure_name, destinations in mapper.transfer_tables().items()
+        for destination_name, coins in destinations.items()
+    }
+
+
+def coin_ids(mapper: Mapper) -> dict[str, int]:
+    names = {**mapper.get_coin_name_id_for_ex("a"), **mapper.get_coin_name_id_for_ex("b"), **mapper.get_coin_name_id_for_ex("c")}
+    return dict(names)
+
+
+def test_analyzed_coins_need_two_exchanges():
+    mapper = make_mapper()
+    ids = coin_ids(mapper)
+    assert mapper.analyzed_coins == {ids["BTC"], ids["USDT"], ids["DOGE"]}
+    assert mapper.get_exchanges_of(ids["BTC"]) == ("a", "b", "c")
+    assert mapper.get_exchanges_of(ids["DOGE"]) == ("b", "c")
+    assert not mapper.is_analyzed(ids["ONLY"])
+
+    # DOGE ушла с b - остается только на c
+    mapper._set_exchange_coins("b", bidict({"BTC": ids["BTC"], "USDT": ids["USDT"]}))
+    assert mapper.get_exchanges_of(ids["DOGE"]) == ("c",)
+    assert mapper.analyzed_coins == {ids["BTC"], ids["USDT"]}
+
+    mapper._set_exchange_coins("a", bidict({"BTC": ids["BTC"], "ONLY": ids["ONLY"]}))
+    mapper._set_exchange_coins("b", bidict({"ONLY": ids["ONLY"]}))
+    assert mapper.analyzed_coins == {ids["BTC"], ids["ONLY"]}
+
+
+def test_hash_join_matches_nested_loop():
+    mapper = make_mapper()
+    ids = coin_ids(mapper)
+    assert routes_of(mapper) == nested_loop_routes(mapper._ex_coins)
+
+    # сеть берется у биржи назначения: на b дешевле BEP20, хотя с a дешевле вывод в TRC20
+    route = mapper.get_best_coin_transfer("a", "b", ids["BTC"])
+    assert (route.chain, route.fee) == ("BEP20", 0.2)
+    route = mapper.get_best_coin_transfer("b", "a", ids["BTC"])
+    assert (route.chain, route.fee) == ("TRC20", 0.1)
+    assert mapper.get_best_coin_transfer("a", "b", ids["ONLY"]) is None
+
+
+def test_suspended_network_drops_route():
+    mapper = make_mapper()
+    ids = coin_ids(mapper)
+    btc = ids["BTC"]
+    old = mapper.get_best_coin_transfer("b", "a", btc)
+
+    # на b закрыт депозит BEP20 - перевод на b идет по TRC20
+    providers = {ExchangeBase("b"): StatusSource({"BTC": {"BEP20": (0.2, False, True)}})}
+    assert asyncio.run(mapper.refresh_networks(providers)) == {btc}
+    assert mapper.get_best_coin_transfer("a", "b", btc).chain == "TRC20"
+    assert mapper.get_best_coin_transfer("c", "b", btc) is None
+
+    # закрыт и TRC20 - маршрута на b больше нет, обратно на a вывод открыт
+    providers = {ExchangeBase("b"): StatusSource({"BTC": {"TRC20": (0.3, False, True)}})}
+    asyncio.run(mapper.refresh_networks(providers))
+    assert mapper.get_best_coin_transfer("a", "b", btc) is None
+    assert mapper.get_best_coin_transfer("b", "a", btc) is old
+
+    # новая комиссия на a - монета заменяется, взятый раньше объект не меняется
+    providers = {ExchangeBase("a"): StatusSource({"BTC": {"TRC20": (0.05, True, True)}})}
+    asyncio.run(mapper.refresh_networks(providers))
+    assert mapper.get_best_coin_transfer("b", "a", btc).fee == 0.05
+    assert old.fee == 0.1
+
+
+def test_empty_snapshot_falls_back_to_full_load(tmp_path):
+    path = tmp_path / "mapper.snap"
+    path.write_bytes(b"")
+    assert Mapper().load_snapshot(str(path)) is None
+
+    mapper = make_mapper()
+    mapper.save_snapshot(str(path))
+    loaded = Mapper()
+    assert loaded.load_snapshot(str(path)) is not None
+    assert routes_of(loaded) == routes_of(mapper)
+
+
+def test_coin_ids_follow_normalized_addresses():
+    exchanges = [
+        CoinsExchange("a", {
+            "TKN": {Coin("0xAbC", "TKN", "BEP20", 0.1)},
+            "ONE": {Coin("one", "ONE", "TRC20", 0.1)},
+            "TWO": {Coin("two", "TWO", "SOL", 0.1)},
+        }),
+        # тот же контракт в другом регистре и сети, совпадающие с двумя разными монетами
+        CoinsExchange("b", {
+            "TOKEN": {Coin("0xabc", "TOKEN", "BEP20", 0.2)},
+            "MIX": {Coin("two", "MIX", "SOL", 0.1), Coin("one", "MIX", "TRC20", 0.1)},
+        }),
+    ]
+    mapper = Mapper()
+    asyncio.run(mapper.generate_data(exchanges)) # type: ignore
+    a, b = mapper.get_coin_name_id_for_ex("a"), mapper.get_coin_name_id_for_ex("b")
+    assert b["TOKEN"] == a["TKN"]
+    assert b["MIX"] == min(a["ONE"], a["TWO"])
+    # обе сети MIX сохраняются за монетой
+    assert {coin.chain for coin in mapper._ex_coins["b"][b["MIX"]]} == {"SOL", "TRC20"}
+
+
+CURRENCIES = Path(__file__).resolve().parents[2] / "currencies.json"
+
+
+@pytest.mark.skipif(not CURRENCIES.exists(), reason="currencies.json is not available")
+def test_join_at_currency_universe_scale():
+    currencies = json.loads(CURRENCIES.read_text())
+    rng = random.Random(3)
+    exchanges = []
+    for index in range(12):
+        coins: dict[str, set[Coin]] = {}
+        for code, currency in currencies.items():
+            if rng.random() < 0.2:
+                continue
+            networks = set()
+            for chain, network in (currency.get('networks') or {}).items():
+                address = (network.get('info') or {}).get('contractAddress') or ''
+                if not address or rng.random() < 0.3:
+                    continue
+                fee = network.get('fee')
+                networks.add(Coin(address, code, chain, -1.0 if fee is None else fee * rng.uniform(0.5, 1.5)))
+            if networks:
+                coins[code] = networks
+        exchanges.append(CoinsExchange(f"ex{index}", coins))
+
+    mapper = Mapper()
+    started = time.perf_counter()
+    asyncio.run(mapper.generate_data(exchanges)) # type: ignore
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 1.0
+    assert routes_of(mapper) == nested_loop_routes(mapper._ex_coins)
@@ -0,0 +1,52 @@
+import pytest
+
+from core.services import MapperSnapshot
+from core.services.MapperSnapshot import SnapshotError, read_snapshot, write_snapshot
+
+
+def test_roundtrip(tmp_path):
+    path = str(tmp_path / "mapper.snap")
+    data = {'names': {'binance': {'BTC': 1}}, 'coins': [('0xabc', 'BTC', 'BEP20', 0.1)]}
+    info = write_snapshot(path, data)
+
+    loaded, loaded_info = read_snapshot(path)
+    assert loaded == data
+    assert loaded_info == info
+    assert not info.is_stale(60)
+
+
+def test_corrupted_snapshot_is_rejected(tmp_path):
+    path = tmp_path / "mapper.snap"
+    write_snapshot(str(path), {'usdt': 7})
+
+    raw = bytearray(path.read_bytes())
+    raw[-1] ^= 0xFF
+    path.write_bytes(bytes(raw))
+    with pytest.raises(SnapshotError, match="checksum"):
+        read_snapshot(str(path))
+
+    path.write_bytes(bytes(raw[:-2]))
+    with pytest.raises(SnapshotError, match="truncated"):
+        read_snapshot(str(path))
+
+    path.write_bytes(b"PKL!" + bytes(raw[4:]))
+    with pytest.raises(SnapshotError, match="not a mapper snapshot"):
+        read_snapshot(str(path))
+
+
+def test_empty_or_short_file_is_rejected(tmp_path):
+    path = tmp_path / "mapper.snap"
+    for raw in (b"", b"MA"):
+        path.write_bytes(raw)
+        with pytest.raises(SnapshotError, match="too short"):
+            read_snapshot(str(path))
+
+
+def test_other_python_version_is_rejected(tmp_path, monkeypatch):
+    path = str(tmp_path / "mapper.snap")
+    monkeypatch.setattr(MapperSnapshot, "PYTHON", (2, 7))
+    write_snapshot(path, {'usdt': 7})
+
+    monkeypatch.undo()
+    with pytest.raises(SnapshotError, match="Python 2.7"):
+        read_snapshot(path)
@@ -0,0 +1,26 @@
+from core.models.Coin import Coin
+from core.services.PairRoutes import PairRoutes
+
+
+def test_lookup_in_both_directions():
+    trc, bep = Coin("trc", "BTC", "TRC20", 0.1), Coin("bep", "BTC", "BEP20", 0.2)
+    pair = PairRoutes("a", "b", [(7, trc, None), (3, bep, trc), (5, None, None)])
+
+    # строка без маршрутов не хранится
+    assert len(pair) == 2
+    assert pair.get("a", 7) is trc
+    assert pair.get("b", 7) is None
+    assert pair.get("b", 3) is trc
+    assert pair.get("a", 5) is None
+    assert pair.get("a", 100) is None
+    assert list(pair.items("a")) == [(3, bep), (7, trc)]
+
+
+def test_replace_builds_new_table():
+    trc, bep = Coin("trc", "BTC", "TRC20", 0.1), Coin("bep", "BTC", "BEP20", 0.2)
+    pair = PairRoutes("a", "b", [(1, trc, trc), (2, bep, bep)])
+    updated = pair.replace({1: (None, None), 4: (bep, None)})
+
+    assert list(updated.rows()) == [(2, bep, bep), (4, bep, None)]
+    # прежняя таблица не меняется
+    assert pair.get("a", 1) is trc
@@ -0,0 +1,117 @@
+import math
+
+from core.models.ExchangeBase import ExchangeBase
+from core.services.Analytics.PriceMatrix import PriceMatrix
+
+
+def make_matrix():
+    ex1, ex2, ex3 = ExchangeBase("ex1"), ExchangeBase("ex2"), ExchangeBase("ex3")
+    matrix = PriceMatrix([1, 2, 3], commission=0.0, capacity=2)
+    for ex in (ex1, ex2, ex3):
+        matrix.add_exchange(ex)
+    return matrix, ex1, ex2, ex3
+
+
+def test_best_needs_two_prices():
+    matrix, ex1, ex2, _ = make_matrix()
+    matrix.set(1, ex1, 100.0)
+    assert matrix.best(1) is None
+
+    matrix.set(1, ex2, 110.0)
+    buy, sell, _, roi = matrix.best(1)
+    assert (buy, sell) == (ex1, ex2)
+    assert math.isclose(roi, 0.1)
+
+
+def test_non_positive_price_removes_quote():
+    matrix, ex1, ex2, _ = make_matrix()
+    matrix.set(1, ex1, 100.0)
+    matrix.set(1, ex2, 110.0)
+    matrix.set(1, ex2, -10.0)
+    assert matrix.count(1) == 1
+    assert matrix.best(1) is None
+
+
+def test_best_all_matches_single_row():
+    matrix, ex1, ex2, ex3 = make_matrix()
+    matrix.set(1, ex1, 100.0)
+    matrix.set(1, ex2, 110.0)
+    matrix.set(1, ex3, 90.0)
+    matrix.set(2, ex2, 5.0)
+    matrix.set(3, ex1, 2.0)
+    matrix.set(3, ex3, 2.0)
+
+    result = dict(matrix.iter_best())
+    assert set(result) == {1, 3}
+    assert result[1] == matrix.best(1)
+    assert result[3][0] != result[3][1]
+
+
+def test_all_prices():
+    matrix, ex1, ex2, _ = make_matrix()
+    matrix.set(1, ex1, 100.0)
+    matrix.set(2, ex2, 5.0)
+    assert matrix.all_prices()[ex1] == {1: 100.0}
+    assert matrix.all_prices()[ex2] == {2: 5.0}
+
+
+def test_spread_uses_bid_against_ask():
+    matrix, ex1, ex2, ex3 = make_matrix()
+    matrix.set(1, ex1, 100.0, 99.0)
+    matrix.set(1, ex2, 102.0, 101.0)
+    buy, sell, _, roi = matrix.best(1)
+    assert (buy, sell) == (ex1, ex2)
+    assert math.isclose(roi, 0.01)
+
+    # лучший ask и лучший bid на одной бирже
+    matrix.set(1, ex3, 98.0, 103.0)
+    buy, sell, _, roi = matrix.best(1)
+    assert buy != sell
+    assert (buy, sell) == (ex3, ex2)
+
+
+def test_rates_weight_pairs():
+    matrix, ex1, ex2, ex3 = make_matrix()
+    matrix.set(1, ex1, 100.0)
+    matrix.set(1, ex2, 110.0)
+    matrix.set(1, ex3, 105.0)
+    # ex1 -> ex2 дороже по времени, чем ex1 -> ex3
+    matrix.set_rate(1, ex1, ex2, 1.0)
+    matrix.set_rate(1, ex1, ex3, 4.0)
+    buy, sell, value, roi = matrix.best(1)
+    assert (buy, sell) == (ex1, ex3)
+    assert math.isclose(roi, 0.05)
+    assert math.isclose(value, 0.2)
+    assert dict(matrix.iter_best())[1] == matrix.best(1)
+
+
+def test_best_by_departure_matches_best_from():
+    matrix, ex1, ex2, ex3 = make_matrix()
+    matrix.set(1, ex1, 100.0)
+    matrix.set(1, ex2, 110.0)
+    matrix.set(1, ex3, 105.0)
+    matrix.set(2, ex1, 5.0)
+    pairs = matrix.best_by_departure(1)
+    assert len(pairs) == 3
+    for buy, sell, value, roi in pairs:
+        assert matrix.best_from(1, buy) == (sell, value, roi)
+    assert max(pairs, key=lambda pair: pair[2]) == matrix.best(1)
+    assert matrix.best_by_departure(2) == []
+    assert dict(matrix.iter_best_by_departure()) == {1: pairs}
+
+
+def test_add_coins_appends_rows():
+    matrix, ex1, ex2, _ = make_matrix()
+    matrix.set(1, ex1, 100.0)
+    assert matrix.add_coins([4, 1, 4]) == [4]
+    assert matrix.add_coins([4]) == []
+
+    # старые строки сохраняются, новая принимает цены и множители
+    assert matrix.count(1) == 1
+    matrix.set(4, ex1, 100.0)
+    matrix.set(4, ex2, 120.0)
+    matrix.set_rate(4, ex1, ex2, 0.5)
+    buy, sell, value, roi = matrix.best(4)
+    assert (buy, sell) == (ex1, ex2)
+    assert math.isclose(roi, 0.2)
+    assert math.isclose(value, 0.1)
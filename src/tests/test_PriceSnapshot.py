@@ -0,0 +1,38 @@
+from core.models.ExchangeBase import ExchangeBase
+from core.services.Analytics.PriceSnapshot import PriceBook
+
+
+ex1, ex2 = ExchangeBase("ex1"), ExchangeBase("ex2")
+
+
+def test_snapshot_is_immutable_and_shares_clean_chunks():
+    book = PriceBook(chunk_size=4)
+    book.put(ex1, 1, 100.0, 99.0)
+    book.put(ex1, 9, 5.0, 4.9)
+    first = book.publish()
+    assert first.version == 1
+
+    book.put(ex1, 1, 101.0, 100.0)
+    assert first.get(ex1, 1) == (100.0, 99.0)
+    second = book.publish()
+    assert second.get(ex1, 1) == (101.0, 100.0)
+    assert first.get(ex1, 1) == (100.0, 99.0)
+    # блок с монетой 9 не менялся и не копировался
+    assert second._chunks[ex1][2] is first._chunks[ex1][2]
+    assert book.publish() is second
+
+
+def test_changes_since():
+    book = PriceBook(history=2)
+    book.put(ex1, 1, 100.0, 99.0)
+    book.publish()
+    book.put(ex2, 1, 100.0, 99.0)
+    book.publish()
+    book.remove(ex1, 1)
+    book.publish()
+
+    assert book.changes_since(3) == set()
+    assert book.changes_since(1) == {(ex2, 1), (ex1, 1)}
+    assert book.changes_since(0) is None
+    assert book.snapshot.get(ex1, 1) is None
+    assert book.snapshot.asks() == {ex1: {}, ex2: {1: 100.0}}
@@ -0,0 +1,37 @@
+import asyncio
+import os
+
+from infrastructure.services.PriceWorker import publish_prices
+from infrastructure.services.SharedPriceTable import SharedPriceTable
+
+
+class FakeObserver:
+    """Наблюдатель без сети: на launch отдает по котировке на каждую запрошенную монету"""
+
+    def __init__(self) -> None:
+        self.subscribers = []
+        self.launched_with = None
+
+    async def subscribe_price(self, sub) -> None:
+        self.subscribers.append(sub)
+
+    async def launch(self, coin_names=None) -> None:
+        self.launched_with = coin_names
+        batch = [(coin_name, 10.0 + i, 9.0 + i) for i, coin_name in enumerate(coin_names or [])]
+        for sub in self.subscribers:
+            await sub.on_prices_update(batch)
+
+
+def test_worker_publishes_requested_coins():
+    coin_names = ["BTC", "ETH"]
+    table = SharedPriceTable.create(f"test_worker_{os.getpid()}", len(coin_names))
+    try:
+        observer = FakeObserver()
+        asyncio.run(publish_prices("test", observer, table, coin_names))
+
+        assert observer.launched_with == coin_names
+        cursor, slots = table.changes(0)
+        assert slots == {0, 1}
+        assert table.read(1)[:2] == (11.0, 10.0)
+    finally:
+        table.close()
@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+
+from bidict import bidict
+
+from core.models.ExchangeBase import ExchangeBase
+from core.services.Analytics.TransferTimes import TransferTimes
+from core.services.Execution.Rebalancer import Rebalancer
+
+
+class FakeMapper:
+    def __init__(self, fees: dict[tuple[str, str], float]) -> None:
+        # (откуда, куда) -> постоянная комиссия вывода
+        self.fees = fees
+        self.names = bidict({"X": 1, "Y": 2, "Z": 3})
+
+    def get_coin_name_id_for_ex(self, ex_name):
+        return self.names
+
+    def get_coin_id_by_name(self, ex_name, coin_name):
+        return self.names.get(coin_name)
+
+    def get_best_coin_transfer(self, departure_name, destination_name, coin_id):
+        fee = self.fees.get((departure_name, destination_name))
+        if fee is None:
+            return None
+        return SimpleNamespace(name=self.names.inverse[coin_id], chain="TRC20", fee=fee, has_known_fee=True)
+
+
+class WalletExchange(ExchangeBase):
+    async def subscribe_balance(self, sub) -> None:
+        self.sub = sub
+
+
+def make_rebalancer(balances: dict[str, float], fees: dict[tuple[str, str], float], **kwargs) -> Rebalancer:
+    exchanges = []
+    for name, balance in balances.items():
+        exchange = WalletExchange(name)
+        exchange.wallet["X"] = balance
+        exchanges.append(exchange)
+    rebalancer = Rebalancer(FakeMapper(fees), TransferTimes(), exchanges, **kwargs)
+    for name in balances:
+        rebalancer.set_target(1, name, 100.0)
+    return rebalancer
+
+
+def test_balances_inside_tolerance_band_stay():
+    rebalancer = make_rebalancer({"a": 119.0, "b": 81.0}, {("a", "b"): 0.0})
+    assert rebalancer.plan_coin(1) == []
+
+
+def test_one_withdrawal_per_pair_from_cheapest_route():
+    rebalancer = make_rebalancer(
+        {"a": 200.0, "b": 200.0, "c": 20.0},
+        {("a", "c"): 0.5, ("b", "c"): 0.1},
+    )
+    moves = rebalancer.plan_coin(1)
+    # вся нехватка c закрывается одним выводом с более дешевой b
+    assert [(move.departure.name, move.destination.name) for move in moves] == [("b", "c")]
+    assert moves[0].amount == 80.1
+    assert moves[0].fee == 0.1
+
+
+def test_expensive_withdrawal_waits_for_larger_deficit():
+    rebalancer = make_rebalancer({"a": 200.0, "b": 70.0}, {("a", "b"): 0.5}, max_fee_share=0.01)
+    # комиссия 0.5 больше 1% от 30.5
+    assert rebalancer.plan_coin(1) == []
+
+    rebalancer.exchanges["b"].wallet["X"] = 40.0
+    [move] = rebalancer.plan_coin(1)
+    assert move.amount == 60.5
+
+
+def test_plan_walks_coins_round_robin_within_budget():
+    rebalancer = make_rebalancer({"a": 200.0, "b": 20.0}, {("a", "b"): 0.0}, budget=-1.0)
+    for coin_id, name in ((2, "Y"), (3, "Z")):
+        rebalancer.set_target(coin_id, "a", 100.0)
+        rebalancer.set_target(coin_id, "b", 100.0)
+        rebalancer.exchanges["a"].wallet[name] = 200.0
+        rebalancer.exchanges["b"].wallet[name] = 20.0
+
+    # исчерпанный бюджет - по одной монете за проход, следующий проход продолжает с курсора
+    planned = [[move.coin_id for move in rebalancer.plan()] for _ in range(4)]
+    assert planned == [[1], [2], [3], [1]]
+
+    rebalancer.budget = 60.0
+    assert sorted(move.coin_id for move in rebalancer.plan()) == [1, 2, 3]
+
+
+def test_first_balance_snapshot_is_not_a_deposit():
+    async def run() -> list[int]:
+        rebalancer = make_rebalancer({"a": 200.0, "b": 20.0}, {("a", "b"): 0.0})
+        rebalancer._in_flight[(1, "b")] = [(80.0, float("inf"))]
+        await rebalancer.start()
+        b = rebalancer.exchanges["b"]
+
+        counts = []
+        await b.sub.on_balance_update("X", 20.0)
+        counts.append(len(rebalancer._in_flight[(1, "b")]))
+        await b.sub.on_balance_update("X", 100.0)
+        counts.append(len(rebalancer._in_flight[(1, "b")]))
+        await rebalancer.stop()
+        return counts
+
+    assert asyncio.run(run()) == [1, 0]
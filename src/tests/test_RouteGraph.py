@@ -0,0 +1,51 @@
+import math
+
+from core.services.Analytics.RouteGraph import RouteGraph
+
+
+def rate(multiplier: float) -> float:
+    return -math.log(multiplier)
+
+
+def test_cycle_found_on_weight_decrease():
+    graph = RouteGraph()
+    assert graph.set_weight("a", "b", rate(2.0)) is None
+    assert graph.set_weight("b", "c", rate(0.5)) is None
+    assert graph.set_weight("c", "a", rate(0.9)) is None
+    assert graph.cycles() == []
+
+    cycle = graph.set_weight("c", "a", rate(1.1))
+    assert cycle is not None
+    assert set(cycle.nodes) == {"a", "b", "c"}
+    assert math.isclose(cycle.roi, 0.1)
+    assert graph.cycles() == [cycle]
+
+
+def test_cycle_dropped_when_unprofitable():
+    graph = RouteGraph()
+    graph.set_weight("a", "b", rate(2.0))
+    graph.set_weight("b", "a", rate(0.6))
+    assert len(graph.cycles()) == 1
+
+    # цикл пересчитывается при изменении любого его ребра
+    graph.set_weight("a", "b", rate(1.5))
+    assert graph.cycles() == []
+    assert graph.weight("b", "a") == rate(0.6)
+
+    graph.set_weight("a", "b", rate(2.0))
+    assert len(graph.cycles()) == 1
+    graph.remove("b", "a")
+    assert graph.cycles() == []
+
+
+def test_longer_cycle_through_unchanged_edges():
+    graph = RouteGraph()
+    for u, v in [("usdt@a", "x@a"), ("x@a", "x@b"), ("x@b", "usdt@b"), ("usdt@b", "usdt@a")]:
+        graph.set_weight(u, v, rate(0.99))
+    graph.set_weight("usdt@a", "y@a", rate(1.0))
+    assert graph.cycles() == []
+
+    cycle = graph.set_weight("x@b", "usdt@b", rate(1.1))
+    assert cycle is not None
+    assert len(cycle.nodes) == 4
+    assert math.isclose(cycle.roi, 0.99 ** 3 * 1.1 - 1)
@@ -0,0 +1,37 @@
+import os
+
+from infrastructure.services.SharedPriceTable import SharedPriceTable
+
+
+def make_table(slots: int = 4, ring_size: int = 8) -> SharedPriceTable:
+    return SharedPriceTable.create(f"test_prices_{os.getpid()}", slots, ring_size)
+
+
+def test_write_read_and_changes():
+    table = make_table()
+    try:
+        reader = SharedPriceTable.attach(table.name)
+        assert reader.read(0) is None
+
+        table.write(1, 100.0, 99.0, received=1.0)
+        table.write(3, 5.0, 4.9, received=2.0)
+        table.write(1, 101.0, 100.0, received=3.0)
+
+        cursor, slots = reader.changes(0)
+        assert (cursor, slots) == (3, {1, 3})
+        assert reader.read(1) == (101.0, 100.0, 3.0)
+        assert reader.changes(cursor) == (3, set())
+        reader.close()
+    finally:
+        table.close()
+
+
+def test_lapped_reader_rescans():
+    table = make_table(ring_size=4)
+    try:
+        for i in range(6):
+            table.write(i % 4, float(i + 1), float(i + 1))
+        assert table.changes(0) == (6, None)
+        assert table.changes(3)[1] == {3, 0, 1}
+    finally:
+        table.close()
@@ -0,0 +1,47 @@
+import pytest
+
+from core.models.ExchangeBase import ExchangeBase
+from core.services.Analytics.FeeTable import FeeTable
+from core.services.Analytics.Slippage import DepthCurve, SlippageModel
+
+
+buy_ex, sell_ex = ExchangeBase("buy"), ExchangeBase("sell")
+
+
+def test_depth_curve_walks_levels():
+    asks = DepthCurve([(10.0, 1.0), (11.0, 2.0), (12.0, 1.0)])
+    assert asks.total_qty == 4.0 and asks.total_cost == 44.0
+    # первый уровень целиком и половина второго
+    assert asks.qty_for_cost(21.0) == pytest.approx(2.0)
+    assert asks.qty_for_cost(44.0) == pytest.approx(4.0)
+    # глубины не хватает
+    assert asks.qty_for_cost(44.5) is None
+
+    bids = DepthCurve([(9.0, 1.0), (8.0, 1.0)])
+    assert bids.cost_for_qty(1.5) == pytest.approx(13.0)
+    assert bids.cost_for_qty(2.5) is None
+
+
+def test_empty_book():
+    curve = DepthCurve([(0.0, 5.0), (10.0, 0.0)])
+    assert len(curve) == 0 and curve.total_qty == 0.0
+    assert curve.qty_for_cost(1.0) is None
+    assert curve.cost_for_qty(1.0) is None
+
+
+def test_realizable_value_and_profit_curve():
+    model = SlippageModel(None, FeeTable(None, default_fee=0.0))  # type: ignore
+    assert model.realizable_value(1, buy_ex, sell_ex, 10.0) is None
+
+    model.update(1, buy_ex, asks=[(10.0, 1.0), (11.0, 2.0)], bids=[(9.0, 1.0)])
+    model.update(1, sell_ex, asks=[(13.0, 1.0)], bids=[(12.0, 1.0), (11.0, 1.0), (10.0, 10.0)])
+
+    # 21 USDT -> 2 монеты -> 12 + 11 USDT
+    assert model.realizable_value(1, buy_ex, sell_ex, 21.0) == pytest.approx(23.0)
+    assert model.profit_curve(1, buy_ex, sell_ex, [10.0, 21.0, 32.0, 40.0]) == [
+        pytest.approx(2.0),
+        pytest.approx(2.0),
+        pytest.approx(1.0),
+        None,  # глубины стакана покупки не хватает
+    ]
+    assert model.profit_curve(1, sell_ex, ExchangeBase("none"), [10.0]) == [None]
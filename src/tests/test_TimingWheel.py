@@ -0,0 +1,30 @@
+from core.services.Analytics.TimingWheel import TimingWheel
+
+
+def test_expires_after_ttl():
+    wheel = TimingWheel(resolution=1.0, slots=8, now=0.0)
+    wheel.touch("a", 0.0, 3.0)
+    wheel.touch("b", 0.0, 5.0)
+    assert wheel.advance(2.5) == []
+    # срабатывание с точностью до resolution
+    assert wheel.advance(4.0) == ["a"]
+    assert "a" not in wheel
+    assert wheel.advance(5.0) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_touch_extends_and_discard_cancels():
+    wheel = TimingWheel(resolution=1.0, slots=4, now=0.0)
+    wheel.touch("a", 0.0, 2.0)
+    wheel.touch("a", 1.5, 2.0)
+    assert wheel.advance(3.0) == []
+    assert wheel.received("a") == 1.5
+    # срабатывание с точностью до resolution
+    assert wheel.advance(4.0) == ["a"]
+
+    # срок дальше горизонта колеса и долгая пауза между тиками
+    wheel.touch("b", 4.0, 10.0)
+    wheel.touch("c", 4.0, 1.0)
+    wheel.discard("c")
+    assert wheel.advance(8.0) == []
+    assert wheel.advance(100.0) == ["b"]